@@ -0,0 +1,101 @@
+# app/async_database.py
+#
+# Capa de acceso asíncrona a la base de datos para los endpoints de lectura.
+# Usa psycopg 3 con `AsyncConnectionPool`, de modo que las consultas no bloquean
+# el event loop ni consumen hilos del threadpool de Starlette.
+
+import logging
+import time
+from contextlib import asynccontextmanager
+from fastapi import HTTPException
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
+
+from app.database import (
+    DATABASE_URL,
+    DB_POOL_HEALTHCHECK_INTERVAL,
+    DB_POOL_MAX_SIZE,
+    DB_POOL_MIN_SIZE,
+    DB_POOL_TIMEOUT,
+    DatabaseUnavailableError,
+    PoolTimeoutError,
+)
+from app.services.metrics import db_pool_checkout_wait, metrics, set_pool_usage
+
+# Pool asíncrono global. Se abre en el `lifespan` de la aplicación
+# o en el primer uso.
+async_db_pool = None
+
+async def init_async_db_pool():
+    """Inicializa y abre el pool asíncrono de conexiones."""
+    global async_db_pool
+    if async_db_pool is not None:
+        return
+
+    # Las lecturas se ejecutan en modo autocommit para ahorrar el
+    # BEGIN/ROLLBACK de cada petición. Las consultas que necesitan una
+    # transacción (p. ej. cursores con nombre) la abren explícitamente.
+    async_db_pool = AsyncConnectionPool(
+        DATABASE_URL,
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        timeout=DB_POOL_TIMEOUT,
+        max_idle=max(DB_POOL_HEALTHCHECK_INTERVAL, 60.0),
+        kwargs={"autocommit": True},
+        check=AsyncConnectionPool.check_connection,
+        open=False,
+    )
+    # `wait=False` evita que el arranque falle si la base de datos aún no responde;
+    # el pool seguirá intentando abrir las conexiones en segundo plano.
+    await async_db_pool.open(wait=False)
+    logging.info(
+        f"Pool asíncrono de conexiones inicializado (min={DB_POOL_MIN_SIZE}, max={DB_POOL_MAX_SIZE})."
+    )
+
+async def close_async_db_pool():
+    """Cierra el pool asíncrono de conexiones."""
+    global async_db_pool
+    if async_db_pool is not None:
+        await async_db_pool.close()
+        async_db_pool = None
+        logging.info("Pool asíncrono de conexiones cerrado.")
+
+@asynccontextmanager
+async def async_db_connection():
+    """
+    Context manager asíncrono que presta una conexión del pool.
+
+    Uso:
+        async with async_db_connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(...)
+    """
+    if async_db_pool is None:
+        await init_async_db_pool()
+
+    started = time.perf_counter()
+    try:
+        async with async_db_pool.connection() as conn:
+            db_pool_checkout_wait.observe("async", value=time.perf_counter() - started)
+            yield conn
+    except PoolTimeout as e:
+        db_pool_checkout_wait.observe("async", value=time.perf_counter() - started)
+        raise PoolTimeoutError(str(e)) from e
+
+def _collect_pool_metrics():
+    """Ocupación del pool asíncrono para `/metrics` (se calcula en cada scrape)."""
+    if async_db_pool is not None:
+        stats = async_db_pool.get_stats()
+        set_pool_usage("async", stats["pool_size"] - stats["pool_available"], async_db_pool.max_size)
+
+metrics.register_collector(_collect_pool_metrics)
+
+async def get_async_db_connection():
+    """
+    Obtiene una conexión del pool asíncrono.
+    Esta función será usada como una dependencia de FastAPI en los endpoints `async`.
+    """
+    try:
+        async with async_db_connection() as conn:
+            yield conn
+    except DatabaseUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
@@ -0,0 +1,99 @@
+# app/jobs/forecast/features.py
+#
+# Ingeniería de características del job de pronóstico, vectorizada.
+# Trabaja sobre la matriz NumPy de ventas (fechas × SKUs) y calcula a la vez
+# las características de todos los SKUs: calendario (por fecha), lags y
+# medias móviles (por fecha y SKU). No hay bucles por fila ni asignaciones
+# `.loc` escalares; cada característica es un desplazamiento o una suma
+# acumulada sobre la matriz completa.
+
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+LAGS = (7, 14, 28)
+ROLLING_WINDOWS = (7, 28)
+
+CALENDAR_FEATURES = ["weekday", "month", "day_of_month"]
+LAG_FEATURES = [f"lag_{lag}" for lag in LAGS]
+ROLLING_FEATURES = [f"rolling_mean_{window}" for window in ROLLING_WINDOWS]
+SERIES_FEATURES = LAG_FEATURES + ROLLING_FEATURES
+FEATURES = CALENDAR_FEATURES + SERIES_FEATURES
+
+# Versión de las características. Hay que incrementarla al cambiar cómo se
+# calcula alguna; los modelos guardados con otra versión no se reutilizan.
+FEATURE_VERSION = "2"
+
+
+def calendar_features(dates: pd.DatetimeIndex) -> Dict[str, np.ndarray]:
+    """Día de la semana, mes y día del mes de cada fecha (vectores de longitud T)."""
+    dates = pd.DatetimeIndex(dates)
+    return {
+        "weekday": dates.weekday.to_numpy(),
+        "month": dates.month.to_numpy(),
+        "day_of_month": dates.day.to_numpy(),
+    }
+
+
+def lag_features(values: np.ndarray, lags: Sequence[int] = LAGS) -> Dict[str, np.ndarray]:
+    """
+    Lags de cada SKU: `lag_k[t, s] = values[t - k, s]`, con 0 cuando no hay histórico.
+    """
+    n_dates = values.shape[0]
+    features = {}
+    for lag in lags:
+        shifted = np.zeros_like(values)
+        if lag < n_dates:
+            shifted[lag:] = values[:-lag]
+        features[f"lag_{lag}"] = shifted
+    return features
+
+
+def rolling_features(values: np.ndarray, windows: Sequence[int] = ROLLING_WINDOWS) -> Dict[str, np.ndarray]:
+    """
+    Media de los `w` días anteriores a cada fecha (sin incluirla, para no
+    filtrar el objetivo). Al principio de la serie se promedia sobre los días
+    disponibles. Se calcula con una suma acumulada: O(T × S) sea cual sea `w`.
+    """
+    n_dates = values.shape[0]
+    cumsum = np.zeros((n_dates + 1,) + values.shape[1:], dtype=np.float64)
+    np.cumsum(values, axis=0, out=cumsum[1:])
+
+    ends = np.arange(n_dates)
+    features = {}
+    for window in windows:
+        starts = np.maximum(ends - window, 0)
+        counts = (ends - starts).astype(np.float64)
+        sums = cumsum[ends] - cumsum[starts]
+        counts = counts.reshape((n_dates,) + (1,) * (values.ndim - 1))
+        features[f"rolling_mean_{window}"] = np.divide(
+            sums, counts, out=np.zeros_like(sums), where=counts > 0
+        )
+    return features
+
+
+def build_feature_arrays(values: np.ndarray, dates: pd.DatetimeIndex) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+    """
+    Calcula todas las características de la matriz `values` (fechas × SKUs).
+
+    Returns:
+        tuple: `(calendario, series)`: las de calendario son vectores por
+        fecha y las de serie matrices con la misma forma que `values`.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    series = lag_features(values)
+    series.update(rolling_features(values))
+    return calendar_features(dates), series
+
+
+def sku_feature_frame(
+    calendar: Dict[str, np.ndarray],
+    series: Dict[str, np.ndarray],
+    column: int,
+    index: pd.DatetimeIndex,
+) -> pd.DataFrame:
+    """DataFrame de características de un SKU (la columna `column` de las matrices)."""
+    data = dict(calendar)
+    data.update({name: matrix[:, column] for name, matrix in series.items()})
+    return pd.DataFrame(data, index=index)[FEATURES]
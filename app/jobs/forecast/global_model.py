@@ -0,0 +1,160 @@
+# app/jobs/forecast/global_model.py
+#
+# Modo "modelo global" del job de pronóstico: en lugar de entrenar un
+# `LGBMRegressor` por SKU, se apilan todas las series en formato largo
+# (una fila por fecha y SKU) con el SKU y su categoría como variables
+# categóricas, se entrena un único modelo y se predice el horizonte de
+# todos los SKUs con una sola llamada a `predict`.
+#
+# Los SKUs con pocas ventas se benefician de los patrones del resto de su
+# categoría, y el coste pasa de N entrenamientos a uno.
+
+import logging
+import time
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+import lightgbm as lgb
+import numpy as np
+import pandas as pd
+
+from app.jobs.forecast.features import (
+    FEATURES as SERIES_MODEL_FEATURES,
+    LAGS,
+    ROLLING_WINDOWS,
+    build_feature_arrays,
+    calendar_features,
+)
+
+FEATURES = SERIES_MODEL_FEATURES + ["sku", "category"]
+UNKNOWN_CATEGORY = "sin_categoria"
+
+
+def _frame(calendar: Dict[str, np.ndarray], series: Dict[str, np.ndarray], skus, categories, n_dates: int) -> pd.DataFrame:
+    """
+    Construye la matriz larga (fechas × SKUs, con el SKU variando más rápido)
+    a partir de columnas de calendario por fecha y de serie por (fecha, SKU).
+    """
+    n_skus = len(skus.categories)
+    columns = {name: np.repeat(values, n_skus) for name, values in calendar.items()}
+    columns.update({name: values.ravel() for name, values in series.items()})
+    columns["sku"] = pd.Categorical.from_codes(np.tile(np.arange(n_skus), n_dates), categories=skus.categories)
+    columns["category"] = pd.Categorical.from_codes(np.tile(categories.codes, n_dates), categories=categories.categories)
+    return pd.DataFrame(columns)[FEATURES]
+
+
+def build_training_matrix(sales_df: pd.DataFrame, categories: pd.Categorical):
+    """
+    Convierte el DataFrame pivotado (fechas × SKUs) en la matriz de
+    entrenamiento en formato largo. Las características se calculan para
+    todos los SKUs a la vez sobre la matriz NumPy (ver `features.py`).
+    """
+    values = sales_df.to_numpy(dtype=np.float64)
+    n_dates = values.shape[0]
+
+    calendar, series = build_feature_arrays(values, pd.DatetimeIndex(sales_df.index))
+    skus = pd.Categorical(sales_df.columns, categories=sales_df.columns)
+    X = _frame(calendar, series, skus, categories, n_dates)
+    y = values.ravel()
+    return X, y
+
+
+def build_prediction_matrix(sales_df: pd.DataFrame, categories: pd.Categorical, forecast_horizon: int):
+    """
+    Matriz de predicción para los `forecast_horizon` días siguientes a la
+    última fecha. Los lags que caen dentro del histórico usan el valor real;
+    los que caen en el futuro usan el mismo día de la semana de la última
+    semana conocida (todos los lags son múltiplos de 7). Las medias móviles
+    son las de los últimos días del histórico.
+    """
+    values = sales_df.to_numpy(dtype=np.float64)
+    n_dates = values.shape[0]
+    last_date = pd.Timestamp(sales_df.index[-1])
+    future = pd.DatetimeIndex([last_date + timedelta(days=i) for i in range(1, forecast_horizon + 1)])
+
+    series = {}
+    steps = np.arange(1, forecast_horizon + 1)
+    for lag in LAGS:
+        positions = n_dates - 1 + steps - lag
+        # Retrocede semanas completas hasta caer en el histórico.
+        overshoot = np.maximum(positions - (n_dates - 1), 0)
+        positions = positions - 7 * np.ceil(overshoot / 7).astype(int)
+        series[f"lag_{lag}"] = np.where(
+            (positions >= 0)[:, None],
+            values[np.clip(positions, 0, n_dates - 1)],
+            0.0,
+        )
+
+    for window in ROLLING_WINDOWS:
+        last_mean = values[-window:].mean(axis=0)
+        series[f"rolling_mean_{window}"] = np.broadcast_to(last_mean, (forecast_horizon, values.shape[1]))
+
+    skus = pd.Categorical(sales_df.columns, categories=sales_df.columns)
+    return future, _frame(calendar_features(future), series, skus, categories, forecast_horizon)
+
+
+def sku_categories(skus, categories: Optional[Dict[str, str]]) -> pd.Categorical:
+    """Categoría de cada SKU (en el orden de `skus`) como `pd.Categorical`."""
+    categories = categories or {}
+    return pd.Categorical([categories.get(sku) or UNKNOWN_CATEGORY for sku in skus])
+
+
+def fit_predict_global(
+    sales_df: pd.DataFrame,
+    forecast_horizon: int,
+    categories: Optional[Dict[str, str]] = None,
+    n_jobs: Optional[int] = None,
+    timings: Optional[Dict[str, Any]] = None,
+) -> pd.DataFrame:
+    """
+    Entrena un único modelo con todos los SKUs y devuelve las predicciones
+    como DataFrame (fechas futuras × SKUs). Si se pasa `timings`, se rellena
+    con los segundos de `features`, `fit` y `predict`.
+    """
+    timings = {} if timings is None else timings
+    started = time.perf_counter()
+    sku_cats = sku_categories(sales_df.columns, categories)
+    X_train, y_train = build_training_matrix(sales_df, sku_cats)
+    future, X_predict = build_prediction_matrix(sales_df, sku_cats, forecast_horizon)
+    timings["features"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    model = lgb.LGBMRegressor(n_jobs=n_jobs, verbose=-1) if n_jobs else lgb.LGBMRegressor(verbose=-1)
+    model.fit(X_train, y_train, categorical_feature=["sku", "category"])
+    timings["fit"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    predictions = np.maximum(model.predict(X_predict), 0)
+    timings["predict"] = time.perf_counter() - started
+    logging.info(f"Modelo global entrenado con {len(X_train)} filas; {len(X_predict)} predicciones.")
+    return pd.DataFrame(
+        predictions.reshape(forecast_horizon, len(sales_df.columns)),
+        index=future,
+        columns=sales_df.columns,
+    )
+
+
+def forecast_global(
+    tenant_id: str,
+    sales_df: pd.DataFrame,
+    forecast_horizon: int,
+    categories: Optional[Dict[str, str]] = None,
+    timings: Optional[Dict[str, Any]] = None,
+) -> List[dict]:
+    """
+    Pronóstico de todos los SKUs con el modelo global, en el mismo formato
+    (y orden por SKU) que el modo por SKU.
+    """
+    predictions = fit_predict_global(sales_df, forecast_horizon, categories, timings=timings)
+    dates = [ts.date() for ts in predictions.index]
+    return [
+        {
+            "tenant_id": tenant_id,
+            "sku": sku,
+            "date": day,
+            "predicted_qty": float(qty),
+            "model_used": "lightgbm_global",
+        }
+        for sku in predictions.columns
+        for day, qty in zip(dates, predictions[sku].to_numpy())
+    ]
@@ -0,0 +1,207 @@
+# app/jobs/forecast/loader.py
+#
+# Carga compacta del histórico de ventas para el job de pronóstico.
+#
+# En lugar de `fetchall()` + `pivot_table` (una matriz densa fechas × SKUs en
+# float64, casi toda ceros), las filas se leen por bloques de un cursor de
+# servidor ordenadas por (sku, fecha) y se guardan en formato largo con tipos
+# compactos: código de SKU y día como int32 y cantidad como int32. Cada SKU
+# ocupa un tramo contiguo (estilo CSR), así que su serie se puede densificar
+# por separado justo antes de entrenar.
+
+import logging
+from dataclasses import dataclass
+from datetime import date
+from typing import List, Optional, Sequence
+from uuid import UUID
+
+import numpy as np
+import pandas as pd
+
+from app.database import db_connection
+
+# Filas que trae cada `FETCH` del cursor de servidor.
+DEFAULT_LOAD_ITERSIZE = 50000
+
+
+@dataclass(frozen=True)
+class SalesHistory:
+    """
+    Histórico de ventas de un tenant en formato largo, ordenado por SKU y fecha.
+
+    - `skus`: nombre de cada SKU (el código es su posición).
+    - `sku_ptr`: las filas del SKU `i` son `sku_ptr[i]:sku_ptr[i + 1]`.
+    - `days`: días transcurridos desde `start` (int32).
+    - `qty`: cantidad vendida (int32).
+    """
+    skus: np.ndarray
+    sku_ptr: np.ndarray
+    days: np.ndarray
+    qty: np.ndarray
+    start: date
+    n_days: int
+
+    @property
+    def empty(self) -> bool:
+        return len(self.skus) == 0
+
+    @property
+    def n_rows(self) -> int:
+        return len(self.qty)
+
+    @property
+    def nbytes(self) -> int:
+        return self.sku_ptr.nbytes + self.days.nbytes + self.qty.nbytes
+
+    @property
+    def dates(self) -> pd.DatetimeIndex:
+        """Calendario completo (diario) del histórico."""
+        return pd.date_range(self.start, periods=self.n_days, freq="D", name="date")
+
+    def series(self, position: int):
+        """Días y cantidades (sin densificar) del SKU en `position`."""
+        rows = slice(self.sku_ptr[position], self.sku_ptr[position + 1])
+        return self.days[rows], self.qty[rows]
+
+    def dense_series(self, position: int) -> np.ndarray:
+        """Serie diaria completa del SKU, con ceros en los días sin ventas."""
+        days, qty = self.series(position)
+        dense = np.zeros(self.n_days, dtype=np.float64)
+        dense[days] = qty
+        return dense
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Matriz densa fechas × SKUs (float64) como la que devolvía `pivot_table`.
+        Solo la necesitan los modos que trabajan con todos los SKUs a la vez.
+        """
+        matrix = np.zeros((self.n_days, len(self.skus)), dtype=np.float64)
+        codes = np.repeat(np.arange(len(self.skus), dtype=np.int32), np.diff(self.sku_ptr))
+        matrix[self.days, codes] = self.qty
+        return pd.DataFrame(matrix, index=self.dates, columns=pd.Index(self.skus, name="sku"))
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "SalesHistory":
+        """
+        Construye el histórico a partir de una matriz fechas × SKUs
+        (p. ej. en tests o benchmarks). Las fechas deben ser diarias y consecutivas.
+        """
+        values = df.to_numpy()
+        day_idx, sku_idx = np.nonzero(values)
+        order = np.lexsort((day_idx, sku_idx))
+        day_idx, sku_idx = day_idx[order], sku_idx[order]
+        sku_ptr = np.zeros(len(df.columns) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sku_idx, minlength=len(df.columns)), out=sku_ptr[1:])
+        return cls(
+            skus=np.asarray(df.columns, dtype=object),
+            sku_ptr=sku_ptr,
+            days=day_idx.astype(np.int32),
+            qty=values[day_idx, sku_idx].astype(np.int32),
+            start=pd.Timestamp(df.index[0]).date(),
+            n_days=len(df.index),
+        )
+
+
+def build_history(batches, start: Optional[date] = None, end: Optional[date] = None) -> SalesHistory:
+    """
+    Construye un `SalesHistory` a partir de bloques de filas `(sku, date, qty)`
+    ordenadas por SKU y fecha. Solo un bloque vive como tuplas de Python a la vez.
+
+    `start` y `end` fijan el calendario (p. ej. el del tenant completo al cargar
+    solo algunos SKUs); por defecto va de la primera a la última fecha cargada.
+    Las filas fuera de ese calendario se descartan: no tienen posición en la
+    serie densa.
+    """
+    skus: List[str] = []
+    sku_rows: List[int] = []
+    ordinals: List[np.ndarray] = []
+    quantities: List[np.ndarray] = []
+
+    for batch in batches:
+        if start is not None or end is not None:
+            batch = [
+                row for row in batch
+                if (start is None or row[1] >= start) and (end is None or row[1] <= end)
+            ]
+        ordinals.append(np.fromiter((row[1].toordinal() for row in batch), dtype=np.int32, count=len(batch)))
+        quantities.append(np.fromiter((row[2] for row in batch), dtype=np.int32, count=len(batch)))
+        for row in batch:
+            if not skus or skus[-1] != row[0]:
+                skus.append(row[0])
+                sku_rows.append(0)
+            sku_rows[-1] += 1
+
+    if not skus:
+        return SalesHistory(
+            skus=np.array([], dtype=object),
+            sku_ptr=np.zeros(1, dtype=np.int64),
+            days=np.array([], dtype=np.int32),
+            qty=np.array([], dtype=np.int32),
+            start=date.today(),
+            n_days=0,
+        )
+
+    days = np.concatenate(ordinals)
+    first = start.toordinal() if start else int(days.min())
+    last = end.toordinal() if end else int(days.max())
+    days -= first
+
+    sku_ptr = np.zeros(len(skus) + 1, dtype=np.int64)
+    np.cumsum(sku_rows, out=sku_ptr[1:])
+
+    return SalesHistory(
+        skus=np.array(skus, dtype=object),
+        sku_ptr=sku_ptr,
+        days=days,
+        qty=np.concatenate(quantities),
+        start=date.fromordinal(first),
+        n_days=last - first + 1,
+    )
+
+
+def _iter_batches(cursor, itersize: int):
+    while True:
+        batch = cursor.fetchmany(itersize)
+        if not batch:
+            break
+        yield batch
+
+
+def load_sales_history(
+    tenant_id: UUID,
+    skus: Optional[Sequence[str]] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    itersize: int = DEFAULT_LOAD_ITERSIZE,
+) -> SalesHistory:
+    """
+    Lee el histórico de ventas de un tenant con un cursor de servidor
+    (con nombre), de `itersize` filas en `itersize` filas.
+    Con `skus` solo se cargan esos SKUs, y con `start`/`end` solo las fechas
+    de ese calendario (ver `build_history`).
+    """
+    query = "SELECT sku, date, qty FROM sales WHERE tenant_id = %s"
+    params = [str(tenant_id)]
+    if skus is not None:
+        query += " AND sku = ANY(%s)"
+        params.append(list(skus))
+    if start is not None:
+        query += " AND date >= %s"
+        params.append(start)
+    if end is not None:
+        query += " AND date <= %s"
+        params.append(end)
+    query += " ORDER BY sku, date"
+
+    with db_connection() as conn:
+        with conn.cursor(name=f"forecast_sales_{str(tenant_id).replace('-', '')}") as cursor:
+            cursor.itersize = itersize
+            cursor.execute(query, params)
+            history = build_history(_iter_batches(cursor, itersize), start, end)
+        conn.rollback()
+
+    logging.info(
+        f"Histórico cargado para el tenant {tenant_id}: {history.n_rows} filas, "
+        f"{len(history.skus)} SKUs, {history.n_days} días ({history.nbytes / 1024:.1f} KiB)."
+    )
+    return history
@@ -0,0 +1,154 @@
+# app/jobs/forecast/progress.py
+#
+# Instrumentación del job de pronóstico.
+#
+# `ForecastRunStats` acumula el tiempo de cada etapa (marcas de agua, carga,
+# pronóstico, escritura...), contadores (filas cargadas, SKUs, modelos por
+# estrategia) y los tiempos por SKU de características, entrenamiento y
+# predicción. Estos últimos se miden dentro de los procesos del pool y se
+# suman aquí, así que son segundos de CPU agregados, no de reloj.
+#
+# `ProgressReporter` vuelca un resumen del estado en `forecast_jobs.progress`
+# (como mucho cada `FORECAST_PROGRESS_INTERVAL` segundos) para poder seguir el
+# job desde la API mientras se ejecuta.
+
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.database import db_connection
+
+# Segundos mínimos entre dos actualizaciones del progreso en la base de datos.
+FORECAST_PROGRESS_INTERVAL = float(os.getenv("FORECAST_PROGRESS_INTERVAL", "2"))
+
+# Etapas medidas por SKU (ver `forecast_sku`).
+SKU_STAGES = ("features", "fit", "predict")
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "p50": round(float(p50), 4),
+        "p95": round(float(p95), 4),
+        "p99": round(float(p99), 4),
+        "max": round(float(max(values)), 4),
+    }
+
+
+class ForecastRunStats:
+    """Tiempos por etapa y contadores de una ejecución del job."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stage_name: Optional[str] = None
+        self.stages: Dict[str, float] = {}
+        self.sku_stages: Dict[str, float] = {name: 0.0 for name in SKU_STAGES}
+        self.counters: Dict[str, int] = {}
+        self.fit_seconds: List[float] = []
+
+    @contextmanager
+    def stage(self, name: str):
+        """Mide el tiempo de reloj de una etapa (se acumula si se repite)."""
+        previous, self.stage_name = self.stage_name, name
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - started
+            self.stage_name = previous or name
+
+    def count(self, name: str, value: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def record_sku(self, timings: Dict[str, Any]) -> None:
+        """Suma los tiempos de un SKU (los que rellena `forecast_sku`)."""
+        self.record_model(timings, skus=1)
+
+    def record_model(self, timings: Dict[str, Any], skus: int) -> None:
+        """
+        Suma los tiempos de un modelo que pronostica `skus` SKUs: uno en el
+        modo por SKU y todos los del tenant en el modelo global.
+        """
+        for name in SKU_STAGES:
+            self.sku_stages[name] += timings.get(name, 0.0)
+        if "fit" in timings:
+            self.fit_seconds.append(timings["fit"])
+        self.count("skus_done", skus)
+        self.count(f"models_{timings.get('strategy', 'unknown')}")
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def skus_per_second(self) -> Optional[float]:
+        seconds = self.stages.get("forecast")
+        if seconds is None and self.stage_name == "forecast":
+            seconds = self.elapsed - sum(self.stages.values())
+        done = self.counters.get("skus_done", 0)
+        return round(done / seconds, 2) if seconds and done else None
+
+    def summary(self) -> Dict[str, Any]:
+        """Resumen serializable a JSON de la ejecución."""
+        return {
+            "total_seconds": round(self.elapsed, 3),
+            "stages": {name: round(seconds, 3) for name, seconds in self.stages.items()},
+            "sku_stages": {name: round(seconds, 3) for name, seconds in self.sku_stages.items()},
+            "counters": dict(self.counters),
+            "skus_per_second": self.skus_per_second(),
+            "fit_seconds": _percentiles(self.fit_seconds),
+        }
+
+
+class ProgressReporter:
+    """
+    Publica el progreso de un job de la cola en `forecast_jobs.progress`.
+    Sin `job_id` (p. ej. una ejecución directa del job) solo lleva la cuenta.
+    """
+
+    def __init__(self, job_id: Optional[int], stats: ForecastRunStats, interval: float = FORECAST_PROGRESS_INTERVAL):
+        self.job_id = job_id
+        self.stats = stats
+        self.interval = interval
+        self.skus_total = 0
+        self._last_write = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        done = self.stats.counters.get("skus_done", 0)
+        rate = self.stats.skus_per_second()
+        return {
+            "stage": self.stats.stage_name,
+            "skus_done": done,
+            "skus_total": self.skus_total,
+            "elapsed_seconds": round(self.stats.elapsed, 1),
+            "skus_per_second": rate,
+            "eta_seconds": round((self.skus_total - done) / rate, 1) if rate and self.skus_total > done else None,
+        }
+
+    def update(self, force: bool = False, **fields) -> None:
+        """Escribe el progreso si ha pasado `interval` desde la última vez (o si `force`)."""
+        if self.job_id is None:
+            return
+        now = time.monotonic()
+        if not force and self._last_write is not None and now - self._last_write < self.interval:
+            return
+        self._last_write = now
+
+        progress = self.snapshot()
+        progress.update(fields)
+        try:
+            with db_connection() as conn, conn.cursor() as cursor:
+                cursor.execute(
+                    "UPDATE forecast_jobs SET progress = %s WHERE job_id = %s;",
+                    (json.dumps(progress), self.job_id)
+                )
+                conn.commit()
+        except Exception as e:
+            # El progreso es informativo: un fallo al publicarlo no detiene el job.
+            logging.warning(f"No se pudo actualizar el progreso del job {self.job_id}: {e}")
@@ -0,0 +1,225 @@
+# app/jobs/forecast/queue.py
+#
+# Cola persistente de ejecuciones del job de pronóstico (tabla `forecast_jobs`).
+#
+# La API solo encola; el entrenamiento lo hacen procesos worker separados
+# (`app/jobs/forecast/worker.py`), de modo que LightGBM no compite con las
+# peticiones por la CPU ni por el threadpool, y los jobs sobreviven a un
+# reinicio de la API.
+#
+# - Deduplicación: si ya hay un job en cola para el mismo tenant, modo y
+#   horizonte, se devuelve ese en lugar de crear otro.
+# - Reclamación: `FOR UPDATE SKIP LOCKED`, así varios workers se reparten la
+#   cola sin bloquearse entre sí.
+# - Concurrencia por tenant: como mucho `FORECAST_TENANT_CONCURRENCY` jobs en
+#   curso por tenant; el recuento se repite bajo un lock del tenant para que
+#   dos workers no lo superen a la vez.
+# - Jobs huérfanos: si un worker muere, su job deja de enviar latidos y se
+#   vuelve a encolar (hasta `max_attempts` intentos).
+
+import json
+import logging
+import os
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+from uuid import UUID
+
+from app.database import db_connection
+from app.services.rollups import lock_tenant
+
+# Jobs en curso a la vez por tenant.
+FORECAST_TENANT_CONCURRENCY = int(os.getenv("FORECAST_TENANT_CONCURRENCY", "1"))
+# Segundos sin latido tras los que un job en curso se considera huérfano.
+FORECAST_JOB_STALE_SECONDS = int(os.getenv("FORECAST_JOB_STALE_SECONDS", "600"))
+
+JOB_FIELDS = (
+    "job_id", "tenant_id", "mode", "forecast_horizon", "full_refresh", "status",
+    "attempts", "worker", "error", "enqueued_at", "started_at", "finished_at",
+    "progress", "summary",
+)
+
+ENQUEUE_QUERY = """
+    INSERT INTO forecast_jobs (tenant_id, mode, forecast_horizon, full_refresh)
+    VALUES (%s, %s, %s, %s)
+    ON CONFLICT (tenant_id, mode, forecast_horizon) WHERE status = 'queued'
+    DO UPDATE SET full_refresh = forecast_jobs.full_refresh OR EXCLUDED.full_refresh
+    RETURNING job_id, xmax <> 0;
+"""
+
+# Primer job en cola de un tenant que no ha llegado a su límite. Los que otro
+# worker está reclamando en este momento se saltan.
+CLAIM_CANDIDATE_QUERY = """
+    SELECT j.job_id, j.tenant_id
+    FROM forecast_jobs j
+    WHERE j.status = 'queued'
+      AND (SELECT COUNT(*) FROM forecast_jobs r
+           WHERE r.tenant_id = j.tenant_id AND r.status = 'running') < %s
+    ORDER BY j.job_id
+    LIMIT 1
+    FOR UPDATE SKIP LOCKED;
+"""
+
+CLAIM_QUERY = """
+    UPDATE forecast_jobs
+    SET status = 'running', worker = %s, attempts = attempts + 1,
+        started_at = now(), heartbeat_at = now(), error = NULL,
+        progress = NULL, summary = NULL
+    WHERE job_id = %s
+    RETURNING job_id, tenant_id, mode, forecast_horizon, full_refresh, attempts;
+"""
+
+# Un job huérfano vuelve a la cola salvo que haya agotado sus intentos o que ya
+# haya otro idéntico en cola (que lo sustituye). Con más de un job en curso por
+# tenant puede haber varios huérfanos idénticos: solo vuelve a la cola el
+# primero de ellos con intentos restantes (el índice `forecast_jobs_queued_uniq`
+# no admite dos en cola) y el resto se da por fallido. La decisión se toma una
+# sola vez por job para que estado y `finished_at` no se contradigan.
+REQUEUE_STALE_QUERY = """
+    WITH stale AS (
+        SELECT
+            j.job_id,
+            j.attempts < j.max_attempts AND NOT EXISTS (
+                SELECT 1 FROM forecast_jobs q
+                WHERE q.status = 'queued' AND q.tenant_id = j.tenant_id
+                  AND q.mode = j.mode AND q.forecast_horizon = j.forecast_horizon
+            ) AND row_number() OVER (
+                PARTITION BY j.tenant_id, j.mode, j.forecast_horizon
+                ORDER BY j.attempts >= j.max_attempts, j.job_id
+            ) = 1 AS requeue
+        FROM forecast_jobs j
+        WHERE j.status = 'running'
+          AND j.heartbeat_at < now() - make_interval(secs => %s)
+    )
+    UPDATE forecast_jobs j
+    SET status = CASE WHEN s.requeue THEN 'queued' ELSE 'failed' END,
+        error = 'El worker ' || COALESCE(j.worker, '?') || ' dejó de responder.',
+        worker = NULL,
+        finished_at = CASE WHEN s.requeue THEN NULL ELSE now() END
+    FROM stale s
+    WHERE j.job_id = s.job_id
+      AND j.status = 'running'
+    RETURNING j.job_id, j.status;
+"""
+
+
+class ForecastJob(NamedTuple):
+    job_id: int
+    tenant_id: str
+    mode: str
+    forecast_horizon: int
+    full_refresh: bool
+    attempts: int
+
+
+def enqueue_forecast_job(
+    tenant_id: UUID,
+    mode: str,
+    forecast_horizon: int = 14,
+    full_refresh: bool = False,
+) -> Tuple[int, bool]:
+    """
+    Encola una ejecución del job de pronóstico.
+
+    Returns:
+        tuple: `(job_id, deduplicado)`. Si ya había un job idéntico en cola se
+        devuelve ese; un `full_refresh` pedido ahora se le suma.
+    """
+    with db_connection() as conn, conn.cursor() as cursor:
+        cursor.execute(ENQUEUE_QUERY, (str(tenant_id), mode, forecast_horizon, full_refresh))
+        job_id, deduplicated = cursor.fetchone()
+        conn.commit()
+
+    logging.info(
+        f"Job de pronóstico {job_id} {'ya estaba en cola' if deduplicated else 'encolado'} "
+        f"para el tenant {tenant_id} (modo {mode}, horizonte {forecast_horizon})."
+    )
+    return job_id, deduplicated
+
+
+def claim_next_job(worker: str, tenant_limit: int = FORECAST_TENANT_CONCURRENCY) -> Optional[ForecastJob]:
+    """
+    Reclama el siguiente job en cola para `worker` y lo marca como en curso.
+    Devuelve `None` si no hay ninguno disponible.
+    """
+    with db_connection() as conn, conn.cursor() as cursor:
+        cursor.execute(CLAIM_CANDIDATE_QUERY, (tenant_limit,))
+        candidate = cursor.fetchone()
+        if candidate is None:
+            conn.rollback()
+            return None
+
+        job_id, tenant_id = candidate
+        # El recuento de la consulta anterior puede estar desfasado si otro worker
+        # acaba de reclamar un job del mismo tenant: se repite bajo su lock.
+        lock_tenant(cursor, "forecast_jobs", tenant_id)
+        cursor.execute(
+            "SELECT COUNT(*) FROM forecast_jobs WHERE tenant_id = %s AND status = 'running';",
+            (str(tenant_id),)
+        )
+        if cursor.fetchone()[0] >= tenant_limit:
+            conn.rollback()
+            return None
+
+        cursor.execute(CLAIM_QUERY, (worker, job_id))
+        job = ForecastJob(*cursor.fetchone())
+        conn.commit()
+
+    logging.info(f"Worker {worker}: job {job.job_id} reclamado (tenant {job.tenant_id}, intento {job.attempts}).")
+    return job
+
+
+def heartbeat(job_id: int) -> None:
+    """Marca el job como vivo (lo llama periódicamente el worker que lo ejecuta)."""
+    with db_connection() as conn, conn.cursor() as cursor:
+        cursor.execute(
+            "UPDATE forecast_jobs SET heartbeat_at = now() WHERE job_id = %s AND status = 'running';",
+            (job_id,)
+        )
+        conn.commit()
+
+
+def finish_job(job_id: int, error: Optional[str] = None, summary: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Marca el job como terminado con éxito o, si hay `error`, como fallido,
+    y guarda el resumen de la ejecución.
+    """
+    with db_connection() as conn, conn.cursor() as cursor:
+        cursor.execute(
+            """
+            UPDATE forecast_jobs
+            SET status = %s, error = %s, summary = %s, finished_at = now()
+            WHERE job_id = %s;
+            """,
+            ("failed" if error else "succeeded", error, json.dumps(summary) if summary else None, job_id)
+        )
+        conn.commit()
+
+
+def requeue_stale_jobs(stale_seconds: int = FORECAST_JOB_STALE_SECONDS) -> int:
+    """Devuelve a la cola (o da por fallidos) los jobs cuyo worker ha dejado de responder."""
+    with db_connection() as conn, conn.cursor() as cursor:
+        cursor.execute(REQUEUE_STALE_QUERY, (stale_seconds,))
+        rows = cursor.fetchall()
+        conn.commit()
+
+    for job_id, status in rows:
+        logging.warning(f"Job de pronóstico {job_id} huérfano: pasa a '{status}'.")
+    return len(rows)
+
+
+def get_job(job_id: int, tenant_id: UUID) -> Optional[Dict[str, Any]]:
+    """Estado de un job del tenant, o `None` si no existe."""
+    with db_connection() as conn, conn.cursor() as cursor:
+        cursor.execute(
+            f"SELECT {', '.join(JOB_FIELDS)} FROM forecast_jobs WHERE job_id = %s AND tenant_id = %s;",
+            (job_id, str(tenant_id))
+        )
+        row = cursor.fetchone()
+
+    if row is None:
+        return None
+    job = dict(zip(JOB_FIELDS, row))
+    job["tenant_id"] = str(job["tenant_id"])
+    for field in ("enqueued_at", "started_at", "finished_at"):
+        if job[field] is not None:
+            job[field] = job[field].isoformat()
+    return job
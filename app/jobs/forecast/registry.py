@@ -0,0 +1,114 @@
+# app/jobs/forecast/registry.py
+#
+# Registro local de modelos LightGBM del job de pronóstico.
+#
+# Cada booster entrenado se guarda en disco junto a sus metadatos de
+# entrenamiento, con la ruta `<raíz>/<tenant>/<versión de características>/<sku>`.
+# En las siguientes ejecuciones el job puede:
+#   - predecir directamente con el modelo guardado si no hay datos nuevos, o
+#   - seguir entrenándolo (`init_model`) solo con las filas nuevas,
+# en lugar de entrenar desde cero.
+
+import hashlib
+import json
+import logging
+import os
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime, timezone
+from typing import List, Optional, Tuple
+from urllib.parse import quote
+
+import lightgbm as lgb
+import numpy as np
+
+# Directorio raíz del registro. Por defecto, `var/models` en la raíz del
+# proyecto (no en el directorio de trabajo del worker, que puede variar).
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+FORECAST_MODEL_DIR = os.path.abspath(os.getenv("FORECAST_MODEL_DIR", os.path.join(PROJECT_ROOT, "var", "models")))
+
+
+def series_checksum(values: np.ndarray) -> str:
+    """Huella de una serie de entrenamiento, para detectar correcciones del histórico."""
+    return hashlib.blake2b(np.ascontiguousarray(values, dtype=np.float64).tobytes(), digest_size=16).hexdigest()
+
+
+@dataclass
+class ModelMetadata:
+    """Metadatos de entrenamiento de un modelo guardado."""
+    tenant_id: str
+    sku: str
+    feature_version: str
+    features: List[str]
+    trained_until: date
+    train_rows: int
+    train_checksum: str
+    num_trees: int
+    warm_starts: int = 0
+    created_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+
+    def to_json(self) -> str:
+        data = asdict(self)
+        data["trained_until"] = self.trained_until.isoformat()
+        return json.dumps(data, indent=2)
+
+    @classmethod
+    def from_json(cls, raw: str) -> "ModelMetadata":
+        data = json.loads(raw)
+        data["trained_until"] = date.fromisoformat(data["trained_until"])
+        return cls(**data)
+
+
+class ModelRegistry:
+    """
+    Almacén de modelos en el sistema de ficheros. Solo guarda la ruta raíz,
+    así que se puede enviar a los procesos del pool.
+    """
+
+    def __init__(self, root: str = FORECAST_MODEL_DIR):
+        self.root = root
+
+    def _paths(self, tenant_id: str, sku: str, feature_version: str) -> Tuple[str, str]:
+        directory = os.path.join(self.root, str(tenant_id), feature_version)
+        base = os.path.join(directory, quote(sku, safe=""))
+        return base + ".txt", base + ".json"
+
+    def load(self, tenant_id: str, sku: str, feature_version: str) -> Optional[Tuple[lgb.Booster, ModelMetadata]]:
+        """Devuelve el modelo guardado y sus metadatos, o `None` si no existe o no es legible."""
+        model_path, meta_path = self._paths(tenant_id, sku, feature_version)
+        if not (os.path.exists(model_path) and os.path.exists(meta_path)):
+            return None
+        try:
+            with open(meta_path, encoding="utf-8") as fh:
+                metadata = ModelMetadata.from_json(fh.read())
+            return lgb.Booster(model_file=model_path), metadata
+        except Exception as e:
+            logging.warning(f"No se pudo cargar el modelo guardado de SKU {sku}: {e}")
+            return None
+
+    def save(self, booster: lgb.Booster, metadata: ModelMetadata) -> None:
+        """
+        Guarda el modelo y sus metadatos. Se escriben en ficheros temporales y
+        se renombran, para que un lector nunca vea un modelo a medio escribir.
+        """
+        model_path, meta_path = self._paths(metadata.tenant_id, metadata.sku, metadata.feature_version)
+        os.makedirs(os.path.dirname(model_path), exist_ok=True)
+
+        booster.save_model(model_path + ".tmp")
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as fh:
+            fh.write(metadata.to_json())
+        os.replace(model_path + ".tmp", model_path)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    def delete(self, tenant_id: str, sku: str, feature_version: str) -> None:
+        for path in self._paths(tenant_id, sku, feature_version):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def delete_skus(self, tenant_id: str, skus: List[str]) -> None:
+        """Borra los modelos de `skus` del tenant en todas las versiones de características."""
+        tenant_dir = os.path.join(self.root, str(tenant_id))
+        if not skus or not os.path.isdir(tenant_dir):
+            return
+        for feature_version in os.listdir(tenant_dir):
+            for sku in skus:
+                self.delete(tenant_id, sku, feature_version)
@@ -0,0 +1,137 @@
+# app/jobs/forecast/watermarks.py
+#
+# Marcas de agua por SKU para el pronóstico incremental.
+#
+# Para cada SKU se resume su histórico de ventas en (primera fecha, última
+# fecha, nº de filas, checksum de las filas). El job compara ese resumen con
+# el guardado en `forecast_watermarks` tras el último ajuste y solo vuelve a
+# entrenar los SKUs que han cambiado; el resto conserva sus predicciones.
+#
+# El resumen se lee antes que las ventas, y la carga se limita a los SKUs con
+# marca y a las fechas entre la primera y la última de las marcas. Lo que entre
+# entre ambas lecturas dentro de esa ventana se usa ya, con la marca guardada
+# "por detrás" de los datos, así que el SKU se recalcula en la siguiente
+# ejecución; los SKUs nuevos y las fechas fuera de la ventana se ignoran hasta
+# entonces.
+
+import logging
+from datetime import date
+from typing import Dict, Iterable, List, NamedTuple
+from uuid import UUID
+
+from app.database import db_connection
+
+# El checksum cubre fecha y cantidad de cada fila, así que detecta también
+# correcciones de filas ya existentes (un UPSERT que cambia `qty`).
+SALES_WATERMARKS_QUERY = """
+    SELECT sku, MIN(date), MAX(date), COUNT(*),
+           md5(string_agg(date::text || ':' || qty::text, ',' ORDER BY date))
+    FROM sales
+    WHERE tenant_id = %s
+    GROUP BY sku
+    ORDER BY sku;
+"""
+
+
+class SkuWatermark(NamedTuple):
+    first_date: date
+    last_date: date
+    row_count: int
+    checksum: str
+
+
+class StoredWatermark(NamedTuple):
+    watermark: SkuWatermark
+    mode: str
+    forecast_horizon: int
+
+
+def fetch_sales_watermarks(tenant_id: UUID) -> Dict[str, SkuWatermark]:
+    """Resumen actual de las ventas de cada SKU del tenant."""
+    with db_connection() as conn, conn.cursor() as cursor:
+        cursor.execute(SALES_WATERMARKS_QUERY, (str(tenant_id),))
+        return {
+            sku: SkuWatermark(first_date, last_date, row_count, checksum)
+            for sku, first_date, last_date, row_count, checksum in cursor.fetchall()
+        }
+
+
+def fetch_stored_watermarks(tenant_id: UUID) -> Dict[str, StoredWatermark]:
+    """Marcas guardadas en el último ajuste de cada SKU del tenant."""
+    with db_connection() as conn, conn.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT sku, first_date, last_date, row_count, checksum, mode, forecast_horizon
+            FROM forecast_watermarks
+            WHERE tenant_id = %s;
+            """,
+            (str(tenant_id),)
+        )
+        return {
+            row[0]: StoredWatermark(SkuWatermark(*row[1:5]), row[5], row[6])
+            for row in cursor.fetchall()
+        }
+
+
+def changed_skus(
+    current: Dict[str, SkuWatermark],
+    stored: Dict[str, StoredWatermark],
+    mode: str,
+    forecast_horizon: int,
+) -> List[str]:
+    """
+    SKUs que hay que volver a entrenar: los nuevos, los que tienen ventas
+    distintas y los que se ajustaron con otro modo u otro horizonte.
+    """
+    return sorted(
+        sku for sku, watermark in current.items()
+        if sku not in stored
+        or stored[sku].watermark != watermark
+        or stored[sku].mode != mode
+        or stored[sku].forecast_horizon != forecast_horizon
+    )
+
+
+def save_watermarks(
+    cursor,
+    tenant_id: UUID,
+    watermarks: Dict[str, SkuWatermark],
+    mode: str,
+    forecast_horizon: int,
+) -> None:
+    """
+    Guarda las marcas de los SKUs recalculados. Se ejecuta en la misma
+    transacción que la escritura de las predicciones.
+    """
+    if not watermarks:
+        return
+    cursor.executemany(
+        """
+        INSERT INTO forecast_watermarks
+            (tenant_id, sku, first_date, last_date, row_count, checksum, mode, forecast_horizon, updated_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, now())
+        ON CONFLICT (tenant_id, sku) DO UPDATE
+        SET first_date = EXCLUDED.first_date,
+            last_date = EXCLUDED.last_date,
+            row_count = EXCLUDED.row_count,
+            checksum = EXCLUDED.checksum,
+            mode = EXCLUDED.mode,
+            forecast_horizon = EXCLUDED.forecast_horizon,
+            updated_at = EXCLUDED.updated_at;
+        """,
+        [
+            (str(tenant_id), sku, *watermark, mode, forecast_horizon)
+            for sku, watermark in watermarks.items()
+        ]
+    )
+    logging.info(f"Guardadas {len(watermarks)} marcas de agua para el tenant: {tenant_id}")
+
+
+def delete_watermarks(cursor, tenant_id: UUID, skus: Iterable[str]) -> None:
+    """Elimina las marcas de SKUs que ya no tienen ventas."""
+    skus = list(skus)
+    if skus:
+        cursor.execute(
+            "DELETE FROM forecast_watermarks WHERE tenant_id = %s AND sku = ANY(%s);",
+            (str(tenant_id), skus)
+        )
@@ -0,0 +1,154 @@
+# app/jobs/forecast/worker.py
+#
+# Procesos worker de la cola de pronósticos (`app/jobs/forecast/queue.py`).
+# Se ejecutan aparte de la API:
+#
+#     python -m app.jobs.forecast.worker --processes 2
+#
+# Cada proceso tiene su propio pool de conexiones, reclama jobs de la cola y
+# los ejecuta con `run_forecast_job` mientras envía latidos desde un hilo.
+# El paralelismo dentro de cada job lo fija `FORECAST_WORKERS`; conviene que
+# `--processes × FORECAST_WORKERS` no supere el número de CPUs.
+# Con FORECAST_WORKER_METRICS_PORT, el proceso `i` publica sus métricas
+# (duración de los jobs y de sus etapas) en el puerto `FORECAST_WORKER_METRICS_PORT + i`.
+
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+
+from app.database import close_db_pool, init_db_pool
+from app.jobs.forecast.job import FORECAST_MP_START_METHOD, run_forecast_job
+from app.jobs.forecast.queue import claim_next_job, finish_job, heartbeat, requeue_stale_jobs
+from app.services.metrics import record_forecast_job, serve_metrics
+
+# Procesos worker por defecto.
+FORECAST_QUEUE_WORKERS = int(os.getenv("FORECAST_QUEUE_WORKERS", "2"))
+# Segundos de espera entre consultas a la cola cuando está vacía.
+FORECAST_QUEUE_POLL_SECONDS = float(os.getenv("FORECAST_QUEUE_POLL_SECONDS", "2"))
+# Segundos entre latidos de un job en curso.
+FORECAST_JOB_HEARTBEAT_SECONDS = float(os.getenv("FORECAST_JOB_HEARTBEAT_SECONDS", "30"))
+# Puerto base de las métricas de los workers (0 = no se publican).
+FORECAST_WORKER_METRICS_PORT = int(os.getenv("FORECAST_WORKER_METRICS_PORT", "0"))
+
+
+def _heartbeat_loop(job_id: int, stop: threading.Event, interval: float):
+    while not stop.wait(interval):
+        try:
+            heartbeat(job_id)
+        except Exception as e:
+            logging.warning(f"No se pudo enviar el latido del job {job_id}: {e}")
+
+
+def process_next_job(worker: str, heartbeat_interval: float = FORECAST_JOB_HEARTBEAT_SECONDS) -> bool:
+    """
+    Reclama y ejecuta un job de la cola. Devuelve `False` si no había ninguno.
+    """
+    job = claim_next_job(worker)
+    if job is None:
+        return False
+
+    stop = threading.Event()
+    beat = threading.Thread(target=_heartbeat_loop, args=(job.job_id, stop, heartbeat_interval), daemon=True)
+    beat.start()
+    started = time.perf_counter()
+    try:
+        summary = run_forecast_job(
+            job.tenant_id,
+            forecast_horizon=job.forecast_horizon,
+            mode=job.mode,
+            full_refresh=job.full_refresh,
+            job_id=job.job_id,
+        )
+    except Exception as e:
+        record_forecast_job(job.mode, "failed", time.perf_counter() - started)
+        finish_job(job.job_id, error=str(e) or type(e).__name__)
+    else:
+        record_forecast_job(job.mode, "succeeded", time.perf_counter() - started, summary.get("stages"))
+        finish_job(job.job_id, summary=summary)
+    finally:
+        stop.set()
+        beat.join()
+    return True
+
+
+def worker_loop(
+    worker: str,
+    stop=None,
+    poll_interval: float = FORECAST_QUEUE_POLL_SECONDS,
+    metrics_port: int = 0,
+):
+    """
+    Bucle de un proceso worker: ejecuta jobs mientras los haya y, con la cola
+    vacía, espera `poll_interval` segundos. Termina cuando se activa `stop`.
+    Con `metrics_port` publica sus métricas en ese puerto.
+    """
+    stop = stop or multiprocessing.Event()
+    if multiprocessing.parent_process() is not None:
+        # Ctrl+C llega a todo el grupo de procesos: la parada la coordina el proceso principal.
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+    metrics_server = serve_metrics(metrics_port) if metrics_port else None
+    init_db_pool()
+    logging.info(f"Worker {worker} iniciado.")
+    try:
+        while not stop.is_set():
+            # Un fallo al recuperar huérfanos no debe impedir reclamar jobs.
+            try:
+                requeue_stale_jobs()
+            except Exception as e:
+                logging.error(f"Worker {worker}: error al recuperar jobs huérfanos: {e}", exc_info=True)
+            try:
+                if process_next_job(worker):
+                    continue
+            except Exception as e:
+                logging.error(f"Worker {worker}: error al procesar la cola: {e}", exc_info=True)
+            stop.wait(poll_interval)
+    finally:
+        close_db_pool()
+        if metrics_server is not None:
+            metrics_server.shutdown()
+        logging.info(f"Worker {worker} detenido.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Procesos worker de la cola de pronósticos.")
+    parser.add_argument("--processes", type=int, default=FORECAST_QUEUE_WORKERS)
+    parser.add_argument("--poll-interval", type=float, default=FORECAST_QUEUE_POLL_SECONDS)
+    parser.add_argument(
+        "--metrics-port", type=int, default=FORECAST_WORKER_METRICS_PORT,
+        help="Puerto base de las métricas (el proceso i usa el puerto base + i; 0 = sin métricas).",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    context = multiprocessing.get_context(FORECAST_MP_START_METHOD)
+    stop = context.Event()
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+    processes = [
+        context.Process(
+            target=worker_loop,
+            args=(f"{prefix}/{i}", stop, args.poll_interval, args.metrics_port + i if args.metrics_port else 0),
+            name=f"forecast-worker-{i}",
+        )
+        for i in range(args.processes)
+    ]
+
+    def shutdown(signum, frame):
+        logging.info("Deteniendo los workers; los jobs en curso terminarán antes de salir.")
+        stop.set()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
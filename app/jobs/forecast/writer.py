@@ -0,0 +1,118 @@
+# app/jobs/forecast/writer.py
+#
+# Escritura de los pronósticos con versionado por ejecución.
+#
+# Antes se hacía `DELETE` + `executemany(INSERT ...)`: un viaje de ida y vuelta
+# por fila y, mientras duraba, los lectores veían la tabla vacía o a medias.
+# Ahora cada ejecución obtiene un `run_id`, sus filas se envían con
+# `COPY ... FROM STDIN` y las de los SKUs que no se han recalculado se copian
+# de la ejecución anterior dentro del servidor. Al final, en la misma
+# transacción, se mueve el puntero `forecast_current_run` del tenant: los
+# lectores (que filtran por el `run_id` vigente) pasan de la ejecución
+# anterior completa a la nueva completa, sin estados intermedios. Al confirmar
+# se emite `NOTIFY forecast_runs` para que la API actualice sus ETags.
+
+import logging
+from typing import Iterable, Optional, Sequence
+from uuid import UUID
+
+from app.services.bulk import CopyRowStream
+from app.services.rollups import lock_tenant
+
+FORECAST_COLUMNS = ("tenant_id", "sku", "date", "predicted_qty", "model_used", "run_id")
+
+# Canal por el que se anuncian las ejecuciones publicadas (payload `<tenant_id>:<run_id>`).
+FORECAST_RUNS_CHANNEL = "forecast_runs"
+
+
+def write_forecast_run(
+    cursor,
+    tenant_id: UUID,
+    forecast_results: Iterable[dict],
+    replaced_skus: Sequence[str],
+    mode: str,
+    forecast_horizon: int,
+) -> int:
+    """
+    Escribe una ejecución completa del job y la publica como la vigente.
+    No hace `commit`: el llamador lo hace junto con el resto de cambios
+    (p. ej. las marcas de agua), de modo que todo se publica a la vez.
+
+    Args:
+        forecast_results: Predicciones nuevas (las de los SKUs recalculados).
+        replaced_skus: SKUs cuyas predicciones anteriores no se conservan
+            (los recalculados y los que ya no tienen ventas).
+
+    Returns:
+        int: El `run_id` de la nueva ejecución.
+    """
+    tenant = str(tenant_id)
+    # Dos ejecuciones simultáneas del mismo tenant no deben basarse en la misma ejecución anterior.
+    lock_tenant(cursor, "forecasts", tenant_id)
+
+    cursor.execute("SELECT run_id FROM forecast_current_run WHERE tenant_id = %s", (tenant,))
+    current = cursor.fetchone()
+    previous_run = current[0] if current else None
+
+    cursor.execute(
+        "INSERT INTO forecast_runs (tenant_id, mode, forecast_horizon, skus_refit) "
+        "VALUES (%s, %s, %s, %s) RETURNING run_id",
+        (tenant, mode, forecast_horizon, len(replaced_skus)),
+    )
+    run_id = cursor.fetchone()[0]
+
+    stream = CopyRowStream(
+        (r["tenant_id"], r["sku"], r["date"], r["predicted_qty"], r["model_used"], run_id)
+        for r in forecast_results
+    )
+    cursor.copy_expert(f"COPY forecasts ({', '.join(FORECAST_COLUMNS)}) FROM STDIN", stream)
+    rows_written = stream.rows_written
+
+    # Los SKUs sin cambios conservan sus predicciones: se copian a la nueva ejecución.
+    if previous_run is not None:
+        cursor.execute(
+            f"""
+            INSERT INTO forecasts ({', '.join(FORECAST_COLUMNS)})
+            SELECT tenant_id, sku, date, predicted_qty, model_used, %s
+            FROM forecasts
+            WHERE tenant_id = %s AND run_id = %s AND NOT (sku = ANY(%s))
+            """,
+            (run_id, tenant, previous_run, list(replaced_skus)),
+        )
+        rows_written += max(cursor.rowcount, 0)
+
+    cursor.execute("UPDATE forecast_runs SET rows_written = %s WHERE run_id = %s", (rows_written, run_id))
+    cursor.execute(
+        """
+        INSERT INTO forecast_current_run (tenant_id, run_id, updated_at)
+        VALUES (%s, %s, now())
+        ON CONFLICT (tenant_id) DO UPDATE SET run_id = EXCLUDED.run_id, updated_at = now()
+        """,
+        (tenant, run_id),
+    )
+    # Postgres solo entrega la notificación si la transacción se confirma.
+    cursor.execute("SELECT pg_notify(%s, %s)", (FORECAST_RUNS_CHANNEL, f"{tenant}:{run_id}"))
+
+    logging.info(
+        f"Ejecución {run_id} del tenant {tenant_id} escrita: {stream.rows_written} predicciones nuevas, "
+        f"{rows_written - stream.rows_written} conservadas de la ejecución {previous_run}."
+    )
+    return run_id
+
+
+def purge_previous_runs(conn, tenant_id: UUID, run_id: int) -> Optional[int]:
+    """
+    Borra las filas de las ejecuciones anteriores a `run_id` una vez publicada.
+    Las consultas que ya estaban en curso siguen viendo su instantánea (MVCC),
+    así que no afecta a los lectores. Solo borra ejecuciones más antiguas, por si
+    otra posterior ya se hubiera publicado mientras tanto.
+    """
+    with conn.cursor() as cursor:
+        lock_tenant(cursor, "forecasts", tenant_id)
+        cursor.execute(
+            "DELETE FROM forecasts WHERE tenant_id = %s AND (run_id IS NULL OR run_id < %s)",
+            (str(tenant_id), run_id),
+        )
+        deleted = cursor.rowcount
+    conn.commit()
+    return deleted
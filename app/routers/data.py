@@ -1,160 +1,187 @@
 # app/routers/data.py
 
-from fastapi import APIRouter, HTTPException, status, Depends
-from app.database import get_db_connection # Usamos la nueva dependencia
+from fastapi import APIRouter, HTTPException, Query, status, Depends
+from fastapi.responses import StreamingResponse
+from app.async_database import get_async_db_connection # Pool asíncrono (psycopg 3)
 from app.services.analytics import (
     get_total_sales_for_tenant, 
     get_total_inventory_for_tenant,
     get_sales_by_channel_for_tenant,
-    get_total_inventory_value_for_tenant
+    get_sales_by_sku_for_tenant,
+    get_sales_by_location_for_tenant,
+    get_total_inventory_value_for_tenant,
+    get_dashboard_summary_for_tenant
+)
+from app.services.auth import authorize_tenant
+from app.services.columnar import COLUMNAR_MEDIA_TYPES, columnar_available
+from app.services.raw_data import (
+    DATASETS,
+    DEFAULT_EXPORT_ITERSIZE,
+    DEFAULT_PAGE_SIZE,
+    EXPORT_MEDIA_TYPES,
+    MAX_PAGE_SIZE,
+    fetch_page,
+    parse_fields,
+    stream_export,
 )
-from app.services.auth import oauth2_scheme, verify_token
 import logging
+from datetime import date
+from typing import List, Literal, Optional
 from uuid import UUID
-import psycopg2 # Necesario para el type hinting de la conexión
+from psycopg import AsyncConnection # Necesario para el type hinting de la conexión
 
 # Crea una instancia de APIRouter.
 router = APIRouter()
 
 # --- NOTA IMPORTANTE ---
-# Para que los endpoints de analytics funcionen, deberás actualizar las funciones 
-# en `app/services/analytics.py` para que acepten `conn` como primer argumento.
-# Por ejemplo: def get_total_sales_for_tenant(conn, tenant_id: UUID):
+# Todos los endpoints de este router son `async` y usan el pool asíncrono,
+# por lo que no bloquean el event loop ni ocupan hilos del threadpool.
+# Las funciones de `app/services/analytics.py` son corutinas que reciben `conn`
+# como primer argumento, por ejemplo:
+#     async def get_total_sales_for_tenant(conn, tenant_id: UUID):
+# La autenticación y la comprobación del tenant las hace la dependencia
+# `authorize_tenant` (con caché de tokens verificados en `app/services/auth.py`).
 # -------------------------
 
-@router.get("/sales/{tenant_id}", status_code=status.HTTP_200_OK)
-def get_sales_data(
-    tenant_id: UUID, 
-    token: str = Depends(oauth2_scheme),
-    conn: psycopg2.extensions.connection = Depends(get_db_connection)
-):
+async def _fetch_dataset_page(conn, dataset_name, tenant_id, fields, date_from, date_to, skus, cursor, limit):
     """
-    Obtiene todos los registros de ventas para un `tenant_id` específico.
-    Requiere un token de autenticación y usa una conexión del pool.
+    Lógica común de los endpoints de datos en bruto: valida la proyección
+    y el cursor y obtiene una página del dataset.
     """
-    payload = verify_token(token)
-    if str(payload.get("tenant_id")) != str(tenant_id):
+    dataset = DATASETS[dataset_name]
+    try:
+        selected = parse_fields(dataset, fields)
+        return await fetch_page(conn, dataset, tenant_id, selected, date_from, date_to, skus, cursor, limit)
+    except ValueError as e:
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="No tienes permiso para acceder a estos datos."
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
         )
-
-    try:
-        with conn.cursor() as cur:
-            query = "SELECT date, sku, qty, price, channel, tenant_id FROM sales WHERE tenant_id = %s;"
-            cur.execute(query, (str(tenant_id),))
-            records = cur.fetchall()
-            
-            sales_records = [
-                {
-                    "date": record[0], "sku": record[1], "qty": record[2],
-                    "price": record[3], "channel": record[4], "tenant_id": record[5]
-                }
-                for record in records
-            ]
-            return {"data": sales_records}
-
     except Exception as e:
-        logging.error(f"Error while retrieving sales data: {e}")
+        logging.error(f"Error while retrieving {dataset_name} data: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
         )
 
-@router.get("/products/{tenant_id}", status_code=status.HTTP_200_OK)
-def get_products_data(
+@router.get("/sales/{tenant_id}", status_code=status.HTTP_200_OK)
+async def get_sales_data(
     tenant_id: UUID, 
-    token: str = Depends(oauth2_scheme),
-    conn: psycopg2.extensions.connection = Depends(get_db_connection)
+    payload: dict = Depends(authorize_tenant),
+    conn: AsyncConnection = Depends(get_async_db_connection),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    sku: Optional[List[str]] = Query(None),
+    fields: Optional[str] = None,
 ):
     """
-    Obtiene todos los registros de productos para un `tenant_id` específico.
-    """
-    payload = verify_token(token)
-    if str(payload.get("tenant_id")) != str(tenant_id):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="No tienes permiso para acceder a estos datos."
-        )
+    Obtiene los registros de ventas para un `tenant_id` específico, paginados por `(date, sku)`.
+    Requiere un token de autenticación y usa una conexión del pool.
 
-    try:
-        with conn.cursor() as cur:
-            query = "SELECT sku, name, category, price, description, tenant_id FROM products WHERE tenant_id = %s;"
-            cur.execute(query, (str(tenant_id),))
-            records = cur.fetchall()
-            
-            products_records = [
-                {
-                    "sku": record[0], "name": record[1], "category": record[2],
-                    "price": record[3], "description": record[4], "tenant_id": record[5]
-                }
-                for record in records
-            ]
-            return {"data": products_records}
+    - **limit**: Tamaño máximo de la página.
+    - **cursor**: Valor `next_cursor` de la página anterior.
+    - **date_from** / **date_to**: Rango de fechas (inclusivo).
+    - **sku**: Uno o varios SKUs (`?sku=A&sku=B`).
+    - **fields**: Columnas a devolver, separadas por comas (p. ej. `sku,qty,price`).
+    """
+    return await _fetch_dataset_page(
+        conn, "sales", tenant_id, fields, date_from, date_to, sku, cursor, limit
+    )
 
-    except Exception as e:
-        logging.error(f"Error while retrieving products data: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=str(e)
-        )
+@router.get("/products/{tenant_id}", status_code=status.HTTP_200_OK)
+async def get_products_data(
+    tenant_id: UUID, 
+    payload: dict = Depends(authorize_tenant),
+    conn: AsyncConnection = Depends(get_async_db_connection),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sku: Optional[List[str]] = Query(None),
+    fields: Optional[str] = None,
+):
+    """
+    Obtiene los registros de productos para un `tenant_id` específico, paginados por `sku`.
+    Admite los parámetros `limit`, `cursor`, `sku` y `fields`.
+    """
+    return await _fetch_dataset_page(
+        conn, "products", tenant_id, fields, None, None, sku, cursor, limit
+    )
         
 @router.get("/inventory/{tenant_id}", status_code=status.HTTP_200_OK)
-def get_inventory_data(
+async def get_inventory_data(
     tenant_id: UUID, 
-    token: str = Depends(oauth2_scheme),
-    conn: psycopg2.extensions.connection = Depends(get_db_connection)
+    payload: dict = Depends(authorize_tenant),
+    conn: AsyncConnection = Depends(get_async_db_connection),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    sku: Optional[List[str]] = Query(None),
+    fields: Optional[str] = None,
+):
+    """
+    Obtiene los registros de inventario para un `tenant_id` específico,
+    paginados por `(date, sku, location)`.
+    Admite los parámetros `limit`, `cursor`, `date_from`, `date_to`, `sku` y `fields`.
+    """
+    return await _fetch_dataset_page(
+        conn, "inventory", tenant_id, fields, date_from, date_to, sku, cursor, limit
+    )
+
+@router.get("/{dataset}/{tenant_id}/export", status_code=status.HTTP_200_OK)
+async def export_dataset(
+    dataset: Literal["sales", "inventory", "products"],
+    tenant_id: UUID,
+    payload: dict = Depends(authorize_tenant),
+    fmt: Literal["ndjson", "csv", "arrow", "parquet"] = Query("ndjson", alias="format"),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    sku: Optional[List[str]] = Query(None),
+    fields: Optional[str] = None,
+    itersize: int = Query(DEFAULT_EXPORT_ITERSIZE, ge=100, le=50_000),
 ):
     """
-    Obtiene todos los registros de inventario para un `tenant_id` específico.
+    Exporta en streaming todo el histórico de un dataset como NDJSON, CSV,
+    Arrow IPC stream (`arrow`) o Parquet (`parquet`).
+
+    Las filas se leen con un cursor de servidor y se envían por bloques de
+    `itersize`, por lo que la memoria es constante y el primer byte llega
+    antes de que termine la consulta. Admite los mismos filtros y la misma
+    proyección (`fields`) que los endpoints paginados.
     """
-    payload = verify_token(token)
-    if str(payload.get("tenant_id")) != str(tenant_id):
+    if fmt in COLUMNAR_MEDIA_TYPES and not columnar_available():
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="No tienes permiso para acceder a estos datos."
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="El formato columnar requiere 'pyarrow' en el servidor."
         )
 
+    spec = DATASETS[dataset]
     try:
-        with conn.cursor() as cur:
-            query = "SELECT date, sku, qty, location, tenant_id FROM inventory WHERE tenant_id = %s;"
-            cur.execute(query, (str(tenant_id),))
-            records = cur.fetchall()
-
-            inventory_records = [
-                {
-                    "date": record[0], "sku": record[1], "qty": record[2],
-                    "location": record[3], "tenant_id": record[4]
-                }
-                for record in records
-            ]
-            return {"data": inventory_records}
-
-    except Exception as e:
-        logging.error(f"Error while retrieving inventory data: {e}")
+        selected = parse_fields(spec, fields)
+    except ValueError as e:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
 
+    return StreamingResponse(
+        stream_export(spec, tenant_id, selected, fmt, date_from, date_to, sku, itersize),
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{dataset}_{tenant_id}.{fmt}"'},
+    )
+
 @router.get("/analytics/total_sales/{tenant_id}", status_code=status.HTTP_200_OK)
-def get_total_sales(
+async def get_total_sales(
     tenant_id: UUID, 
-    token: str = Depends(oauth2_scheme),
-    conn: psycopg2.extensions.connection = Depends(get_db_connection)
+    payload: dict = Depends(authorize_tenant),
+    conn: AsyncConnection = Depends(get_async_db_connection)
 ):
     """
     Endpoint para obtener las ventas totales de un cliente.
     """
-    payload = verify_token(token)
-    if str(payload.get("tenant_id")) != str(tenant_id):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="No tienes permiso para acceder a estos datos."
-        )
-
     try:
-        total_sales = get_total_sales_for_tenant(conn, tenant_id)
+        total_sales = await get_total_sales_for_tenant(conn, tenant_id)
         return {"total_sales": total_sales}
     except Exception as e:
         logging.error(f"Error in total sales analytics endpoint: {e}")
@@ -164,23 +191,16 @@ def get_total_sales(
         )
 
 @router.get("/analytics/total_inventory/{tenant_id}", status_code=status.HTTP_200_OK)
-def get_total_inventory(
+async def get_total_inventory(
     tenant_id: UUID, 
-    token: str = Depends(oauth2_scheme),
-    conn: psycopg2.extensions.connection = Depends(get_db_connection)
+    payload: dict = Depends(authorize_tenant),
+    conn: AsyncConnection = Depends(get_async_db_connection)
 ):
     """
     Endpoint para obtener el inventario total de un cliente.
     """
-    payload = verify_token(token)
-    if str(payload.get("tenant_id")) != str(tenant_id):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="No tienes permiso para acceder a estos datos."
-        )
-
     try:
-        total_inventory = get_total_inventory_for_tenant(conn, tenant_id)
+        total_inventory = await get_total_inventory_for_tenant(conn, tenant_id)
         return {"total_inventory": total_inventory}
     except Exception as e:
         logging.error(f"Error in total inventory analytics endpoint: {e}")
@@ -190,53 +210,102 @@ def get_total_inventory(
         )
 
 @router.get("/analytics/sales_by_channel/{tenant_id}", status_code=status.HTTP_200_OK)
-def get_sales_by_channel(
+async def get_sales_by_channel(
     tenant_id: UUID, 
-    token: str = Depends(oauth2_scheme),
-    conn: psycopg2.extensions.connection = Depends(get_db_connection)
+    payload: dict = Depends(authorize_tenant),
+    conn: AsyncConnection = Depends(get_async_db_connection)
 ):
     """
     Endpoint para obtener las ventas por canal de un cliente.
+
+    Agrupa por la columna `channel` de `sales`. Antes agrupaba por la
+    ubicación del inventario (`inventory.location`); ese reparto está ahora
+    en `/analytics/sales_by_location`, sin multiplicar las ventas por el
+    número de fotos de inventario.
     """
-    payload = verify_token(token)
-    if str(payload.get("tenant_id")) != str(tenant_id):
+    try:
+        sales_by_channel = await get_sales_by_channel_for_tenant(conn, tenant_id)
+        return {"sales_by_channel": sales_by_channel}
+    except Exception as e:
+        logging.error(f"Error in sales by channel analytics endpoint: {e}")
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="No tienes permiso para acceder a estos datos."
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
         )
 
+@router.get("/analytics/sales_by_sku/{tenant_id}", status_code=status.HTTP_200_OK)
+async def get_sales_by_sku(
+    tenant_id: UUID, 
+    payload: dict = Depends(authorize_tenant),
+    conn: AsyncConnection = Depends(get_async_db_connection)
+):
+    """
+    Endpoint para obtener las ventas por SKU de un cliente.
+    """
     try:
-        sales_by_channel = get_sales_by_channel_for_tenant(conn, tenant_id)
-        return {"sales_by_channel": sales_by_channel}
+        sales_by_sku = await get_sales_by_sku_for_tenant(conn, tenant_id)
+        return {"sales_by_sku": sales_by_sku}
     except Exception as e:
-        logging.error(f"Error in sales by channel analytics endpoint: {e}")
+        logging.error(f"Error in sales by SKU analytics endpoint: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
         )
 
-@router.get("/analytics/total_inventory_value/{tenant_id}", status_code=status.HTTP_200_OK)
-def get_total_inventory_value(
+@router.get("/analytics/sales_by_location/{tenant_id}", status_code=status.HTTP_200_OK)
+async def get_sales_by_location(
     tenant_id: UUID, 
-    token: str = Depends(oauth2_scheme),
-    conn: psycopg2.extensions.connection = Depends(get_db_connection)
+    payload: dict = Depends(authorize_tenant),
+    conn: AsyncConnection = Depends(get_async_db_connection)
 ):
     """
-    Endpoint para obtener el valor total del inventario de un cliente.
+    Endpoint para obtener las ventas repartidas por ubicación de inventario de un cliente.
     """
-    payload = verify_token(token)
-    if str(payload.get("tenant_id")) != str(tenant_id):
+    try:
+        sales_by_location = await get_sales_by_location_for_tenant(conn, tenant_id)
+        return {"sales_by_location": sales_by_location}
+    except Exception as e:
+        logging.error(f"Error in sales by location analytics endpoint: {e}")
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="No tienes permiso para acceder a estos datos."
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
         )
 
+@router.get("/analytics/total_inventory_value/{tenant_id}", status_code=status.HTTP_200_OK)
+async def get_total_inventory_value(
+    tenant_id: UUID, 
+    payload: dict = Depends(authorize_tenant),
+    conn: AsyncConnection = Depends(get_async_db_connection)
+):
+    """
+    Endpoint para obtener el valor total del inventario de un cliente.
+    """
     try:
-        total_value = get_total_inventory_value_for_tenant(conn, tenant_id)
+        total_value = await get_total_inventory_value_for_tenant(conn, tenant_id)
         return {"total_inventory_value": total_value}
     except Exception as e:
         logging.error(f"Error in total inventory value analytics endpoint: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
-        )
\ No newline at end of file
+        )
+
+@router.get("/analytics/summary/{tenant_id}", status_code=status.HTTP_200_OK)
+async def get_dashboard_summary(
+    tenant_id: UUID, 
+    payload: dict = Depends(authorize_tenant),
+    conn: AsyncConnection = Depends(get_async_db_connection)
+):
+    """
+    Endpoint para obtener todos los KPIs del dashboard en una sola petición:
+    ventas totales, inventario total, valor del inventario y ventas por canal
+    y por ubicación.
+    """
+    try:
+        return await get_dashboard_summary_for_tenant(conn, tenant_id)
+    except Exception as e:
+        logging.error(f"Error in dashboard summary analytics endpoint: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
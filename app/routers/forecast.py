@@ -1,14 +1,18 @@
 # app/routers/forecast.py
 #
-# Este archivo define el endpoint de la API para iniciar el job de pronóstico.
-# Se ha corregido para incluir una instancia de APIRouter.
+# Este archivo define los endpoints de la API para encolar el job de pronóstico
+# y consultar su estado. El job lo ejecutan los workers de
+# `app/jobs/forecast/worker.py`, no el proceso de la API.
 
 import os
+from typing import Literal, Optional
 from uuid import UUID
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, Query
 from pydantic import ValidationError
 
-from app.jobs.forecast.job import run_forecast_job
+from app.database import DatabaseUnavailableError
+from app.jobs.forecast.job import FORECAST_INCREMENTAL, resolve_forecast_mode
+from app.jobs.forecast.queue import enqueue_forecast_job, get_job
 
 # =============================================================================
 # Corrección del error de importación.
@@ -26,36 +30,78 @@ def verify_secret(secret: str) -> bool:
     """
     return secret == FORECAST_SECRET
 
-@router.post("/forecast/run")
-async def run_forecast(
+@router.post("/forecast/run", status_code=202)
+def run_forecast(
     tenant_id: UUID,
     secret: str,
-    background_tasks: BackgroundTasks
+    mode: Optional[Literal["per_sku", "global"]] = None,
+    full_refresh: Optional[bool] = None,
+    forecast_horizon: int = Query(14, ge=1, le=365)
 ):
     """
-    Endpoint para iniciar el job de pronóstico para un cliente (tenant) específico.
+    Endpoint para encolar el job de pronóstico de un cliente (tenant) específico.
     
-    Este endpoint está protegido por una clave secreta. El job se ejecuta
-    como una tarea de fondo para no bloquear la respuesta de la API.
+    Este endpoint está protegido por una clave secreta. El job se guarda en
+    la cola persistente y lo ejecuta un proceso worker, así que la respuesta
+    no espera al entrenamiento. Si ya había un job idéntico en cola, se
+    devuelve ese (`deduplicated: true`).
     
     - **tenant_id**: El ID del cliente para el cual se ejecutará el pronóstico.
     - **secret**: La clave secreta para autenticar la petición.
+    - **mode**: `per_sku` (un modelo por SKU) o `global` (un único modelo para
+      todos los SKUs). Por defecto, el configurado para el tenant.
+    - **full_refresh**: recalcula todos los SKUs, no solo los que tienen ventas nuevas.
+    - **forecast_horizon**: días a pronosticar.
     """
     if not verify_secret(secret):
         raise HTTPException(status_code=403, detail="Acceso denegado: Clave secreta inválida.")
         
     try:
-        # Añade la función del job a las tareas de fondo.
-        background_tasks.add_task(run_forecast_job, tenant_id=tenant_id)
+        mode = resolve_forecast_mode(tenant_id, mode)
+        if full_refresh is None:
+            full_refresh = not FORECAST_INCREMENTAL
+        job_id, deduplicated = enqueue_forecast_job(tenant_id, mode, forecast_horizon, full_refresh)
         
-        return {"message": "Job de pronóstico iniciado en segundo plano."}
+        return {
+            "message": "Job de pronóstico encolado.",
+            "job_id": job_id,
+            "status": "queued",
+            "deduplicated": deduplicated,
+            "mode": mode,
+        }
     except ValidationError as e:
         raise HTTPException(
             status_code=422,
             detail=f"Error de validación: {e.errors()}"
         )
+    except DatabaseUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error interno del servidor: {e}"
         )
+
+@router.get("/forecast/jobs/{job_id}")
+def get_forecast_job(job_id: int, tenant_id: UUID, secret: str):
+    """
+    Endpoint para consultar el estado de un job de pronóstico
+    (`queued`, `running`, `succeeded` o `failed`).
+
+    Mientras se ejecuta, `progress` indica la etapa, los SKUs procesados, el
+    ritmo y el tiempo estimado restante; al terminar, `summary` guarda los
+    tiempos por etapa y los contadores de la ejecución.
+    """
+    if not verify_secret(secret):
+        raise HTTPException(status_code=403, detail="Acceso denegado: Clave secreta inválida.")
+
+    try:
+        job = get_job(job_id, tenant_id)
+    except DatabaseUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error interno del servidor: {e}")
+
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No existe el job {job_id} para el cliente con ID: {tenant_id}")
+    return job
@@ -2,21 +2,34 @@
 #
 # Define el endpoint para la ingesta de datos de inventario.
 
-from fastapi import APIRouter, HTTPException, status
-from app.models.inventory import InventoryData
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from app.models.inventory import InventoryData, InventoryRecord
 from app.services.inventory import ingest_inventory_data
+from app.services.bulk import ingest_stats_headers
+from app.services.streaming import (
+    DEFAULT_BATCH_SIZE,
+    StreamValidationError,
+    resolve_stream_format,
+    stream_ingest,
+)
+from typing import Literal, Optional
+from uuid import UUID
 import logging
 
 # Crea una instancia de APIRouter.
 router = APIRouter()
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
-def ingest_inventory(inventory_data: InventoryData):
+def ingest_inventory(inventory_data: InventoryData, response: Response, bulk: bool = False):
     """
     Ingesta un conjunto de registros de inventario.
+
+    - **bulk**: Si es `true`, usa la ruta `COPY FROM STDIN` para cargas masivas.
+    Las métricas de rendimiento se devuelven en las cabeceras `X-Ingest-*`.
     """
     try:
-        ingest_inventory_data(inventory_data)
+        stats = ingest_inventory_data(inventory_data, bulk=bulk)
+        response.headers.update(ingest_stats_headers(stats))
         return {"message": "Inventory data ingested successfully."}
     except Exception as e:
         logging.error(f"Error in inventory ingestion endpoint: {e}")
@@ -24,3 +37,51 @@ def ingest_inventory(inventory_data: InventoryData):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
         )
+
+@router.post("/stream", status_code=status.HTTP_201_CREATED)
+async def ingest_inventory_stream(
+    request: Request,
+    response: Response,
+    tenant_id: UUID,
+    fmt: Optional[Literal["ndjson", "csv"]] = Query(None, alias="format"),
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=100_000),
+):
+    """
+    Ingesta en streaming un cuerpo NDJSON o CSV de registros de inventario.
+
+    El cuerpo se valida y se escribe por lotes a medida que llega, sin
+    construir nunca la lista completa de registros en memoria.
+
+    - **tenant_id**: El ID del cliente al que pertenecen los registros.
+    - **format**: `ndjson` o `csv`. Si se omite, se deduce del `Content-Type`.
+    - **batch_size**: Número de filas que se validan y escriben en cada lote.
+    """
+    fmt = resolve_stream_format(fmt, request.headers.get("content-type"))
+
+    def flush(batch):
+        ingest_inventory_data(InventoryData.model_construct(tenant_id=tenant_id, data=batch), bulk=True)
+
+    try:
+        stats = await stream_ingest(request.stream(), fmt, InventoryRecord, flush, batch_size)
+    except StreamValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={
+                "line": e.line_number,
+                "errors": e.errors,
+                "rows_committed": e.rows_committed,
+            }
+        )
+    except Exception as e:
+        logging.error(f"Error in inventory streaming ingestion endpoint: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+    response.headers.update(ingest_stats_headers(stats))
+    return {
+        "message": "Inventory data streamed successfully.",
+        "rows": stats["rows"],
+        "batches": stats["batches"],
+    }
@@ -2,21 +2,34 @@
 #
 # Define el endpoint para la ingesta de datos de productos.
 
-from fastapi import APIRouter, HTTPException, status
-from app.models.products import ProductsData
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from app.models.products import ProductsData, ProductRecord
 from app.services.products import ingest_products_data
+from app.services.bulk import ingest_stats_headers
+from app.services.streaming import (
+    DEFAULT_BATCH_SIZE,
+    StreamValidationError,
+    resolve_stream_format,
+    stream_ingest,
+)
+from typing import Literal, Optional
+from uuid import UUID
 import logging
 
 # Crea una instancia de APIRouter.
 router = APIRouter()
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
-def ingest_products(products_data: ProductsData):
+def ingest_products(products_data: ProductsData, response: Response, bulk: bool = False):
     """
     Ingesta un conjunto de registros de productos.
+
+    - **bulk**: Si es `true`, usa la ruta `COPY FROM STDIN` para cargas masivas.
+    Las métricas de rendimiento se devuelven en las cabeceras `X-Ingest-*`.
     """
     try:
-        ingest_products_data(products_data)
+        stats = ingest_products_data(products_data, bulk=bulk)
+        response.headers.update(ingest_stats_headers(stats))
         return {"message": "Products data ingested successfully."}
     except Exception as e:
         logging.error(f"Error in products ingestion endpoint: {e}")
@@ -24,3 +37,51 @@ def ingest_products(products_data: ProductsData):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
         )
+
+@router.post("/stream", status_code=status.HTTP_201_CREATED)
+async def ingest_products_stream(
+    request: Request,
+    response: Response,
+    tenant_id: UUID,
+    fmt: Optional[Literal["ndjson", "csv"]] = Query(None, alias="format"),
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=100_000),
+):
+    """
+    Ingesta en streaming un cuerpo NDJSON o CSV de registros de productos.
+
+    El cuerpo se valida y se escribe por lotes a medida que llega, sin
+    construir nunca la lista completa de registros en memoria.
+
+    - **tenant_id**: El ID del cliente al que pertenecen los registros.
+    - **format**: `ndjson` o `csv`. Si se omite, se deduce del `Content-Type`.
+    - **batch_size**: Número de filas que se validan y escriben en cada lote.
+    """
+    fmt = resolve_stream_format(fmt, request.headers.get("content-type"))
+
+    def flush(batch):
+        ingest_products_data(ProductsData.model_construct(tenant_id=tenant_id, data=batch), bulk=True)
+
+    try:
+        stats = await stream_ingest(request.stream(), fmt, ProductRecord, flush, batch_size)
+    except StreamValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={
+                "line": e.line_number,
+                "errors": e.errors,
+                "rows_committed": e.rows_committed,
+            }
+        )
+    except Exception as e:
+        logging.error(f"Error in products streaming ingestion endpoint: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+    response.headers.update(ingest_stats_headers(stats))
+    return {
+        "message": "Products data streamed successfully.",
+        "rows": stats["rows"],
+        "batches": stats["batches"],
+    }
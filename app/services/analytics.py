@@ -2,12 +2,23 @@
 #
 # Este archivo contiene la lógica de negocio para los cálculos analíticos.
 # ¡MODIFICADO! para aceptar una conexión a la BD en lugar de crear una nueva.
+# Las funciones son asíncronas y reciben una conexión del pool asíncrono (psycopg 3).
+
+# Los KPIs se leen de las tablas de agregados `sales_daily_rollup` e
+# `inventory_sku_rollup` (ver `app/services/rollups.py`), que las ingestas
+# mantienen al día, en lugar de recorrer `sales` e `inventory` completas.
+#
+# Los resultados se guardan en la caché analítica (`app/services/cache.py`) y se
+# invalidan cuando una ingesta modifica las tablas de las que dependen.
 
 import logging
 from uuid import UUID
-import psycopg2
+from psycopg import AsyncConnection
+
+from app.services.cache import cached_metric
 
-def get_total_sales_for_tenant(conn: psycopg2.extensions.connection, tenant_id: UUID):
+@cached_metric("total_sales")
+async def get_total_sales_for_tenant(conn: AsyncConnection, tenant_id: UUID):
     """
     Calcula las ventas totales de un cliente (`tenant_id`).
     Usa la conexión a la base de datos proporcionada.
@@ -16,11 +27,11 @@ def get_total_sales_for_tenant(conn: psycopg2.extensions.connection, tenant_id:
     
     try:
         # Usa 'with' para gestionar el cursor automáticamente
-        with conn.cursor() as cur:
+        async with conn.cursor() as cur:
             # Consulta parametrizada para seguridad
-            query = "SELECT SUM(qty * price) FROM sales WHERE tenant_id = %s;"
-            cur.execute(query, (str(tenant_id),))
-            total_sales = cur.fetchone()[0]
+            query = "SELECT SUM(revenue) FROM sales_daily_rollup WHERE tenant_id = %s;"
+            await cur.execute(query, (str(tenant_id),))
+            total_sales = (await cur.fetchone())[0]
             
             return float(total_sales) if total_sales is not None else 0.0
 
@@ -28,17 +39,18 @@ def get_total_sales_for_tenant(conn: psycopg2.extensions.connection, tenant_id:
         logging.error(f"Error while calculating total sales: {e}")
         raise e
 
-def get_total_inventory_for_tenant(conn: psycopg2.extensions.connection, tenant_id: UUID):
+@cached_metric("total_inventory")
+async def get_total_inventory_for_tenant(conn: AsyncConnection, tenant_id: UUID):
     """
     Calcula el total de unidades de inventario de un cliente (`tenant_id`).
     """
     logging.info(f"Calculating total inventory for tenant_id: {tenant_id}")
     
     try:
-        with conn.cursor() as cur:
-            query = "SELECT SUM(qty) FROM inventory WHERE tenant_id = %s;"
-            cur.execute(query, (str(tenant_id),))
-            total_inventory = cur.fetchone()[0]
+        async with conn.cursor() as cur:
+            query = "SELECT SUM(qty) FROM inventory_sku_rollup WHERE tenant_id = %s;"
+            await cur.execute(query, (str(tenant_id),))
+            total_inventory = (await cur.fetchone())[0]
             
             return int(total_inventory) if total_inventory is not None else 0
 
@@ -46,54 +58,202 @@ def get_total_inventory_for_tenant(conn: psycopg2.extensions.connection, tenant_
         logging.error(f"Error while calculating total inventory: {e}")
         raise e
 
-def get_sales_by_channel_for_tenant(conn: psycopg2.extensions.connection, tenant_id: UUID):
+# Ventas por canal de venta (columna `channel` de `sales`). No necesita
+# el inventario, así que el coste solo depende del nº de (día, SKU, canal).
+SALES_BY_CHANNEL_QUERY = """
+    SELECT channel, SUM(revenue)
+    FROM sales_daily_rollup
+    WHERE tenant_id = %(tenant_id)s
+    GROUP BY channel;
+"""
+
+# Ventas por SKU, también desde el rollup diario: el gráfico del dashboard
+# recibe un total por SKU en vez de sumar en el navegador una página de filas.
+SALES_BY_SKU_QUERY = """
+    SELECT sku, SUM(revenue)
+    FROM sales_daily_rollup
+    WHERE tenant_id = %(tenant_id)s
+    GROUP BY sku;
+"""
+
+# Ventas por ubicación. Cada lado se agrega antes de unirlos: las ventas por
+# SKU y el inventario por (SKU, ubicación), así que el JOIN es de SKUs × ubicaciones
+# y no de ventas × fotos de inventario. Los ingresos de un SKU se reparten entre
+# sus ubicaciones según la proporción de unidades en inventario (o a partes
+# iguales entre sus fotos si no hay unidades), de modo que la suma por ubicación
+# nunca supera las ventas reales del SKU.
+SALES_BY_LOCATION_QUERY = """
+    WITH sales_by_sku AS (
+        SELECT sku, SUM(revenue) AS revenue
+        FROM sales_daily_rollup
+        WHERE tenant_id = %(tenant_id)s
+        GROUP BY sku
+    ),
+    location_share AS (
+        SELECT
+            sku, location,
+            COALESCE(
+                qty::numeric / NULLIF(SUM(qty) OVER (PARTITION BY sku), 0),
+                snapshots::numeric / NULLIF(SUM(snapshots) OVER (PARTITION BY sku), 0)
+            ) AS share
+        FROM inventory_sku_rollup
+        WHERE tenant_id = %(tenant_id)s
+    )
+    SELECT l.location, SUM(s.revenue * l.share)
+    FROM sales_by_sku s
+    JOIN location_share l ON s.sku = l.sku
+    GROUP BY l.location;
+"""
+
+
+async def _fetch_breakdown(conn: AsyncConnection, query: str, tenant_id: UUID) -> dict:
+    async with conn.cursor() as cur:
+        await cur.execute(query, {"tenant_id": str(tenant_id)})
+        results = await cur.fetchall()
+
+    return {
+        key: float(total) if total is not None else 0.0
+        for key, total in results
+    }
+
+@cached_metric("sales_by_channel")
+async def get_sales_by_channel_for_tenant(conn: AsyncConnection, tenant_id: UUID):
     """
-    Calcula las ventas totales agrupadas por canal (ubicación) para un cliente.
+    Calcula las ventas totales agrupadas por canal de venta (`sales.channel`)
+    para un cliente. Las ventas por ubicación de inventario, que es lo que
+    devolvía antes esta métrica, están en `get_sales_by_location_for_tenant`.
     """
     logging.info(f"Calculating sales by channel for tenant_id: {tenant_id}")
 
     try:
-        with conn.cursor() as cur:
-            query = """
-                SELECT i.location, SUM(s.qty * s.price)
-                FROM sales s
-                JOIN inventory i ON s.sku = i.sku AND s.tenant_id = i.tenant_id
-                WHERE s.tenant_id = %s
-                GROUP BY i.location;
-            """
-            cur.execute(query, (str(tenant_id),))
-            results = cur.fetchall()
-
-            sales_by_channel = {
-                location: float(total_sales) if total_sales is not None else 0.0
-                for location, total_sales in results
-            }
-            
-            return sales_by_channel
+        return await _fetch_breakdown(conn, SALES_BY_CHANNEL_QUERY, tenant_id)
 
     except Exception as e:
         logging.error(f"Error while calculating sales by channel: {e}")
         raise e
+
+@cached_metric("sales_by_sku")
+async def get_sales_by_sku_for_tenant(conn: AsyncConnection, tenant_id: UUID):
+    """
+    Calcula las ventas totales agrupadas por SKU para un cliente.
+    """
+    logging.info(f"Calculating sales by SKU for tenant_id: {tenant_id}")
+
+    try:
+        return await _fetch_breakdown(conn, SALES_BY_SKU_QUERY, tenant_id)
+
+    except Exception as e:
+        logging.error(f"Error while calculating sales by SKU: {e}")
+        raise e
+
+@cached_metric("sales_by_location")
+async def get_sales_by_location_for_tenant(conn: AsyncConnection, tenant_id: UUID):
+    """
+    Calcula las ventas totales repartidas por ubicación de inventario para un cliente.
+    """
+    logging.info(f"Calculating sales by location for tenant_id: {tenant_id}")
+
+    try:
+        return await _fetch_breakdown(conn, SALES_BY_LOCATION_QUERY, tenant_id)
+
+    except Exception as e:
+        logging.error(f"Error while calculating sales by location: {e}")
+        raise e
         
-def get_total_inventory_value_for_tenant(conn: psycopg2.extensions.connection, tenant_id: UUID):
+@cached_metric("total_inventory_value")
+async def get_total_inventory_value_for_tenant(conn: AsyncConnection, tenant_id: UUID):
     """
     Calcula el valor monetario total del inventario para un cliente.
     """
     logging.info(f"Calculating total inventory value for tenant_id: {tenant_id}")
 
     try:
-        with conn.cursor() as cur:
+        async with conn.cursor() as cur:
             query = """
                 SELECT SUM(i.qty * p.price)
-                FROM inventory i
+                FROM inventory_sku_rollup i
                 JOIN products p ON i.sku = p.sku AND i.tenant_id = p.tenant_id
                 WHERE i.tenant_id = %s;
             """
-            cur.execute(query, (str(tenant_id),))
-            total_value = cur.fetchone()[0]
+            await cur.execute(query, (str(tenant_id),))
+            total_value = (await cur.fetchone())[0]
 
             return float(total_value) if total_value is not None else 0.0
 
     except Exception as e:
         logging.error(f"Error while calculating total inventory value: {e}")
-        raise e
\ No newline at end of file
+        raise e
+
+@cached_metric("summary")
+async def get_dashboard_summary_for_tenant(conn: AsyncConnection, tenant_id: UUID):
+    """
+    Calcula en una sola consulta todos los KPIs del dashboard de un cliente:
+    ventas totales, inventario total, valor del inventario y ventas por canal
+    y por ubicación.
+
+    Parte de las tablas de agregados: las ventas se agregan por SKU y el
+    inventario ya está agregado por (SKU, ubicación), y los KPIs se derivan de ellos.
+    Los resultados coinciden con los de las funciones individuales.
+    """
+    logging.info(f"Calculating dashboard summary for tenant_id: {tenant_id}")
+
+    try:
+        async with conn.cursor() as cur:
+            query = """
+                WITH sales_by_sku AS (
+                    SELECT sku, SUM(revenue) AS revenue
+                    FROM sales_daily_rollup
+                    WHERE tenant_id = %(tenant_id)s
+                    GROUP BY sku
+                ),
+                by_channel AS (
+                    SELECT channel, SUM(revenue) AS total
+                    FROM sales_daily_rollup
+                    WHERE tenant_id = %(tenant_id)s
+                    GROUP BY channel
+                ),
+                location_share AS (
+                    SELECT
+                        sku, location, qty,
+                        COALESCE(
+                            qty::numeric / NULLIF(SUM(qty) OVER (PARTITION BY sku), 0),
+                            snapshots::numeric / NULLIF(SUM(snapshots) OVER (PARTITION BY sku), 0)
+                        ) AS share
+                    FROM inventory_sku_rollup
+                    WHERE tenant_id = %(tenant_id)s
+                ),
+                by_location AS (
+                    SELECT l.location, SUM(s.revenue * l.share) AS total
+                    FROM sales_by_sku s
+                    JOIN location_share l ON s.sku = l.sku
+                    GROUP BY l.location
+                )
+                SELECT
+                    (SELECT SUM(revenue) FROM sales_by_sku),
+                    (SELECT SUM(qty) FROM location_share),
+                    (SELECT SUM(l.qty * p.price)
+                     FROM location_share l
+                     JOIN products p ON l.sku = p.sku AND p.tenant_id = %(tenant_id)s),
+                    (SELECT json_object_agg(channel, total) FROM by_channel),
+                    (SELECT json_object_agg(location, total) FROM by_location);
+            """
+            await cur.execute(query, {"tenant_id": str(tenant_id)})
+            total_sales, total_inventory, total_value, by_channel, by_location = await cur.fetchone()
+
+            return {
+                "total_sales": float(total_sales) if total_sales is not None else 0.0,
+                "total_inventory": int(total_inventory) if total_inventory is not None else 0,
+                "total_inventory_value": float(total_value) if total_value is not None else 0.0,
+                "sales_by_channel": {
+                    channel: float(total) if total is not None else 0.0
+                    for channel, total in (by_channel or {}).items()
+                },
+                "sales_by_location": {
+                    location: float(total) if total is not None else 0.0
+                    for location, total in (by_location or {}).items()
+                },
+            }
+
+    except Exception as e:
+        logging.error(f"Error while calculating dashboard summary: {e}")
+        raise e
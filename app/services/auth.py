@@ -2,12 +2,23 @@
 #
 # Este archivo contiene la lógica de negocio para la autenticación y validación de tokens.
 # En un entorno de producción, las credenciales del usuario se validarían contra una base de datos.
+#
+# Un token ya verificado se guarda en una caché LRU acotada (clave: hash SHA-256
+# del token, nunca el token en claro) hasta su `exp`, de modo que las peticiones
+# siguientes con el mismo token no repiten la verificación HMAC. Los endpoints
+# usan la dependencia `authorize_tenant`, que valida el token y comprueba el
+# tenant una sola vez por petición.
 
-from fastapi import HTTPException, status
+from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from typing import Optional
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
 from jose import jwt, JWTError
+import hashlib
 import logging
+import os
+import threading
+import time
 from uuid import UUID
 
 # Clave secreta para firmar los tokens. ¡Debería ser una variable de entorno en producción!
@@ -17,6 +28,11 @@ ALGORITHM = "HS256"
 # Esquema de autenticación. Indica que la API espera un token de portador.
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
+# Caché de tokens verificados. Los tokens sin `exp` se guardan como mucho
+# `AUTH_TOKEN_CACHE_TTL` segundos; con `AUTH_TOKEN_CACHE_SIZE=0` se desactiva.
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "4096"))
+AUTH_TOKEN_CACHE_TTL = float(os.getenv("AUTH_TOKEN_CACHE_TTL", "300"))
+
 # Simulación de un usuario en un entorno de desarrollo.
 # `tenant_id` es el UUID del cliente.
 # En una aplicación real, esta información vendría de una base de datos.
@@ -36,12 +52,80 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+class VerifiedTokenCache:
+    """
+    Caché LRU de payloads de tokens ya verificados, segura entre hilos.
+    Cada entrada caduca en el `exp` del token o, si no tiene, a los `ttl`
+    segundos. Solo se guardan tokens válidos.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = AUTH_TOKEN_CACHE_SIZE,
+        ttl: float = AUTH_TOKEN_CACHE_TTL,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[bytes, Tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self.key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > self._clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(entry[1])
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, token: str, payload: dict) -> None:
+        if self.max_entries <= 0:
+            return
+        expires_at = self._clock() + self.ttl
+        if isinstance(payload.get("exp"), (int, float)):
+            expires_at = min(expires_at, payload["exp"])
+        key = self.key(token)
+        with self._lock:
+            self._entries[key] = (expires_at, dict(payload))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+token_cache = VerifiedTokenCache()
+
 def verify_token(token: str) -> Optional[dict]:
     """
     Verifica la validez de un token JWT y devuelve sus datos.
+    Si el token ya se verificó y no ha caducado, se devuelve desde la caché.
     """
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        token_cache.set(token, payload)
         return payload
     except JWTError as e:
         logging.error(f"Error validating JWT token: {e}")
@@ -50,3 +134,24 @@ def verify_token(token: str) -> Optional[dict]:
             detail="Token inválido o expirado",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+async def get_token_payload(token: str = Depends(oauth2_scheme)) -> dict:
+    """
+    Dependencia de FastAPI: datos del token de la petición, ya verificado.
+    Es una corutina para no pasar por el threadpool (la verificación es
+    corta y, casi siempre, un acierto de la caché).
+    """
+    return verify_token(token)
+
+async def authorize_tenant(tenant_id: UUID, payload: dict = Depends(get_token_payload)) -> dict:
+    """
+    Dependencia de FastAPI: comprueba que el token pertenece al `tenant_id`
+    de la ruta y devuelve sus datos. FastAPI la resuelve una sola vez por
+    petición aunque la usen varias dependencias.
+    """
+    if str(payload.get("tenant_id")) != str(tenant_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tienes permiso para acceder a estos datos."
+        )
+    return payload
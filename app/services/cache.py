@@ -0,0 +1,274 @@
+# app/services/cache.py
+#
+# Caché de resultados analíticos por cliente (tenant).
+# Los agregados del dashboard solo cambian cuando llega una ingesta, así que se
+# guardan en memoria (LRU con TTL y límite de tamaño) con la clave
+# (tenant, métrica, argumentos). Cada ingesta correcta invalida únicamente las
+# métricas de ese tenant que dependen de la tabla modificada.
+#
+# El backend es intercambiable (`set_cache_backend`): la implementación por
+# defecto vive en el proceso, por lo que con varios workers de uvicorn cada uno
+# tiene su propia caché y solo ve las invalidaciones de sus propias ingestas;
+# en ese caso conviene un backend compartido o un TTL corto.
+
+import os
+import time
+import pickle
+import logging
+import threading
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, Iterable, Set, Tuple
+
+from app.services.metrics import metrics, set_cache_stats
+
+# Configuración de la caché.
+ANALYTICS_CACHE_ENABLED = os.getenv("ANALYTICS_CACHE_ENABLED", "true").lower() == "true"
+ANALYTICS_CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", "300"))
+ANALYTICS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYTICS_CACHE_MAX_ENTRIES", "1024"))
+ANALYTICS_CACHE_MAX_BYTES = int(os.getenv("ANALYTICS_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+# Tablas de las que depende cada métrica. Una ingesta en una tabla invalida
+# solo las métricas que la leen.
+METRIC_DEPENDENCIES: Dict[str, Set[str]] = {
+    "total_sales": {"sales"},
+    "total_inventory": {"inventory"},
+    "sales_by_channel": {"sales"},
+    "sales_by_sku": {"sales"},
+    "sales_by_location": {"sales", "inventory"},
+    "total_inventory_value": {"inventory", "products"},
+    "summary": {"sales", "inventory", "products"},
+}
+
+CacheKey = Tuple[str, str, Tuple[Any, ...]]
+
+
+class CacheBackend:
+    """
+    Interfaz de un backend de caché. Las claves son tuplas
+    `(tenant_id, metric, args)`.
+    """
+
+    def get(self, key: CacheKey) -> Tuple[bool, Any]:
+        """Devuelve `(True, valor)` si la clave existe y no ha caducado."""
+        raise NotImplementedError
+
+    def set(self, key: CacheKey, value: Any, ttl: float) -> None:
+        raise NotImplementedError
+
+    def delete_metrics(self, tenant_id: str, metrics: Iterable[str]) -> int:
+        """Elimina las entradas de esas métricas del tenant y devuelve cuántas había."""
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def info(self) -> Dict[str, Any]:
+        return {}
+
+
+class InMemoryLRUCache(CacheBackend):
+    """
+    Caché LRU en memoria con caducidad por entrada y un límite de entradas
+    y de bytes (estimados a partir del tamaño serializado del valor).
+    Es segura entre hilos, ya que las ingestas invalidan desde el threadpool.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = ANALYTICS_CACHE_MAX_ENTRIES,
+        max_bytes: int = ANALYTICS_CACHE_MAX_BYTES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._entries: "OrderedDict[CacheKey, Tuple[float, int, Any]]" = OrderedDict()
+        self._by_tenant: Dict[str, Set[CacheKey]] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: CacheKey) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, _, value = entry
+            if expires_at <= self._clock():
+                self._remove(key)
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key: CacheKey, value: Any, ttl: float) -> None:
+        size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (self._clock() + ttl, size, value)
+            self._by_tenant.setdefault(key[0], set()).add(key)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key: CacheKey) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+        tenant_keys = self._by_tenant.get(key[0])
+        if tenant_keys is not None:
+            tenant_keys.discard(key)
+            if not tenant_keys:
+                del self._by_tenant[key[0]]
+
+    def delete_metrics(self, tenant_id: str, metrics: Iterable[str]) -> int:
+        metrics = set(metrics)
+        with self._lock:
+            keys = [key for key in self._by_tenant.get(tenant_id, ()) if key[1] in metrics]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_tenant.clear()
+            self._bytes = 0
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+            }
+
+
+class AnalyticsCache:
+    """
+    Fachada de la caché analítica: cuenta aciertos y fallos por métrica e
+    invalida con precisión por tenant y tabla.
+
+    Cada tenant tiene un contador de generación que se incrementa en cada
+    invalidación; un cálculo que empezó antes de una ingesta no se guarda,
+    para no dejar en caché un valor obsoleto.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float = ANALYTICS_CACHE_TTL, enabled: bool = ANALYTICS_CACHE_ENABLED):
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        self.invalidations = 0
+
+    def _count(self, counters: Dict[str, int], metric: str) -> None:
+        with self._lock:
+            counters[metric] = counters.get(metric, 0) + 1
+
+    async def get_or_compute(
+        self,
+        tenant_id: Any,
+        metric: str,
+        args: Tuple[Any, ...],
+        compute: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """
+        Devuelve el valor en caché o lo calcula con `compute` y lo guarda.
+        """
+        if not self.enabled:
+            return await compute()
+
+        tenant = str(tenant_id)
+        key = (tenant, metric, args)
+        hit, value = self.backend.get(key)
+        if hit:
+            self._count(self.hits, metric)
+            return value
+
+        self._count(self.misses, metric)
+        generation = self._generations.get(tenant, 0)
+        value = await compute()
+        if self._generations.get(tenant, 0) == generation:
+            self.backend.set(key, value, self.ttl)
+        return value
+
+    def invalidate(self, tenant_id: Any, tables: Iterable[str]) -> int:
+        """
+        Invalida las métricas del tenant que dependen de alguna de `tables`.
+        """
+        tables = set(tables)
+        metrics = [metric for metric, deps in METRIC_DEPENDENCIES.items() if deps & tables]
+        tenant = str(tenant_id)
+        with self._lock:
+            self._generations[tenant] = self._generations.get(tenant, 0) + 1
+            self.invalidations += 1
+        removed = self.backend.delete_metrics(tenant, metrics)
+        logging.info(f"Invalidated {removed} cached analytics entries for tenant_id: {tenant} (tables: {', '.join(sorted(tables))}).")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de aciertos/fallos e información del backend."""
+        with self._lock:
+            hits = dict(self.hits)
+            misses = dict(self.misses)
+            invalidations = self.invalidations
+        total_hits = sum(hits.values())
+        total_misses = sum(misses.values())
+        lookups = total_hits + total_misses
+        return {
+            "enabled": self.enabled,
+            "ttl": self.ttl,
+            "hits": total_hits,
+            "misses": total_misses,
+            "hit_ratio": round(total_hits / lookups, 4) if lookups else 0.0,
+            "invalidations": invalidations,
+            "by_metric": {
+                metric: {"hits": hits.get(metric, 0), "misses": misses.get(metric, 0)}
+                for metric in sorted(set(hits) | set(misses))
+            },
+            "backend": self.backend.info(),
+        }
+
+
+# Instancia global usada por los servicios de analítica e ingesta.
+analytics_cache = AnalyticsCache(InMemoryLRUCache())
+
+
+def _collect_cache_metrics():
+    """Contadores de la caché para `/metrics` (se calculan en cada scrape)."""
+    set_cache_stats(analytics_cache.stats())
+
+metrics.register_collector(_collect_cache_metrics)
+
+def set_cache_backend(backend: CacheBackend) -> None:
+    """Sustituye el backend de la caché analítica (p. ej. por uno compartido)."""
+    analytics_cache.backend = backend
+
+def invalidate_tenant(tenant_id: Any, *tables: str) -> int:
+    """Invalida las métricas del tenant que dependen de `tables`."""
+    return analytics_cache.invalidate(tenant_id, tables)
+
+def cached_metric(metric: str):
+    """
+    Decorador para funciones analíticas `async def f(conn, tenant_id, *args)`.
+    El resultado se guarda en caché por (tenant, métrica, args).
+    """
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(conn, tenant_id, *args):
+            return await analytics_cache.get_or_compute(
+                tenant_id, metric, args, lambda: func(conn, tenant_id, *args)
+            )
+        return wrapper
+    return decorator
@@ -0,0 +1,137 @@
+# app/services/columnar.py
+#
+# Serialización columnar (Arrow IPC stream y Parquet) para las exportaciones.
+# Las filas llegan del cursor por bloques; cada bloque se transpone a columnas,
+# se convierte en un `RecordBatch` y se envía en cuanto está escrito, de modo
+# que el cliente puede cargarlo en pandas/pyarrow casi sin copias.
+#
+# `pyarrow` es una dependencia opcional: si no está instalada, los formatos
+# columnares no están disponibles y el resto de la API funciona igual.
+
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, List, Sequence, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - depende del entorno
+    pa = None
+    pq = None
+
+# Formatos columnares y su tipo de contenido.
+COLUMNAR_MEDIA_TYPES = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+class ColumnarUnavailableError(RuntimeError):
+    """Se lanza al pedir un formato columnar sin `pyarrow` instalado."""
+
+
+def columnar_available() -> bool:
+    """Indica si `pyarrow` está disponible."""
+    return pa is not None
+
+
+def _as_float(value):
+    return None if value is None else float(value)
+
+
+def _as_str(value):
+    return None if value is None else str(value)
+
+
+def _keep(value):
+    return value
+
+
+def _column_types() -> Dict[str, Tuple[Any, Callable[[Any], Any]]]:
+    """
+    Tipo Arrow de cada columna conocida y la conversión que necesita su valor
+    de Python (`Decimal` y `UUID` no se convierten solos).
+    """
+    return {
+        "date": (pa.date32(), _keep),
+        "sku": (pa.string(), _keep),
+        "qty": (pa.int64(), _keep),
+        "price": (pa.float64(), _as_float),
+        "channel": (pa.string(), _keep),
+        "location": (pa.string(), _keep),
+        "name": (pa.string(), _keep),
+        "category": (pa.string(), _keep),
+        "description": (pa.string(), _keep),
+        "tenant_id": (pa.string(), _as_str),
+        "predicted_qty": (pa.float64(), _as_float),
+        "model_used": (pa.string(), _keep),
+    }
+
+
+class _ChunkSink:
+    """Destino de escritura que acumula bytes hasta que se recogen con `drain`."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def _to_record_batch(schema, converters, records: Sequence[Sequence[Any]]):
+    columns = list(zip(*records))
+    arrays = [
+        pa.array([convert(value) for value in column], type=field.type)
+        for field, convert, column in zip(schema, converters, columns)
+    ]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+async def stream_columnar(
+    batches: AsyncIterator[List[Sequence[Any]]],
+    fields: Tuple[str, ...],
+    fmt: str,
+) -> AsyncIterator[bytes]:
+    """
+    Convierte un iterador asíncrono de bloques de filas en un stream Arrow IPC
+    o en un fichero Parquet (un row group por bloque), emitiendo los bytes de
+    cada bloque según se escriben.
+    """
+    if not columnar_available():
+        raise ColumnarUnavailableError("El formato columnar requiere 'pyarrow'.")
+
+    types = _column_types()
+    schema = pa.schema([(field, types[field][0]) for field in fields])
+    converters = [types[field][1] for field in fields]
+
+    sink = _ChunkSink()
+    out = pa.PythonFile(sink, mode="w")
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(out, schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_stream(out, schema)
+
+    rows = 0
+    try:
+        async for records in batches:
+            writer.write_batch(_to_record_batch(schema, converters, records))
+            rows += len(records)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+
+    yield sink.drain()
+    logging.info(f"Serialized {rows} rows as {fmt}.")
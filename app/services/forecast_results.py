@@ -0,0 +1,168 @@
+# app/services/forecast_results.py
+#
+# Consulta de los resultados del job de pronóstico.
+#
+# - Los filtros (SKUs, rango de fechas, `model_used`) y la agregación semanal
+#   o mensual se ejecutan en SQL, sobre la ejecución vigente del tenant.
+# - Cada respuesta lleva un ETag derivado del `run_id` vigente y de la
+#   consulta. El `run_id` de cada tenant se guarda en memoria
+#   (`ForecastRunVersions`) y se actualiza al instante con las notificaciones
+#   `NOTIFY forecast_runs` que emite el writer al publicar una ejecución, así
+#   que una petición condicional cuyo ETag sigue vigente se responde con 304
+#   sin tocar la base de datos. Si el listener no está conectado, una entrada
+#   se da por buena como mucho `FORECAST_VERSION_TTL` segundos.
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+import psycopg
+
+from app.database import DATABASE_URL
+from app.jobs.forecast.writer import FORECAST_RUNS_CHANNEL
+
+# Segundos que se confía en un `run_id` en memoria sin confirmarlo.
+FORECAST_VERSION_TTL = float(os.getenv("FORECAST_VERSION_TTL", "30"))
+
+# Columnas devueltas por los resultados (en los agregados, `date` es el
+# primer día de la semana o del mes).
+FORECAST_FIELDS = ("sku", "date", "predicted_qty", "model_used")
+
+AGGREGATIONS = ("day", "week", "month")
+
+CURRENT_RUN_QUERY = "SELECT run_id FROM forecast_current_run WHERE tenant_id = %s"
+
+
+def build_results_query(
+    tenant_id: UUID,
+    run_id: int,
+    skus: Optional[Sequence[str]] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    model_used: Optional[str] = None,
+    aggregate: str = "day",
+) -> Tuple[str, List[Any]]:
+    """
+    Construye la consulta de resultados de la ejecución `run_id`, con los
+    filtros y la agregación indicados, ordenada por fecha y SKU.
+    """
+    if aggregate not in AGGREGATIONS:
+        raise ValueError(f"Agregación no soportada: {aggregate}")
+
+    conditions = ["tenant_id = %s", "run_id = %s"]
+    params: List[Any] = [str(tenant_id), run_id]
+    if skus:
+        conditions.append("sku = ANY(%s)")
+        params.append(list(skus))
+    if date_from is not None:
+        conditions.append("date >= %s")
+        params.append(date_from)
+    if date_to is not None:
+        conditions.append("date <= %s")
+        params.append(date_to)
+    if model_used is not None:
+        conditions.append("model_used = %s")
+        params.append(model_used)
+    where = " AND ".join(conditions)
+
+    if aggregate == "day":
+        query = f"SELECT {', '.join(FORECAST_FIELDS)} FROM forecasts WHERE {where} ORDER BY date, sku"
+    else:
+        query = f"""
+            SELECT sku, date_trunc('{aggregate}', date)::date AS period,
+                   SUM(predicted_qty) AS predicted_qty,
+                   string_agg(DISTINCT model_used, ',' ORDER BY model_used) AS model_used
+            FROM forecasts
+            WHERE {where}
+            GROUP BY sku, period
+            ORDER BY period, sku
+        """
+    return query, params
+
+
+def results_etag(run_id: int, *parts: Any) -> str:
+    """ETag de una respuesta: la ejecución vigente más un resumen de la consulta."""
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()[:16]
+    return f'"{run_id}-{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Compara la cabecera `If-None-Match` (lista de ETags, débiles o no) con `etag`."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+class ForecastRunVersions:
+    """
+    `run_id` vigente de cada tenant, en memoria. Lo alimentan las consultas
+    a `forecast_current_run` y las notificaciones del writer.
+    """
+
+    def __init__(self, ttl: float = FORECAST_VERSION_TTL, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._versions: Dict[str, Tuple[int, float]] = {}
+
+    def get(self, tenant_id: UUID) -> Optional[int]:
+        """`run_id` en memoria, si es lo bastante reciente (no consulta la base de datos)."""
+        entry = self._versions.get(str(tenant_id))
+        if entry is None or self._clock() - entry[1] > self.ttl:
+            return None
+        return entry[0]
+
+    def set(self, tenant_id: UUID, run_id: Optional[int]) -> None:
+        if run_id is None:
+            self._versions.pop(str(tenant_id), None)
+        else:
+            self._versions[str(tenant_id)] = (run_id, self._clock())
+
+    def clear(self) -> None:
+        self._versions.clear()
+
+    async def fetch(self, conn, tenant_id: UUID) -> Optional[int]:
+        """Lee el `run_id` vigente del tenant y lo guarda en memoria."""
+        async with conn.cursor() as cursor:
+            await cursor.execute(CURRENT_RUN_QUERY, (str(tenant_id),))
+            row = await cursor.fetchone()
+        run_id = row[0] if row else None
+        self.set(tenant_id, run_id)
+        return run_id
+
+    def handle_notification(self, payload: str) -> None:
+        """Procesa un `NOTIFY forecast_runs, '<tenant_id>:<run_id>'`."""
+        tenant_id, _, run_id = payload.partition(":")
+        try:
+            self.set(tenant_id, int(run_id))
+        except ValueError:
+            logging.warning(f"Notificación de {FORECAST_RUNS_CHANNEL} no válida: {payload!r}")
+
+    async def listen(self, dsn: str = DATABASE_URL, retry_seconds: float = 5.0) -> None:
+        """
+        Escucha las ejecuciones publicadas con una conexión dedicada y se
+        reconecta si se pierde. Se lanza como tarea en el `lifespan` de la API.
+        """
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(dsn, autocommit=True) as conn:
+                    await conn.execute(f"LISTEN {FORECAST_RUNS_CHANNEL}")
+                    # Lo notificado mientras no se escuchaba se desconoce.
+                    self.clear()
+                    logging.info(f"Escuchando el canal {FORECAST_RUNS_CHANNEL}.")
+                    async for notification in conn.notifies():
+                        self.handle_notification(notification.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.warning(f"Listener de {FORECAST_RUNS_CHANNEL} desconectado: {e}")
+            self.clear()
+            await asyncio.sleep(retry_seconds)
+
+
+forecast_versions = ForecastRunVersions()
@@ -3,57 +3,93 @@
 # Lógica de servicio para interactuar con la base de datos de inventario.
 # Aquí se implementa la inserción de datos en la tabla 'inventory'.
 
-from app.database import get_db_connection
+from app.database import db_connection
 from app.models.inventory import InventoryData
+from app.services.bulk import build_stats, copy_upsert, iter_rows, values_upsert
+from app.services.cache import invalidate_tenant
+from app.services.rollups import apply_inventory_rollup, lock_tenant
 import logging
+import time
 
-def ingest_inventory_data(inventory_data: InventoryData):
+# Columnas de la tabla `inventory` y clave de conflicto del UPSERT.
+INVENTORY_FIELDS = ("date", "sku", "qty", "location")
+INVENTORY_COLUMNS = INVENTORY_FIELDS + ("tenant_id",)
+INVENTORY_CONFLICT_COLUMNS = ("tenant_id", "date", "sku", "location")
+INVENTORY_UPDATE_COLUMNS = ("qty",)
+
+def ingest_inventory_data(inventory_data: InventoryData, bulk: bool = False) -> dict:
     """
     Ingiere datos de inventario en la tabla `inventory` de PostgreSQL.
     Utiliza un comando `UPSERT` para evitar duplicados.
 
     Args:
         inventory_data (InventoryData): El objeto de datos de inventario validado por Pydantic.
+        bulk (bool): Si es `True`, usa `COPY` a una tabla de staging y un único `INSERT ... SELECT`.
+
+    Returns:
+        dict: Resumen de la ingesta (modo, filas, segundos y filas por segundo).
     """
     logging.info(f"Ingesting inventory data for tenant_id: {inventory_data.tenant_id}")
     
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    try:
-        # Prepara un string con los valores a insertar.
-        values = ', '.join([
-            cur.mogrify(
-                "(%s, %s, %s, %s, %s)",
-                (
-                    rec.date,
-                    rec.sku,
-                    rec.qty,
-                    rec.location,
-                    str(inventory_data.tenant_id)
+    started = time.perf_counter()
+
+    with db_connection() as conn:
+        cur = conn.cursor()
+
+        try:
+            lock_tenant(cur, "inventory", inventory_data.tenant_id)
+
+            if bulk:
+                rows = copy_upsert(
+                    cur,
+                    "inventory",
+                    INVENTORY_COLUMNS,
+                    iter_rows(inventory_data.data, INVENTORY_FIELDS, str(inventory_data.tenant_id)),
+                    INVENTORY_CONFLICT_COLUMNS,
+                    INVENTORY_UPDATE_COLUMNS,
+                    before_merge=apply_inventory_rollup,
                 )
-            ).decode('utf-8')
-            for rec in inventory_data.data
-        ])
-        
-        # Sentencia SQL para UPSERT.
-        # Si la combinación (tenant_id, date, sku, location) ya existe, se actualiza la cantidad (qty).
-        query = f"""
-            INSERT INTO inventory (date, sku, qty, location, tenant_id)
-            VALUES {values}
-            ON CONFLICT (tenant_id, date, sku, location) DO UPDATE
-            SET qty = EXCLUDED.qty;
-        """
-        
-        cur.execute(query)
-        conn.commit()
-        logging.info(f"Successfully ingested {len(inventory_data.data)} inventory records.")
+            else:
+                # Prepara un string con los valores a insertar.
+                values = ', '.join([
+                    cur.mogrify(
+                        "(%s, %s, %s, %s, %s)",
+                        (
+                            rec.date,
+                            rec.sku,
+                            rec.qty,
+                            rec.location,
+                            str(inventory_data.tenant_id)
+                        )
+                    ).decode('utf-8')
+                    for rec in inventory_data.data
+                ])
+
+                # UPSERT: si la combinación (tenant_id, date, sku, location) ya existe,
+                # se actualiza la cantidad (qty). Antes de fusionar se aplica el delta
+                # a `inventory_sku_rollup`.
+                values_upsert(
+                    cur,
+                    "inventory",
+                    INVENTORY_COLUMNS,
+                    values,
+                    INVENTORY_CONFLICT_COLUMNS,
+                    INVENTORY_UPDATE_COLUMNS,
+                    before_merge=apply_inventory_rollup,
+                )
+                rows = len(inventory_data.data)
+
+            conn.commit()
+            invalidate_tenant(inventory_data.tenant_id, "inventory")
+            mode = "copy" if bulk else "values"
+            stats = build_stats(mode, rows, started, "inventory")
+            logging.info(f"Successfully ingested {rows} inventory records ({stats['rows_per_second']} rows/s, {mode}).")
+            return stats
         
-    except Exception as e:
-        conn.rollback()
-        logging.error(f"Error during inventory data ingestion: {e}")
-        raise e
+        except Exception as e:
+            conn.rollback()
+            logging.error(f"Error during inventory data ingestion: {e}")
+            raise e
         
-    finally:
-        cur.close()
-        conn.close()
+        finally:
+            cur.close()
@@ -0,0 +1,400 @@
+# app/services/metrics.py
+#
+# Métricas en proceso con el formato de texto de Prometheus (`GET /metrics`).
+#
+# Contadores, gauges e histogramas mínimos, sin dependencias externas: cada
+# observación es una búsqueda binaria en los límites de los buckets y una suma
+# bajo un lock, así que el coste en el camino caliente es de microsegundos.
+# Lo que solo tiene sentido en el momento del scrape (p. ej. la ocupación de
+# los pools) lo calculan los colectores registrados con `register_collector`.
+#
+# Cada proceso tiene su propio registro: con varios workers de uvicorn cada uno
+# expone solo lo suyo, y los workers de la cola de pronósticos publican sus
+# métricas con `serve_metrics` en su propio puerto.
+
+import bisect
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Buckets por defecto (segundos): de 1 ms a 10 s para peticiones y esperas del pool.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Los jobs de pronóstico tardan de segundos a horas.
+JOB_BUCKETS = (1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0, 7200.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base de las métricas: nombre, ayuda, etiquetas y un lock por métrica."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Sequence[str]) -> LabelValues:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} espera las etiquetas {self.labelnames}, no {tuple(labels)}.")
+        return tuple(str(value) for value in labels)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return lines
+
+
+class Counter(Metric):
+    """Valor que solo crece (peticiones, filas ingeridas...)."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(Metric):
+    """Valor que sube y baja (peticiones en curso, conexiones ocupadas...)."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, *labels: str, value: float) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(Metric):
+    """
+    Distribución de valores en buckets acumulativos, con su suma y su número
+    de observaciones (`_bucket`, `_sum` y `_count`).
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Por etiquetas: recuentos por bucket (no acumulados, el último es +Inf) y suma.
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, *labels: str, value: float) -> None:
+        key = self._key(labels)
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][position] += 1
+            series[1][0] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return sum(series[0]) if series else 0
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = [(key, list(counts), total[0]) for key, (counts, total) in self._series.items()]
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}"
+
+
+class MetricsRegistry:
+    """Métricas de un proceso y colectores que se ejecutan antes de cada scrape."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"La métrica {metric.name} ya está registrada.")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector: Callable[[], None]) -> None:
+        """Registra una función que actualiza gauges justo antes de cada scrape."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Todas las métricas en el formato de texto de Prometheus."""
+        for collector in list(self._collectors):
+            try:
+                collector()
+            except Exception as e:
+                logging.warning(f"Error en un colector de métricas: {e}")
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+# --- Peticiones HTTP ---
+http_request_duration = metrics.histogram(
+    "http_request_duration_seconds",
+    "Latencia de las peticiones HTTP por ruta, método y código de estado.",
+    ("method", "route", "status"),
+)
+http_requests_in_flight = metrics.gauge(
+    "http_requests_in_flight",
+    "Peticiones HTTP en curso por método.",
+    ("method",),
+)
+
+# --- Pools de conexiones (`pool`: `sync` o `async`) ---
+db_pool_checkout_wait = metrics.histogram(
+    "db_pool_checkout_wait_seconds",
+    "Tiempo de espera para obtener una conexión del pool.",
+    ("pool",),
+)
+db_pool_connections_in_use = metrics.gauge(
+    "db_pool_connections_in_use",
+    "Conexiones del pool prestadas en este momento.",
+    ("pool",),
+)
+db_pool_connections_max = metrics.gauge(
+    "db_pool_connections_max",
+    "Tamaño máximo del pool.",
+    ("pool",),
+)
+db_pool_utilization = metrics.gauge(
+    "db_pool_utilization_ratio",
+    "Fracción del pool prestada (conexiones en uso / máximo).",
+    ("pool",),
+)
+
+# --- Ingestas ---
+ingest_rows = metrics.counter(
+    "ingest_rows_total",
+    "Filas ingeridas por tabla y modo (usar rate() para obtener filas por segundo).",
+    ("table", "mode"),
+)
+ingest_seconds = metrics.counter(
+    "ingest_seconds_total",
+    "Segundos dedicados a ingerir por tabla y modo.",
+    ("table", "mode"),
+)
+ingest_last_rows_per_second = metrics.gauge(
+    "ingest_last_rows_per_second",
+    "Filas por segundo de la última ingesta de cada tabla.",
+    ("table",),
+)
+
+# --- Job de pronóstico ---
+forecast_job_duration = metrics.histogram(
+    "forecast_job_duration_seconds",
+    "Duración de los jobs de pronóstico por modo y resultado.",
+    ("mode", "status"),
+    buckets=JOB_BUCKETS,
+)
+forecast_job_stage_duration = metrics.histogram(
+    "forecast_job_stage_seconds",
+    "Duración de cada etapa de los jobs de pronóstico terminados.",
+    ("stage",),
+    buckets=JOB_BUCKETS,
+)
+
+# --- Caché analítica (acumulados del proceso; los calcula su colector) ---
+analytics_cache_lookups = metrics.gauge(
+    "analytics_cache_lookups",
+    "Consultas a la caché analítica desde el arranque, por métrica y resultado (hit/miss).",
+    ("metric", "result"),
+)
+analytics_cache_invalidations = metrics.gauge(
+    "analytics_cache_invalidations",
+    "Invalidaciones de la caché analítica desde el arranque.",
+)
+analytics_cache_backend = metrics.gauge(
+    "analytics_cache_backend",
+    "Estado del backend de la caché analítica (entries, bytes, evictions...).",
+    ("field",),
+)
+
+
+def record_ingest(table: str, mode: str, rows: int, seconds: float) -> None:
+    """Registra una ingesta completada (lo llama `build_stats`)."""
+    ingest_rows.inc(table, mode, amount=rows)
+    ingest_seconds.inc(table, mode, amount=seconds)
+    if seconds > 0:
+        ingest_last_rows_per_second.set(table, value=rows / seconds)
+
+
+def record_forecast_job(mode: str, status: str, seconds: float, stages: Optional[Dict[str, float]] = None) -> None:
+    """Registra un job de pronóstico terminado y, si lo hay, el tiempo de cada etapa."""
+    forecast_job_duration.observe(mode, status, value=seconds)
+    for stage, stage_seconds in (stages or {}).items():
+        forecast_job_stage_duration.observe(stage, value=stage_seconds)
+
+
+def set_pool_usage(pool: str, in_use: int, max_size: int) -> None:
+    """Actualiza los gauges de ocupación de un pool (desde su colector)."""
+    db_pool_connections_in_use.set(pool, value=in_use)
+    db_pool_connections_max.set(pool, value=max_size)
+    db_pool_utilization.set(pool, value=in_use / max_size if max_size else 0.0)
+
+
+def set_cache_stats(stats: Dict[str, Any]) -> None:
+    """Publica los contadores de `AnalyticsCache.stats()` (desde su colector)."""
+    for metric, counts in stats["by_metric"].items():
+        analytics_cache_lookups.set(metric, "hit", value=counts["hits"])
+        analytics_cache_lookups.set(metric, "miss", value=counts["misses"])
+    analytics_cache_invalidations.set(value=stats["invalidations"])
+    for field, value in stats["backend"].items():
+        if isinstance(value, (int, float)):
+            analytics_cache_backend.set(field, value=value)
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que mide la latencia de cada petición y las peticiones en
+    curso. La ruta es la plantilla que ha resuelto el router
+    (`/api/data/sales/{tenant_id}`), no la URL, para que el nº de series no
+    crezca con los IDs; lo que no resuelve ninguna ruta se agrupa en `unmatched`.
+    Es ASGI puro (no `BaseHTTPMiddleware`) para no alterar las respuestas en
+    streaming: la latencia incluye el envío completo del cuerpo.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        http_requests_in_flight.inc(method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec(method)
+            route = scope.get("route")
+            http_request_duration.observe(
+                method, getattr(route, "path", "unmatched"), status, value=time.perf_counter() - started,
+            )
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = metrics
+
+    def do_GET(self):
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """
+    Expone las métricas del proceso en `http://host:port/` desde un hilo.
+    Lo usan los procesos que no sirven la API (los workers de la cola).
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name=f"metrics-{port}", daemon=True).start()
+    logging.info(f"Métricas disponibles en el puerto {port}.")
+    return server
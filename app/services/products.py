@@ -3,58 +3,90 @@
 # Lógica de servicio para interactuar con la base de datos de productos.
 # Aquí se implementa la inserción de datos en la tabla 'products'.
 
-from app.database import get_db_connection
+from app.database import db_connection
 from app.models.products import ProductsData
+from app.services.bulk import build_stats, copy_upsert, iter_rows
+from app.services.cache import invalidate_tenant
 import logging
+import time
 
-def ingest_products_data(products_data: ProductsData):
+# Columnas de la tabla `products` y clave de conflicto del UPSERT.
+PRODUCTS_FIELDS = ("sku", "name", "category", "price", "description")
+PRODUCTS_COLUMNS = PRODUCTS_FIELDS + ("tenant_id",)
+PRODUCTS_CONFLICT_COLUMNS = ("tenant_id", "sku")
+PRODUCTS_UPDATE_COLUMNS = ("name", "category", "price", "description")
+
+def ingest_products_data(products_data: ProductsData, bulk: bool = False) -> dict:
     """
     Ingiere datos de productos en la tabla `products` de PostgreSQL.
     Utiliza un comando `UPSERT` para evitar duplicados.
 
     Args:
         products_data (ProductsData): El objeto de datos de productos validado por Pydantic.
+        bulk (bool): Si es `True`, usa `COPY` a una tabla de staging y un único `INSERT ... SELECT`.
+
+    Returns:
+        dict: Resumen de la ingesta (modo, filas, segundos y filas por segundo).
     """
     logging.info(f"Ingesting products data for tenant_id: {products_data.tenant_id}")
     
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    try:
-        # Prepara un string con los valores a insertar.
-        values = ', '.join([
-            cur.mogrify(
-                "(%s, %s, %s, %s, %s, %s)",
-                (
-                    rec.sku,
-                    rec.name,
-                    rec.category,
-                    rec.price,
-                    rec.description,
-                    str(products_data.tenant_id)
+    started = time.perf_counter()
+
+    with db_connection() as conn:
+        cur = conn.cursor()
+
+        try:
+            if bulk:
+                rows = copy_upsert(
+                    cur,
+                    "products",
+                    PRODUCTS_COLUMNS,
+                    iter_rows(products_data.data, PRODUCTS_FIELDS, str(products_data.tenant_id)),
+                    PRODUCTS_CONFLICT_COLUMNS,
+                    PRODUCTS_UPDATE_COLUMNS,
                 )
-            ).decode('utf-8')
-            for rec in products_data.data
-        ])
+                conn.commit()
+                invalidate_tenant(products_data.tenant_id, "products")
+                stats = build_stats("copy", rows, started, "products")
+                logging.info(f"Successfully ingested {rows} product records ({stats['rows_per_second']} rows/s, copy).")
+                return stats
+
+            # Prepara un string con los valores a insertar.
+            values = ', '.join([
+                cur.mogrify(
+                    "(%s, %s, %s, %s, %s, %s)",
+                    (
+                        rec.sku,
+                        rec.name,
+                        rec.category,
+                        rec.price,
+                        rec.description,
+                        str(products_data.tenant_id)
+                    )
+                ).decode('utf-8')
+                for rec in products_data.data
+            ])
         
-        # Sentencia SQL para UPSERT.
-        # Si la combinación (tenant_id, sku) ya existe, se actualizan los otros campos.
-        query = f"""
-            INSERT INTO products (sku, name, category, price, description, tenant_id)
-            VALUES {values}
-            ON CONFLICT (tenant_id, sku) DO UPDATE
-            SET name = EXCLUDED.name, category = EXCLUDED.category, price = EXCLUDED.price, description = EXCLUDED.description;
-        """
+            # Sentencia SQL para UPSERT.
+            # Si la combinación (tenant_id, sku) ya existe, se actualizan los otros campos.
+            query = f"""
+                INSERT INTO products (sku, name, category, price, description, tenant_id)
+                VALUES {values}
+                ON CONFLICT (tenant_id, sku) DO UPDATE
+                SET name = EXCLUDED.name, category = EXCLUDED.category, price = EXCLUDED.price, description = EXCLUDED.description;
+            """
         
-        cur.execute(query)
-        conn.commit()
-        logging.info(f"Successfully ingested {len(products_data.data)} product records.")
+            cur.execute(query)
+            conn.commit()
+            invalidate_tenant(products_data.tenant_id, "products")
+            stats = build_stats("values", len(products_data.data), started, "products")
+            logging.info(f"Successfully ingested {len(products_data.data)} product records ({stats['rows_per_second']} rows/s, values).")
+            return stats
         
-    except Exception as e:
-        conn.rollback()
-        logging.error(f"Error during products data ingestion: {e}")
-        raise e
+        except Exception as e:
+            conn.rollback()
+            logging.error(f"Error during products data ingestion: {e}")
+            raise e
         
-    finally:
-        cur.close()
-        conn.close()
\ No newline at end of file
+        finally:
+            cur.close()
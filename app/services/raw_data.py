@@ -0,0 +1,303 @@
+# app/services/raw_data.py
+#
+# Consultas de datos "en bruto" (ventas, inventario y productos) para `/api/data`.
+# Construye las sentencias SQL con paginación por clave (keyset), filtros por
+# fecha y SKU y proyección de columnas, todo resuelto en la base de datos.
+# También genera las exportaciones en streaming (NDJSON, CSV, Arrow o Parquet)
+# a partir de un cursor de servidor, con memoria constante sea cual sea el
+# tamaño del resultado.
+
+import base64
+import csv
+import io
+import json
+import logging
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+from psycopg import AsyncConnection
+
+from app.async_database import async_db_connection
+from app.services.columnar import COLUMNAR_MEDIA_TYPES, stream_columnar
+
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+
+# Filas que trae cada `FETCH` del cursor de servidor en las exportaciones.
+DEFAULT_EXPORT_ITERSIZE = 2000
+
+# Tipos de contenido de cada formato de exportación.
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    **COLUMNAR_MEDIA_TYPES,
+}
+
+
+@dataclass(frozen=True)
+class Dataset:
+    """
+    Describe una tabla consultable: sus columnas públicas, la clave de
+    ordenación usada para paginar y la columna de fecha (si la tiene).
+    """
+    table: str
+    columns: Tuple[str, ...]
+    key: Tuple[str, ...]
+    date_column: Optional[str] = None
+
+
+DATASETS: Dict[str, Dataset] = {
+    "sales": Dataset(
+        table="sales",
+        columns=("date", "sku", "qty", "price", "channel", "tenant_id"),
+        key=("date", "sku"),
+        date_column="date",
+    ),
+    "inventory": Dataset(
+        table="inventory",
+        columns=("date", "sku", "qty", "location", "tenant_id"),
+        key=("date", "sku", "location"),
+        date_column="date",
+    ),
+    "products": Dataset(
+        table="products",
+        columns=("sku", "name", "category", "price", "description", "tenant_id"),
+        key=("sku",),
+    ),
+}
+
+
+def parse_fields(dataset: Dataset, fields: Optional[str]) -> Tuple[str, ...]:
+    """
+    Convierte el parámetro `fields=a,b,c` en una tupla de columnas válidas.
+    Sin `fields` se devuelven todas las columnas del dataset.
+    """
+    if not fields:
+        return dataset.columns
+
+    requested = tuple(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in requested if name not in dataset.columns]
+    if unknown or not requested:
+        raise ValueError(
+            f"Campos no válidos para '{dataset.table}': {', '.join(unknown) or fields}. "
+            f"Campos disponibles: {', '.join(dataset.columns)}."
+        )
+    return requested
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """
+    Codifica la clave de la última fila de una página como un cursor opaco.
+    """
+    payload = [value.isoformat() if isinstance(value, date) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(dataset: Dataset, cursor: str) -> List[Any]:
+    """
+    Decodifica un cursor generado por `encode_cursor` para `dataset`.
+    """
+    # Un cursor manipulado puede fallar en cualquier paso (base64, JSON, una
+    # fecha que no es cadena...); todos acaban en ValueError, que el router
+    # convierte en un 400.
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if not isinstance(values, list) or len(values) != len(dataset.key):
+            raise ValueError("Cursor no válido.")
+        return [
+            date.fromisoformat(value) if column == dataset.date_column else value
+            for column, value in zip(dataset.key, values)
+        ]
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("Cursor no válido.")
+
+
+def build_filters(
+    dataset: Dataset,
+    tenant_id: UUID,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    skus: Optional[Sequence[str]] = None,
+) -> Tuple[List[str], List[Any]]:
+    """
+    Construye las condiciones `WHERE` comunes (tenant, rango de fechas y SKUs).
+    """
+    conditions = ["tenant_id = %s"]
+    params: List[Any] = [str(tenant_id)]
+
+    if dataset.date_column and date_from:
+        conditions.append(f"{dataset.date_column} >= %s")
+        params.append(date_from)
+    if dataset.date_column and date_to:
+        conditions.append(f"{dataset.date_column} <= %s")
+        params.append(date_to)
+    if skus:
+        conditions.append("sku = ANY(%s)")
+        params.append(list(skus))
+
+    return conditions, params
+
+
+def build_page_query(
+    dataset: Dataset,
+    tenant_id: UUID,
+    fields: Tuple[str, ...],
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    skus: Optional[Sequence[str]] = None,
+    after: Optional[Sequence[Any]] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> Tuple[str, List[Any]]:
+    """
+    Construye la consulta de una página. Se seleccionan las columnas pedidas
+    más las de la clave (necesarias para el cursor) y se pide una fila extra
+    para saber si hay más páginas.
+    """
+    conditions, params = build_filters(dataset, tenant_id, date_from, date_to, skus)
+
+    if after is not None:
+        key_list = ", ".join(dataset.key)
+        placeholders = ", ".join(["%s"] * len(dataset.key))
+        conditions.append(f"({key_list}) > ({placeholders})")
+        params.extend(after)
+
+    selected = fields + tuple(col for col in dataset.key if col not in fields)
+    query = (
+        f"SELECT {', '.join(selected)} FROM {dataset.table} "
+        f"WHERE {' AND '.join(conditions)} "
+        f"ORDER BY {', '.join(dataset.key)} "
+        f"LIMIT %s;"
+    )
+    params.append(limit + 1)
+    return query, params
+
+
+async def fetch_page(
+    conn: AsyncConnection,
+    dataset: Dataset,
+    tenant_id: UUID,
+    fields: Tuple[str, ...],
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    skus: Optional[Sequence[str]] = None,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> Dict[str, Any]:
+    """
+    Devuelve una página de registros y el cursor de la siguiente
+    (`None` si no hay más datos).
+    """
+    after = decode_cursor(dataset, cursor) if cursor else None
+    query, params = build_page_query(dataset, tenant_id, fields, date_from, date_to, skus, after, limit)
+
+    async with conn.cursor() as cur:
+        await cur.execute(query, params)
+        records = await cur.fetchall()
+
+    has_more = len(records) > limit
+    records = records[:limit]
+
+    selected = fields + tuple(col for col in dataset.key if col not in fields)
+    key_positions = [selected.index(col) for col in dataset.key]
+    next_cursor = None
+    if has_more and records:
+        next_cursor = encode_cursor([records[-1][i] for i in key_positions])
+
+    n_fields = len(fields)
+    data = [dict(zip(fields, record[:n_fields])) for record in records]
+
+    logging.info(f"Fetched {len(data)} {dataset.table} rows for tenant_id: {tenant_id} (has_more={has_more}).")
+    return {"data": data, "next_cursor": next_cursor}
+
+
+def _json_default(value: Any):
+    """Serializa los tipos de PostgreSQL que `json` no soporta de serie."""
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, UUID):
+        return str(value)
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+
+def _serialize_ndjson(fields: Tuple[str, ...], records: List[Sequence[Any]]) -> bytes:
+    return "".join(
+        json.dumps(dict(zip(fields, record)), default=_json_default) + "\n"
+        for record in records
+    ).encode("utf-8")
+
+
+def _serialize_csv(records: List[Sequence[Any]]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(records)
+    return buffer.getvalue().encode("utf-8")
+
+
+async def iter_query_batches(
+    query: str,
+    params: Sequence[Any],
+    cursor_name: str,
+    itersize: int = DEFAULT_EXPORT_ITERSIZE,
+) -> AsyncIterator[List[Sequence[Any]]]:
+    """
+    Ejecuta `query` con un cursor de servidor (con nombre) dentro de una
+    transacción y entrega las filas en bloques de `itersize`.
+
+    El generador abre su propia conexión porque se consume después de que
+    FastAPI haya liberado las dependencias del endpoint.
+    """
+    async with async_db_connection() as conn:
+        async with conn.transaction():
+            async with conn.cursor(name=cursor_name) as cur:
+                cur.itersize = itersize
+                await cur.execute(query, params)
+                while True:
+                    batch = await cur.fetchmany(itersize)
+                    if not batch:
+                        break
+                    yield batch
+
+
+async def stream_export(
+    dataset: Dataset,
+    tenant_id: UUID,
+    fields: Tuple[str, ...],
+    fmt: str,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    skus: Optional[Sequence[str]] = None,
+    itersize: int = DEFAULT_EXPORT_ITERSIZE,
+) -> AsyncIterator[bytes]:
+    """
+    Genera la exportación completa de un dataset como NDJSON, CSV, Arrow o Parquet.
+
+    Cada `FETCH` del cursor de servidor trae `itersize` filas que se serializan
+    y se envían antes de pedir las siguientes, así que el primer byte sale
+    antes de que termine la consulta y la memoria no depende del tamaño del
+    resultado.
+    """
+    conditions, params = build_filters(dataset, tenant_id, date_from, date_to, skus)
+    query = (
+        f"SELECT {', '.join(fields)} FROM {dataset.table} "
+        f"WHERE {' AND '.join(conditions)} "
+        f"ORDER BY {', '.join(dataset.key)};"
+    )
+    batches = iter_query_batches(query, params, f"export_{dataset.table}", itersize)
+
+    if fmt in COLUMNAR_MEDIA_TYPES:
+        async for chunk in stream_columnar(batches, fields, fmt):
+            yield chunk
+        return
+
+    if fmt == "csv":
+        yield _serialize_csv([fields])
+
+    rows = 0
+    async for batch in batches:
+        rows += len(batch)
+        yield _serialize_csv(batch) if fmt == "csv" else _serialize_ndjson(fields, batch)
+
+    logging.info(f"Exported {rows} {dataset.table} rows for tenant_id: {tenant_id} as {fmt}.")
@@ -0,0 +1,113 @@
+# app/services/rollups.py
+#
+# Mantenimiento incremental de las tablas de agregados (rollups) que usan los KPIs.
+#
+# - `sales_daily_rollup`: ventas por tenant, día, SKU y canal (unidades, importe y filas).
+# - `inventory_sku_rollup`: inventario por tenant, SKU y ubicación (unidades y nº de fotos).
+#
+# Las ingestas aplican aquí el delta de cada lote dentro de la misma transacción
+# que el UPSERT: para cada fila entrante se resta lo que había antes (si la fila
+# ya existía y `ON CONFLICT DO UPDATE` la va a sobrescribir) y se suma lo nuevo.
+# El esquema de las tablas está en `migrations/001_analytics_rollups.sql`.
+
+import logging
+from uuid import UUID
+
+# Delta de ventas: se calcula antes de la fusión, cuando `sales` aún conserva
+# los valores antiguos. En conflicto el canal no se actualiza, por lo que el
+# delta se imputa al canal de la fila existente, aunque ese canal sea NULL
+# (se agrega como ''); el canal entrante solo cuenta para filas nuevas.
+SALES_ROLLUP_DELTA = """
+    INSERT INTO sales_daily_rollup AS r (tenant_id, date, sku, channel, qty, revenue, row_count)
+    SELECT tenant_id, date, sku, channel, SUM(qty), SUM(revenue), SUM(row_count)
+    FROM (
+        SELECT
+            n.tenant_id, n.date, n.sku,
+            CASE WHEN o.sku IS NOT NULL THEN COALESCE(o.channel, '') ELSE COALESCE(n.channel, '') END AS channel,
+            n.qty - COALESCE(o.qty, 0) AS qty,
+            n.qty * n.price - COALESCE(o.qty * o.price, 0) AS revenue,
+            CASE WHEN o.sku IS NULL THEN 1 ELSE 0 END AS row_count
+        FROM (
+            SELECT DISTINCT ON (tenant_id, date, sku) tenant_id, date, sku, qty, price, channel
+            FROM {staging}
+            ORDER BY tenant_id, date, sku, ctid DESC
+        ) n
+        LEFT JOIN sales o
+            ON o.tenant_id = n.tenant_id AND o.date = n.date AND o.sku = n.sku
+    ) delta
+    GROUP BY tenant_id, date, sku, channel
+    ON CONFLICT (tenant_id, date, sku, channel) DO UPDATE
+    SET qty = r.qty + EXCLUDED.qty,
+        revenue = r.revenue + EXCLUDED.revenue,
+        row_count = r.row_count + EXCLUDED.row_count;
+"""
+
+INVENTORY_ROLLUP_DELTA = """
+    INSERT INTO inventory_sku_rollup AS r (tenant_id, sku, location, qty, snapshots)
+    SELECT tenant_id, sku, location, SUM(qty), SUM(snapshots)
+    FROM (
+        SELECT
+            n.tenant_id, n.sku, n.location,
+            n.qty - COALESCE(o.qty, 0) AS qty,
+            CASE WHEN o.sku IS NULL THEN 1 ELSE 0 END AS snapshots
+        FROM (
+            SELECT DISTINCT ON (tenant_id, date, sku, location) tenant_id, date, sku, location, qty
+            FROM {staging}
+            ORDER BY tenant_id, date, sku, location, ctid DESC
+        ) n
+        LEFT JOIN inventory o
+            ON o.tenant_id = n.tenant_id AND o.date = n.date
+            AND o.sku = n.sku AND o.location = n.location
+    ) delta
+    GROUP BY tenant_id, sku, location
+    ON CONFLICT (tenant_id, sku, location) DO UPDATE
+    SET qty = r.qty + EXCLUDED.qty,
+        snapshots = r.snapshots + EXCLUDED.snapshots;
+"""
+
+# Recalcula desde cero los agregados de un tenant (p. ej. tras un borrado manual).
+REBUILD_ROLLUPS = """
+    DELETE FROM sales_daily_rollup WHERE tenant_id = %(tenant_id)s;
+    INSERT INTO sales_daily_rollup (tenant_id, date, sku, channel, qty, revenue, row_count)
+    SELECT tenant_id, date, sku, COALESCE(channel, ''), SUM(qty), SUM(qty * price), COUNT(*)
+    FROM sales WHERE tenant_id = %(tenant_id)s
+    GROUP BY tenant_id, date, sku, COALESCE(channel, '');
+
+    DELETE FROM inventory_sku_rollup WHERE tenant_id = %(tenant_id)s;
+    INSERT INTO inventory_sku_rollup (tenant_id, sku, location, qty, snapshots)
+    SELECT tenant_id, sku, location, SUM(qty), COUNT(*)
+    FROM inventory WHERE tenant_id = %(tenant_id)s
+    GROUP BY tenant_id, sku, location;
+"""
+
+
+def lock_tenant(cur, table: str, tenant_id: UUID) -> None:
+    """
+    Serializa las ingestas concurrentes de un mismo tenant y tabla durante la
+    transacción, para que dos lotes no calculen su delta sobre el mismo estado.
+    """
+    cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s));", (f"{table}:{tenant_id}",))
+
+
+def apply_sales_rollup(cur, staging: str) -> None:
+    """Aplica a `sales_daily_rollup` el delta de las ventas en `staging`."""
+    cur.execute(SALES_ROLLUP_DELTA.format(staging=staging))
+
+
+def apply_inventory_rollup(cur, staging: str) -> None:
+    """Aplica a `inventory_sku_rollup` el delta del inventario en `staging`."""
+    cur.execute(INVENTORY_ROLLUP_DELTA.format(staging=staging))
+
+
+def rebuild_rollups(conn, tenant_id: UUID) -> None:
+    """
+    Recalcula los agregados de un tenant a partir de las tablas base.
+    Solo es necesario si se han modificado `sales` o `inventory` fuera de
+    los servicios de ingesta.
+    """
+    with conn.cursor() as cur:
+        lock_tenant(cur, "sales", tenant_id)
+        lock_tenant(cur, "inventory", tenant_id)
+        cur.execute(REBUILD_ROLLUPS, {"tenant_id": str(tenant_id)})
+    conn.commit()
+    logging.info(f"Rebuilt analytics rollups for tenant_id: {tenant_id}")
@@ -3,64 +3,100 @@
 # Lógica de servicio para interactuar con la base de datos de ventas.
 # Aquí se implementa la inserción de datos en la tabla 'sales'.
 
-from app.database import get_db_connection
+from app.database import db_connection
 from app.models.sales import SalesData
+from app.services.bulk import build_stats, copy_upsert, iter_rows, values_upsert
+from app.services.cache import invalidate_tenant
+from app.services.rollups import apply_sales_rollup, lock_tenant
 import logging
+import time
 
-def ingest_sales_data(sales_data: SalesData):
+# Columnas de la tabla `sales` y clave de conflicto del UPSERT.
+SALES_FIELDS = ("date", "sku", "qty", "price", "channel")
+SALES_COLUMNS = SALES_FIELDS + ("tenant_id",)
+SALES_CONFLICT_COLUMNS = ("tenant_id", "date", "sku")
+SALES_UPDATE_COLUMNS = ("qty", "price")
+
+def ingest_sales_data(sales_data: SalesData, bulk: bool = False) -> dict:
     """
     Ingiere datos de ventas en la tabla `sales` de PostgreSQL.
     Utiliza un comando `UPSERT` para evitar duplicados en caso de que los datos ya existan.
 
     Args:
         sales_data (SalesData): El objeto de datos de ventas validado por Pydantic.
+        bulk (bool): Si es `True`, carga los registros con `COPY` en una tabla de
+            staging y los fusiona con un único `INSERT ... SELECT`.
+
+    Returns:
+        dict: Resumen de la ingesta (modo, filas, segundos y filas por segundo).
     """
     logging.info(f"Ingesting sales data for tenant_id: {sales_data.tenant_id}")
     
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    try:
-        # Prepara un string con los valores a insertar. Esto es más eficiente
-        # que realizar una inserción por cada registro.
-        values = ', '.join([
-            cur.mogrify(
-                "(%s, %s, %s, %s, %s, %s)",
-                (
-                    rec.date,
-                    rec.sku,
-                    rec.qty,
-                    rec.price,
-                    rec.channel,
-                    # Convertimos el UUID a string para que psycopg2 lo pueda manejar.
-                    str(sales_data.tenant_id)
+    started = time.perf_counter()
+
+    with db_connection() as conn:
+        cur = conn.cursor()
+
+        try:
+            lock_tenant(cur, "sales", sales_data.tenant_id)
+
+            if bulk:
+                rows = copy_upsert(
+                    cur,
+                    "sales",
+                    SALES_COLUMNS,
+                    iter_rows(sales_data.data, SALES_FIELDS, str(sales_data.tenant_id)),
+                    SALES_CONFLICT_COLUMNS,
+                    SALES_UPDATE_COLUMNS,
+                    before_merge=apply_sales_rollup,
                 )
-            ).decode('utf-8')
-            for rec in sales_data.data
-        ])
-        
-        # Sentencia SQL para UPSERT (INSERT ... ON CONFLICT DO UPDATE).
-        # Si la combinación (tenant_id, date, sku) ya existe,
-        # se actualizan la cantidad y el precio.
-        query = f"""
-            INSERT INTO sales (date, sku, qty, price, channel, tenant_id)
-            VALUES {values}
-            ON CONFLICT (tenant_id, date, sku) DO UPDATE
-            SET qty = EXCLUDED.qty, price = EXCLUDED.price;
-        """
-        
-        cur.execute(query)
-        conn.commit()
-        logging.info(f"Successfully ingested {len(sales_data.data)} sales records.")
+            else:
+                # Prepara un string con los valores a insertar. Esto es más eficiente
+                # que realizar una inserción por cada registro.
+                values = ', '.join([
+                    cur.mogrify(
+                        "(%s, %s, %s, %s, %s, %s)",
+                        (
+                            rec.date,
+                            rec.sku,
+                            rec.qty,
+                            rec.price,
+                            rec.channel,
+                            # Convertimos el UUID a string para que psycopg2 lo pueda manejar.
+                            str(sales_data.tenant_id)
+                        )
+                    ).decode('utf-8')
+                    for rec in sales_data.data
+                ])
+
+                # UPSERT (INSERT ... ON CONFLICT DO UPDATE): si la combinación
+                # (tenant_id, date, sku) ya existe, se actualizan la cantidad y el precio.
+                # Antes de fusionar se aplica el delta a `sales_daily_rollup`.
+                values_upsert(
+                    cur,
+                    "sales",
+                    SALES_COLUMNS,
+                    values,
+                    SALES_CONFLICT_COLUMNS,
+                    SALES_UPDATE_COLUMNS,
+                    before_merge=apply_sales_rollup,
+                )
+                rows = len(sales_data.data)
+
+            conn.commit()
+            invalidate_tenant(sales_data.tenant_id, "sales")
+            mode = "copy" if bulk else "values"
+            stats = build_stats(mode, rows, started, "sales")
+            logging.info(f"Successfully ingested {rows} sales records ({stats['rows_per_second']} rows/s, {mode}).")
+            return stats
         
-    except Exception as e:
-        # Si hay un error, se deshace la transacción.
-        conn.rollback()
-        logging.error(f"Error during sales data ingestion: {e}")
-        # Relanzamos la excepción para que sea manejada por el router.
-        raise e
+        except Exception as e:
+            # Si hay un error, se deshace la transacción.
+            conn.rollback()
+            logging.error(f"Error during sales data ingestion: {e}")
+            # Relanzamos la excepción para que sea manejada por el router.
+            raise e
         
-    finally:
-        # Aseguramos que la conexión se cierre correctamente.
-        cur.close()
-        conn.close()
+        finally:
+            # Cerramos el cursor; la conexión vuelve al pool al salir del bloque `with`.
+            cur.close()
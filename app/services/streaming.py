@@ -0,0 +1,237 @@
+# app/services/streaming.py
+#
+# Ingesta en streaming de cuerpos NDJSON o CSV.
+# El cuerpo de la petición se lee por trozos, las filas se validan con Pydantic
+# a medida que llegan y se vuelcan a PostgreSQL en lotes de tamaño fijo, de modo
+# que la memoria usada no depende del tamaño del fichero.
+
+import csv
+import json
+import os
+import time
+import logging
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Type
+
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, ValidationError
+
+from app.services.bulk import build_stats
+
+# Número de filas que se validan y escriben en cada lote por defecto.
+DEFAULT_BATCH_SIZE = 5000
+# Tamaño máximo de una línea o de un registro CSV multilínea. Limita lo que se
+# guarda en memoria de un registro aún incompleto (p. ej. un cuerpo sin saltos
+# de línea o unas comillas que nunca se cierran).
+STREAM_MAX_RECORD_BYTES = int(os.getenv("STREAM_MAX_RECORD_BYTES", str(1024 * 1024)))
+
+
+class StreamValidationError(Exception):
+    """
+    Se lanza cuando una fila del stream no es válida.
+    Incluye el número de línea y las filas ya confirmadas en la base de datos.
+    """
+
+    def __init__(self, line_number: int, errors: Any, rows_committed: int = 0):
+        super().__init__(f"Invalid record at line {line_number}")
+        self.line_number = line_number
+        self.errors = errors
+        self.rows_committed = rows_committed
+
+
+def resolve_stream_format(fmt: Optional[str], content_type: Optional[str]) -> str:
+    """
+    Determina el formato del cuerpo: el parámetro explícito tiene prioridad
+    y, si no se indica, se deduce de la cabecera `Content-Type`.
+    """
+    if fmt:
+        return fmt
+    if content_type and "csv" in content_type.lower():
+        return "csv"
+    return "ndjson"
+
+
+def _record_too_large(line_number: int, max_bytes: int) -> StreamValidationError:
+    return StreamValidationError(line_number, [{"type": "too_large", "msg": f"Record exceeds {max_bytes} bytes"}])
+
+
+async def _aiter_lines(
+    chunks: AsyncIterator[bytes],
+    keepends: bool = False,
+    max_line_bytes: int = STREAM_MAX_RECORD_BYTES,
+) -> AsyncIterator[str]:
+    """
+    Convierte un iterador asíncrono de bytes en líneas de texto,
+    guardando en memoria como mucho una línea incompleta.
+
+    Cada trozo solo se recorre una vez: la búsqueda del salto de línea empieza
+    donde terminó la anterior. Una línea de más de `max_line_bytes` bytes lanza
+    `StreamValidationError`. Con `keepends` cada línea conserva su terminador
+    (`\n` o `\r\n`).
+    """
+    pending = bytearray()
+    line_number = 0
+    async for chunk in chunks:
+        scanned = len(pending)
+        pending += chunk
+        start = 0
+        while (end := pending.find(b"\n", scanned)) >= 0:
+            line_number += 1
+            if end - start > max_line_bytes:
+                raise _record_too_large(line_number, max_line_bytes)
+            line = bytes(pending[start:end + 1] if keepends else pending[start:end].rstrip(b"\r"))
+            yield line.decode("utf-8")
+            start = scanned = end + 1
+        # Lo que queda es el final del trozo actual: el recorte es lineal.
+        del pending[:start]
+        if len(pending) > max_line_bytes:
+            raise _record_too_large(line_number + 1, max_line_bytes)
+    if pending:
+        line = bytes(pending if keepends else pending.rstrip(b"\r"))
+        yield line.decode("utf-8")
+
+
+class _CsvLineFeed:
+    """
+    Fuente de líneas para un único `csv.reader` que se alimenta a medida que
+    llega el cuerpo. Lleva la cuenta de las comillas para saber si el registro
+    en curso sigue abierto (un campo entre comillas con saltos de línea), de
+    modo que el lector solo se consulta con registros completos y nunca agota
+    la fuente a mitad de un campo.
+    """
+
+    def __init__(self):
+        self._lines: Deque[str] = deque()
+        self.in_quotes = False
+        self.size = 0
+
+    def push(self, line: str) -> None:
+        self._lines.append(line)
+        self.size += len(line)
+        # Las comillas escapadas ("") no cambian la paridad.
+        if line.count('"') % 2:
+            self.in_quotes = not self.in_quotes
+
+    def __bool__(self) -> bool:
+        return bool(self._lines)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if not self._lines:
+            raise StopIteration
+        line = self._lines.popleft()
+        self.size -= len(line)
+        return line
+
+
+async def iter_record_batches(
+    chunks: AsyncIterator[bytes],
+    fmt: str,
+    record_model: Type[BaseModel],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_record_bytes: int = STREAM_MAX_RECORD_BYTES,
+) -> AsyncIterator[List[BaseModel]]:
+    """
+    Valida las filas de un stream NDJSON o CSV y las entrega en lotes
+    de, como mucho, `batch_size` registros.
+
+    En CSV la primera línea no vacía es la cabecera y los campos entre
+    comillas pueden ocupar varias líneas; los errores indican la línea en la
+    que empieza el registro. Los campos vacíos se omiten para que se apliquen
+    los valores por defecto del modelo. Una línea o un registro de más de
+    `max_record_bytes` se rechaza con `StreamValidationError`.
+    """
+    header = None
+    batch: List[BaseModel] = []
+    line_number = 0
+    record_line = 0
+    feed = _CsvLineFeed()
+    reader = csv.reader(feed)
+
+    # Los errores de decodificación llegan al pedir la siguiente línea: se
+    # atribuyen al registro en curso o, si no lo hay, a la línea que empieza.
+    try:
+        async for line in _aiter_lines(chunks, keepends=fmt == "csv", max_line_bytes=max_record_bytes):
+            line_number += 1
+
+            if fmt == "csv":
+                if not feed:
+                    if not line.strip():
+                        continue
+                    record_line = line_number
+                feed.push(line)
+                if feed.in_quotes:
+                    if feed.size > max_record_bytes:
+                        raise _record_too_large(record_line, max_record_bytes)
+                    continue
+            elif not line.strip():
+                continue
+            else:
+                record_line = line_number
+
+            try:
+                if fmt == "csv":
+                    values = next(reader)
+                    if header is None:
+                        header = [name.strip().lstrip("\ufeff") for name in values]
+                        continue
+                    row = {name: value for name, value in zip(header, values) if value != ""}
+                    record = record_model.model_validate(row)
+                else:
+                    record = record_model.model_validate_json(line)
+            except ValidationError as e:
+                raise StreamValidationError(record_line, json.loads(e.json()))
+            except csv.Error as e:
+                raise StreamValidationError(record_line, [{"type": "csv", "msg": str(e)}])
+
+            batch.append(record)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    except UnicodeDecodeError as e:
+        raise StreamValidationError(record_line if feed else line_number + 1, [{"type": "unicode", "msg": str(e)}])
+
+    if feed:
+        raise StreamValidationError(record_line, [{"type": "csv", "msg": "Unterminated quoted field"}])
+
+    if batch:
+        yield batch
+
+
+async def stream_ingest(
+    chunks: AsyncIterator[bytes],
+    fmt: str,
+    record_model: Type[BaseModel],
+    flush: Callable[[List[BaseModel]], Any],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Dict[str, Any]:
+    """
+    Lee el stream, valida por lotes y llama a `flush` (síncrona) con cada lote
+    en el threadpool. Mientras se escribe un lote no se lee más del cuerpo,
+    por lo que la conexión aplica contrapresión al cliente.
+
+    Cada lote se confirma en su propia transacción. Si una fila no es válida,
+    se lanza `StreamValidationError` indicando cuántas filas quedaron guardadas.
+
+    Returns:
+        dict: Resumen de la ingesta, con el número de lotes y el rendimiento.
+    """
+    started = time.perf_counter()
+    rows = 0
+    batches = 0
+
+    try:
+        async for batch in iter_record_batches(chunks, fmt, record_model, batch_size):
+            await run_in_threadpool(flush, batch)
+            rows += len(batch)
+            batches += 1
+    except StreamValidationError as e:
+        e.rows_committed = rows
+        raise
+
+    stats = build_stats(f"stream-{fmt}", rows, started)
+    stats["batches"] = batches
+    logging.info(f"Streamed {rows} {record_model.__name__} rows in {batches} batches ({stats['rows_per_second']} rows/s).")
+    return stats
@@ -68,9 +68,11 @@ loginForm.addEventListener('submit', (e) => {
 // LÓGICA DEL DASHBOARD
 // ===============================================
 
-async function fetchData(endpoint) {
+async function fetchData(endpoint, params = {}) {
     const headers = { 'Authorization': `Bearer ${accessToken}` };
-    const response = await fetch(`${BASE_URL}${endpoint}/${TENANT_ID}`, { headers });
+    const query = new URLSearchParams(params).toString();
+    const url = `${BASE_URL}${endpoint}/${TENANT_ID}${query ? `?${query}` : ''}`;
+    const response = await fetch(url, { headers });
     if (!response.ok) {
         console.error(`Error fetching ${endpoint}:`, response.statusText);
         return null;
@@ -79,26 +81,25 @@ async function fetchData(endpoint) {
 }
 
 async function fetchKPIs() {
-  const totalSales = await fetchData('/data/analytics/total_sales');
-  document.getElementById('total-sales').textContent = `${(totalSales?.total_sales || 0).toFixed(2)} €`;
-
-  const totalInventory = await fetchData('/data/analytics/total_inventory');
-  document.getElementById('total-inventory').textContent = `${totalInventory?.total_inventory || 0} unidades`;
-  
-  const totalValue = await fetchData('/data/analytics/total_inventory_value');
-  document.getElementById('total-inventory-value').textContent = `${(totalValue?.total_inventory_value || 0).toFixed(2)} €`;
-
-  const salesByChannelData = await fetchData('/data/analytics/sales_by_channel');
-  renderSalesByChannelChart(salesByChannelData?.sales_by_channel || {});
-
-  const salesData = await fetchData('/data/sales');
-  renderSalesChart(salesData?.data || []);
+  // Todos los KPIs llegan en una sola petición (un único recorrido de las tablas).
+  const summary = await fetchData('/data/analytics/summary');
+  document.getElementById('total-sales').textContent = `${(summary?.total_sales || 0).toFixed(2)} €`;
+  document.getElementById('total-inventory').textContent = `${summary?.total_inventory || 0} unidades`;
+  document.getElementById('total-inventory-value').textContent = `${(summary?.total_inventory_value || 0).toFixed(2)} €`;
+  renderSalesByChannelChart(summary?.sales_by_channel || {});
+
+  // Solo pedimos las columnas que se renderizan, y en paralelo. El gráfico
+  // usa el total por SKU del servidor: las listas solo traen la primera página.
+  const [salesBySku, salesData, productsData, inventoryData] = await Promise.all([
+    fetchData('/data/analytics/sales_by_sku'),
+    fetchData('/data/sales', { fields: 'sku,qty,price' }),
+    fetchData('/data/products', { fields: 'sku,name,category' }),
+    fetchData('/data/inventory', { fields: 'sku,qty,location' }),
+  ]);
+
+  renderSalesChart(salesBySku?.sales_by_sku || {});
   renderLists(salesData?.data || [], 'sales-list');
-
-  const productsData = await fetchData('/data/products');
   renderLists(productsData?.data || [], 'products-list');
-  
-  const inventoryData = await fetchData('/data/inventory');
   renderLists(inventoryData?.data || [], 'inventory-list');
 }
 
@@ -223,12 +224,7 @@ function renderLists(data, elementId) {
     });
 }
 
-function renderSalesChart(salesData) {
-  const salesBySku = salesData.reduce((acc, item) => {
-    acc[item.sku] = (acc[item.sku] || 0) + (item.qty * item.price);
-    return acc;
-  }, {});
-  
+function renderSalesChart(salesBySku) {
   const ctx = document.getElementById('salesChart').getContext('2d');
   if (salesChart) salesChart.destroy();
   salesChart = new Chart(ctx, {
@@ -0,0 +1,103 @@
+# benchmarks/create_features.py
+#
+# Micro-benchmark de la ingeniería de características del job de pronóstico.
+#
+# Compara, sobre una matriz sintética (por defecto 5.000 SKUs × 3 años):
+#   - `legacy`: la versión original, que llamaba a `create_features` por SKU
+#     (con `df.sum(axis=1).shift(lag)` por lag) y rellenaba los lags de
+#     predicción con asignaciones `.loc` fila a fila. Se mide sobre una muestra
+#     de SKUs y se extrapola al total.
+#   - `vectorized`: `build_feature_arrays` sobre la matriz completa de una vez.
+#
+#     python -m benchmarks.create_features --skus 5000 --days 1095
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+
+from app.jobs.forecast.features import build_feature_arrays
+
+
+def legacy_create_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Copia de la implementación original, solo como referencia."""
+    df['weekday'] = df.index.weekday
+    df['month'] = df.index.month
+    df['day_of_month'] = df.index.day
+    for lag in [7, 14, 28]:
+        df[f'lag_{lag}'] = df.sum(axis=1).shift(lag).fillna(0)
+    return df
+
+
+def legacy_features_for_sku(series: pd.Series, forecast_horizon: int) -> pd.DataFrame:
+    series_df = legacy_create_features(series.to_frame(name='total_qty'))
+    features = [col for col in series_df.columns if col != 'total_qty']
+    X_predict = series_df.iloc[-forecast_horizon:][features].copy()
+    for i in range(1, forecast_horizon + 1):
+        X_predict.loc[X_predict.index[i-1], 'lag_7'] = series_df['total_qty'].iloc[-1]
+        X_predict.loc[X_predict.index[i-1], 'lag_14'] = series_df['total_qty'].iloc[-1]
+        X_predict.loc[X_predict.index[i-1], 'lag_28'] = series_df['total_qty'].iloc[-1]
+    return X_predict
+
+
+def synthetic_matrix(n_skus: int, n_days: int, seed: int = 11) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2021-01-01", periods=n_days, freq="D", name="date")
+    return pd.DataFrame(
+        rng.poisson(4.0, size=(n_days, n_skus)).astype(np.float64),
+        index=index,
+        columns=[f"VINO-{i:05d}" for i in range(n_skus)],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark de create_features.")
+    parser.add_argument("--skus", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=3 * 365)
+    parser.add_argument("--horizon", type=int, default=14)
+    parser.add_argument("--legacy-sample", type=int, default=200, help="SKUs medidos con la versión original.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Fichero JSON donde guardar los resultados.")
+    args = parser.parse_args()
+
+    sales_df = synthetic_matrix(args.skus, args.days)
+    values = sales_df.to_numpy()
+
+    vectorized = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        build_feature_arrays(values, sales_df.index)
+        vectorized.append(time.perf_counter() - started)
+
+    sample = sales_df.columns[:min(args.legacy_sample, args.skus)]
+    started = time.perf_counter()
+    for sku in sample:
+        legacy_features_for_sku(sales_df[sku], args.horizon)
+    legacy_sample_seconds = time.perf_counter() - started
+    legacy_estimate = legacy_sample_seconds * args.skus / len(sample)
+
+    report = {
+        "skus": args.skus,
+        "days": args.days,
+        "cells": args.skus * args.days,
+        "vectorized_seconds": round(min(vectorized), 4),
+        "legacy_sample_skus": len(sample),
+        "legacy_sample_seconds": round(legacy_sample_seconds, 4),
+        "legacy_estimated_seconds": round(legacy_estimate, 2),
+        "speedup": round(legacy_estimate / min(vectorized), 1),
+    }
+    print(json.dumps(report, indent=2))
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
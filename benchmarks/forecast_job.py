@@ -0,0 +1,332 @@
+# benchmarks/forecast_job.py
+#
+# Benchmark de extremo a extremo del job de pronóstico (`app/jobs/forecast/job.py`)
+# sobre ventas sintéticas de vino.
+#
+# El generador produce, por SKU, demanda con estacionalidad semanal (picos el
+# fin de semana) y anual según la categoría (tintos en invierno, blancos y
+# rosados en verano, espumosos en Navidad), tendencia, promociones con
+# descuento y subida de ventas, demanda intermitente y lanzamientos a mitad
+# del histórico. Se miden las mismas etapas que el job, con `ForecastRunStats`:
+#   - `load`: histórico compacto (`load_sales_history`, lo que usa
+#     `get_sales_data`). En memoria se alimenta `build_history` con bloques de
+#     filas como los que devolvería el cursor; con `--database` se copian las
+#     ventas a la tabla `sales` de un tenant temporal y se leen de verdad.
+#   - `pivot`: la matriz densa de `get_sales_data` (solo en modo `global`).
+#   - `features`: `build_feature_arrays` sobre todos los SKUs.
+#   - `forecast`: entrenamiento y predicción (con el reparto por SKU en
+#     `sku_stages`).
+#   - `write`: `write_forecast_run`. En memoria, sobre un cursor que consume el
+#     `COPY` sin enviarlo; con `--database`, en una transacción que se deshace.
+# Informa de SKUs/s y del RSS máximo tras cada etapa.
+#
+# Para comprobar que una optimización no cambia los pronósticos, se guarda una
+# referencia y se compara con ella (sale con código 1 si se supera la tolerancia):
+#
+#     python -m benchmarks.forecast_job --skus 500 --days 730 --save-reference ref.json
+#     python -m benchmarks.forecast_job --skus 500 --days 730 --reference ref.json --tolerance 1e-6
+
+import argparse
+import json
+import os
+import resource
+import sys
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+
+from app.database import db_connection
+from app.jobs.forecast.features import build_feature_arrays
+from app.jobs.forecast.global_model import forecast_global
+from app.jobs.forecast.job import forecast_all_skus
+from app.jobs.forecast.loader import DEFAULT_LOAD_ITERSIZE, build_history, load_sales_history
+from app.jobs.forecast.progress import ForecastRunStats
+from app.jobs.forecast.writer import write_forecast_run
+from app.services.bulk import CopyRowStream
+
+CATEGORIES = ("tinto", "blanco", "rosado", "espumoso")
+
+# Factor por día de la semana (lunes = 0): el vino se vende sobre todo en fin de semana.
+WEEKDAY_FACTORS = np.array([0.75, 0.8, 0.9, 1.0, 1.3, 1.5, 0.85])
+
+
+def _annual_factor(category: str, day_of_year: np.ndarray) -> np.ndarray:
+    if category == "espumoso":
+        # Casi todo en diciembre, con el pico en Nochevieja.
+        return 0.6 + 2.5 * np.exp(-((day_of_year - 358) ** 2) / (2 * 8.0 ** 2))
+    peak = 15 if category == "tinto" else 196
+    return 1 + 0.35 * np.cos(2 * np.pi * (day_of_year - peak) / 365.25)
+
+
+def synthetic_wine_sales(
+    n_skus: int,
+    n_days: int,
+    seed: int = 7,
+    intermittent_share: float = 0.3,
+    launch_share: float = 0.1,
+    promos_per_year: float = 4.0,
+) -> Tuple[pd.DataFrame, Dict[str, str]]:
+    """
+    Ventas diarias sintéticas en formato largo (`sku`, `date`, `qty`, `price`,
+    `channel`), ordenadas por SKU y fecha y solo con los días con ventas, como
+    las guarda la tabla `sales`. Devuelve también la categoría de cada SKU.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2022-01-01", periods=n_days, freq="D")
+    weekday = WEEKDAY_FACTORS[dates.weekday.to_numpy()]
+    day_of_year = dates.dayofyear.to_numpy()
+    channels = np.array(["online", "tienda", "distribuidor"])
+
+    frames = []
+    categories = {}
+    for i in range(n_skus):
+        sku = f"VINO-{i:05d}"
+        category = CATEGORIES[i % len(CATEGORIES)]
+        categories[sku] = category
+
+        base = rng.gamma(2.0, 2.5)
+        trend = 1 + rng.uniform(-0.2, 0.2) * np.linspace(0, 1, n_days)
+        rate = base * weekday * _annual_factor(category, day_of_year) * trend
+
+        # Promociones: ventanas de 7 a 14 días con descuento y subida de la demanda.
+        price = np.full(n_days, round(float(rng.uniform(6, 45)), 2))
+        for start in np.flatnonzero(rng.random(n_days) < promos_per_year / 365):
+            window = slice(start, start + int(rng.integers(7, 15)))
+            rate[window] *= rng.uniform(1.5, 2.5)
+            price[window] = np.round(price[window] * 0.8, 2)
+
+        # Demanda intermitente: solo hay ventas algunos días, en lotes pequeños.
+        if rng.random() < intermittent_share:
+            rate = np.where(rng.random(n_days) < rng.uniform(0.05, 0.3), 1 + rate, 0.0)
+
+        # Lanzamientos: el SKU no existe antes de una fecha al azar.
+        if rng.random() < launch_share:
+            rate[: int(rng.integers(n_days // 4, 3 * n_days // 4))] = 0.0
+
+        qty = rng.poisson(rate)
+        sold = np.flatnonzero(qty)
+        frames.append(pd.DataFrame({
+            "sku": sku,
+            "date": dates[sold].date,
+            "qty": qty[sold].astype(np.int32),
+            "price": price[sold],
+            "channel": channels[rng.integers(0, len(channels), len(sold))],
+        }))
+
+    return pd.concat(frames, ignore_index=True), categories
+
+
+def _row_batches(sales: pd.DataFrame, itersize: int):
+    """Bloques de tuplas `(sku, date, qty)`, como los `fetchmany` del cursor del loader."""
+    rows = list(zip(sales["sku"], sales["date"], sales["qty"].tolist()))
+    for start in range(0, len(rows), itersize):
+        yield rows[start:start + itersize]
+
+
+class CopySinkCursor:
+    """
+    Cursor en memoria para `write_forecast_run`: responde a sus consultas y
+    consume el `COPY` (generando todas sus líneas) sin enviarlo a ningún sitio.
+    """
+
+    def __init__(self):
+        self.rowcount = 0
+        self.copy_bytes = 0
+        self._result = None
+
+    def execute(self, sql: str, params=None) -> None:
+        self._result = (1,) if "RETURNING run_id" in sql else None
+
+    def fetchone(self):
+        return self._result
+
+    def copy_expert(self, sql: str, stream) -> None:
+        while True:
+            chunk = stream.read(65536)
+            if not chunk:
+                break
+            self.copy_bytes += len(chunk)
+
+
+def peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    """RSS máximo del proceso (o del mayor de sus hijos terminados), en MiB (`ru_maxrss` en KiB en Linux)."""
+    return round(resource.getrusage(who).ru_maxrss / 1024, 1)
+
+
+def seed_database(tenant_id: str, sales: pd.DataFrame) -> None:
+    """Copia las ventas sintéticas a la tabla `sales` para `tenant_id`."""
+    rows = zip(sales["sku"], sales["date"], sales["qty"].tolist(), sales["price"].tolist(), sales["channel"])
+    stream = CopyRowStream((tenant_id, day, sku, qty, price, channel) for sku, day, qty, price, channel in rows)
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.copy_expert("COPY sales (tenant_id, date, sku, qty, price, channel) FROM STDIN", stream)
+        conn.commit()
+
+
+def cleanup_database(tenant_id: str) -> None:
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("DELETE FROM sales WHERE tenant_id = %s", (tenant_id,))
+        conn.commit()
+
+
+def run(args, sales: pd.DataFrame, categories: Dict[str, str]) -> Tuple[dict, List[dict]]:
+    tenant_id = str(uuid.uuid4())
+    stats = ForecastRunStats()
+    rss: Dict[str, float] = {"generate": peak_rss_mb()}
+    calendar = (sales["date"].min(), sales["date"].max())
+
+    if args.database:
+        seed_database(tenant_id, sales)
+    try:
+        with stats.stage("load"):
+            if args.database:
+                history = load_sales_history(tenant_id, start=calendar[0], end=calendar[1])
+            else:
+                history = build_history(_row_batches(sales, DEFAULT_LOAD_ITERSIZE), *calendar)
+        rss["load"] = peak_rss_mb()
+        stats.count("rows_loaded", history.n_rows)
+        stats.count("history_bytes", history.nbytes)
+
+        with stats.stage("features"):
+            matrix = np.column_stack([history.dense_series(i) for i in range(len(history.skus))])
+            build_feature_arrays(matrix, history.dates)
+        del matrix
+        rss["features"] = peak_rss_mb()
+
+        if args.mode == "global":
+            with stats.stage("pivot"):
+                sales_df = history.to_frame()
+            rss["pivot"] = peak_rss_mb()
+            with stats.stage("forecast"):
+                timings = {"strategy": "global"}
+                forecast_results = forecast_global(tenant_id, sales_df, args.horizon, categories, timings=timings)
+                stats.record_model(timings, skus=len(sales_df.columns))
+        else:
+            with stats.stage("forecast"):
+                forecast_results = forecast_all_skus(
+                    tenant_id, history, args.horizon, workers=args.workers, chunk_size=args.chunk_size, stats=stats,
+                )
+        rss["forecast"] = peak_rss_mb()
+
+        with stats.stage("write"):
+            skus = list(history.skus)
+            if args.database:
+                with db_connection() as conn:
+                    with conn.cursor() as cursor:
+                        write_forecast_run(cursor, tenant_id, forecast_results, skus, args.mode, args.horizon)
+                    conn.rollback()
+            else:
+                cursor = CopySinkCursor()
+                write_forecast_run(cursor, tenant_id, forecast_results, skus, args.mode, args.horizon)
+                stats.count("copy_bytes", cursor.copy_bytes)
+        rss["write"] = peak_rss_mb()
+        stats.count("predictions_written", len(forecast_results))
+    finally:
+        if args.database:
+            cleanup_database(tenant_id)
+
+    report = stats.summary()
+    report["peak_rss_mb"] = rss
+    if args.mode == "per_sku" and args.workers > 1:
+        report["peak_worker_rss_mb"] = peak_rss_mb(resource.RUSAGE_CHILDREN)
+    return report, forecast_results
+
+
+def predictions_by_sku(forecast_results: List[dict]) -> Dict[str, dict]:
+    """
+    Predicciones de cada SKU por paso del horizonte. Se comparan por posición,
+    no por fecha: la media móvil fecha sus predicciones a partir de hoy.
+    """
+    by_sku: Dict[str, dict] = {}
+    for row in forecast_results:
+        entry = by_sku.setdefault(row["sku"], {"model_used": row["model_used"], "predicted_qty": []})
+        entry["predicted_qty"].append(float(row["predicted_qty"]))
+    return by_sku
+
+
+def compare_predictions(current: Dict[str, dict], reference: Dict[str, dict], tolerance: float) -> dict:
+    """
+    Compara las predicciones con una referencia. Un SKU falla si falta, si
+    cambia de modelo o si alguna predicción difiere más de
+    `tolerance * max(1, |referencia|)`.
+    """
+    failed: List[str] = []
+    max_abs_diff = 0.0
+    for sku, expected in reference.items():
+        got = current.get(sku)
+        if got is None or got["model_used"] != expected["model_used"] \
+                or len(got["predicted_qty"]) != len(expected["predicted_qty"]):
+            failed.append(sku)
+            continue
+        ref = np.asarray(expected["predicted_qty"])
+        diff = np.abs(np.asarray(got["predicted_qty"]) - ref)
+        max_abs_diff = max(max_abs_diff, float(diff.max(initial=0.0)))
+        if np.any(diff > tolerance * np.maximum(1.0, np.abs(ref))):
+            failed.append(sku)
+    extra = sorted(set(current) - set(reference))
+    return {
+        "tolerance": tolerance,
+        "skus_compared": len(reference),
+        "skus_failed": len(failed) + len(extra),
+        "failed_examples": (failed + extra)[:10],
+        "max_abs_diff": max_abs_diff,
+        "passed": not failed and not extra,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del job de pronóstico con ventas sintéticas.")
+    parser.add_argument("--skus", type=int, default=200)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--horizon", type=int, default=14)
+    parser.add_argument("--mode", choices=("per_sku", "global"), default="per_sku")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--chunk-size", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--intermittent-share", type=float, default=0.3)
+    parser.add_argument("--promos-per-year", type=float, default=4.0)
+    parser.add_argument(
+        "--database", action="store_true",
+        help="Usa la base de datos de DATABASE_URL (tenant temporal) en lugar del sustituto en memoria.",
+    )
+    parser.add_argument("--save-reference", help="Guarda las predicciones como referencia.")
+    parser.add_argument("--reference", help="Compara las predicciones con esta referencia.")
+    parser.add_argument("--tolerance", type=float, default=1e-6, help="Tolerancia relativa (absoluta por debajo de 1).")
+    parser.add_argument("--output", help="Fichero JSON donde guardar los resultados.")
+    args = parser.parse_args()
+
+    sales, categories = synthetic_wine_sales(
+        args.skus, args.days, args.seed, args.intermittent_share, promos_per_year=args.promos_per_year,
+    )
+    report, forecast_results = run(args, sales, categories)
+    report["dataset"] = {
+        "skus": args.skus, "days": args.days, "horizon": args.horizon, "rows": len(sales),
+        "mode": args.mode, "workers": args.workers, "seed": args.seed,
+        "backend": "database" if args.database else "memory",
+    }
+
+    predictions = predictions_by_sku(forecast_results)
+    if args.save_reference:
+        with open(args.save_reference, "w") as fh:
+            json.dump({"dataset": report["dataset"], "predictions": predictions}, fh)
+    comparison: Optional[dict] = None
+    if args.reference:
+        with open(args.reference) as fh:
+            comparison = compare_predictions(predictions, json.load(fh)["predictions"], args.tolerance)
+        report["reference"] = comparison
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2)
+    if comparison is not None and not comparison["passed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# benchmarks/forecast_modes.py
+#
+# Compara el modo por SKU y el modelo global del job de pronóstico: tiempo de
+# reloj y precisión (MAE y WAPE) sobre los últimos días del histórico.
+#
+# Con `--tenant-id` usa las ventas y categorías reales de ese tenant; si no,
+# genera series sintéticas con estacionalidad semanal y demanda intermitente:
+#
+#     python -m benchmarks.forecast_modes --skus 500 --days 730 --workers 4
+
+import argparse
+import json
+import os
+import sys
+from uuid import UUID
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+
+from app.jobs.forecast.job import compare_forecast_modes, get_product_categories, get_sales_data
+
+
+def synthetic_sales(n_skus: int, n_days: int, seed: int = 7):
+    """
+    Ventas diarias sintéticas (fechas × SKUs) y una categoría por SKU.
+    Un tercio de los SKUs tiene demanda intermitente.
+    """
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2022-01-01", periods=n_days, freq="D", name="date")
+    weekly = 1 + 0.4 * np.sin(2 * np.pi * index.weekday.to_numpy() / 7)[:, None]
+    base = rng.gamma(2.0, 3.0, size=n_skus)[None, :]
+    qty = rng.poisson(base * weekly).astype(float)
+
+    intermittent = rng.random(n_skus) < 1 / 3
+    qty[:, intermittent] *= rng.random((n_days, intermittent.sum())) < 0.2
+
+    skus = [f"VINO-{i:05d}" for i in range(n_skus)]
+    categories = {sku: ("tinto", "blanco", "rosado", "espumoso")[i % 4] for i, sku in enumerate(skus)}
+    return pd.DataFrame(qty, index=index, columns=skus), categories
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara el modo por SKU y el modelo global.")
+    parser.add_argument("--tenant-id", type=UUID, help="Usa los datos reales de este tenant.")
+    parser.add_argument("--skus", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--horizon", type=int, default=14)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--output", help="Fichero JSON donde guardar los resultados.")
+    args = parser.parse_args()
+
+    if args.tenant_id:
+        sales_df = get_sales_data(args.tenant_id)
+        categories = get_product_categories(args.tenant_id)
+    else:
+        sales_df, categories = synthetic_sales(args.skus, args.days)
+
+    report = compare_forecast_modes(sales_df, args.horizon, categories, args.workers)
+    report["dataset"] = {"skus": len(sales_df.columns), "days": len(sales_df), "horizon": args.horizon}
+    print(json.dumps(report, indent=2))
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,464 @@
+# benchmarks/load_test.py
+#
+# Prueba de carga de los endpoints más usados de la API contra un Postgres local.
+#
+# - Siembra tenants sintéticos en las tablas reales (`products`, `sales`,
+#   `inventory`, los agregados y una ejecución de pronóstico publicada), con
+#   el nº de SKUs, días de histórico y ubicaciones indicados. Los tenants se
+#   borran al terminar salvo que se pase `--keep`.
+# - Arranca la API con uvicorn en un subproceso (o usa una ya levantada con
+#   `--base-url`, y `--server-pid` para medir su memoria) y lanza contra cada
+#   endpoint `--requests` peticiones con `--concurrency` clientes simultáneos,
+#   repartidas entre los tenants.
+# - Por endpoint informa de throughput, latencias p50/p95/p99/máx., errores y
+#   RSS máximo del proceso del servidor (muestreado de `/proc`, solo Linux).
+# - El resultado se guarda en JSON (`--output`); con `--baseline` se compara
+#   con una ejecución anterior y se imprime la variación de p95 y throughput.
+#
+# Requiere el esquema aplicado (`migrations/*.sql`) en la base de datos de
+# `DATABASE_URL`. No la uses contra una base de datos de producción.
+#
+#     DATABASE_URL=postgresql://... python -m benchmarks.load_test \
+#         --tenants 4 --skus 200 --days 365 --concurrency 16 --requests 500 --output load.json
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+import psycopg2
+
+from app.database import DATABASE_URL
+from app.services.auth import create_access_token
+from app.services.rollups import REBUILD_ROLLUPS
+
+FORECAST_SECRET = os.environ.get("FORECAST_SECRET", "super-secret-key-123")
+
+# Primer día del histórico sembrado; las ingestas escriben a continuación.
+START_DATE = date(2022, 1, 1)
+
+SEED = """
+    INSERT INTO products (tenant_id, sku, name, category, price, description)
+    SELECT %(tenant_id)s, 'VINO-' || s, 'Vino ' || s,
+           (ARRAY['tinto', 'blanco', 'rosado', 'espumoso'])[1 + s %% 4], 8 + s %% 40, NULL
+    FROM generate_series(1, %(skus)s) s;
+
+    INSERT INTO sales (tenant_id, date, sku, qty, price, channel)
+    SELECT %(tenant_id)s, %(start)s::date + d, 'VINO-' || s, 1 + (d * s) %% 7, 8 + s %% 40,
+           (ARRAY['online', 'tienda', 'distribuidor'])[1 + (d + s) %% 3]
+    FROM generate_series(0, %(days)s - 1) d, generate_series(1, %(skus)s) s;
+
+    INSERT INTO inventory (tenant_id, date, sku, qty, location)
+    SELECT %(tenant_id)s, %(start)s::date + d, 'VINO-' || s, 50 + (d + s * l) %% 100, 'almacen_' || l
+    FROM generate_series(0, %(days)s - 1) d, generate_series(1, %(skus)s) s,
+         generate_series(1, %(locations)s) l;
+"""
+
+# Ejecución de pronóstico publicada, igual que la deja `write_forecast_run`.
+SEED_FORECASTS = """
+    WITH run AS (
+        INSERT INTO forecast_runs (tenant_id, mode, forecast_horizon, skus_refit, rows_written)
+        VALUES (%(tenant_id)s, 'per_sku', %(horizon)s, %(skus)s, %(skus)s * %(horizon)s)
+        RETURNING run_id
+    ), rows AS (
+        INSERT INTO forecasts (tenant_id, sku, date, predicted_qty, model_used, run_id)
+        SELECT %(tenant_id)s, 'VINO-' || s, %(start)s::date + %(days)s + h, 1 + (h * s) %% 5,
+               CASE WHEN s %% 3 = 0 THEN 'simple_moving_average' ELSE 'lightgbm' END, run.run_id
+        FROM run, generate_series(1, %(skus)s) s, generate_series(0, %(horizon)s - 1) h
+    )
+    INSERT INTO forecast_current_run (tenant_id, run_id, updated_at)
+    SELECT %(tenant_id)s, run_id, now() FROM run;
+"""
+
+CLEANUP_TABLES = (
+    "forecast_current_run", "forecasts", "forecast_runs", "forecast_jobs", "forecast_watermarks",
+    "sales_daily_rollup", "inventory_sku_rollup", "sales", "inventory", "products",
+)
+
+
+class Tenant(NamedTuple):
+    tenant_id: str
+    token: str
+    skus: int
+    days: int
+    locations: int
+
+
+class Endpoint(NamedTuple):
+    name: str
+    method: str
+    # Recibe el tenant y el nº de petición; devuelve (ruta, kwargs de httpx).
+    build: Callable[[Tenant, int], tuple]
+
+
+def seed_tenants(count: int, skus: int, days: int, locations: int, horizon: int) -> List[Tenant]:
+    """Crea `count` tenants con datos sintéticos y devuelve sus tokens."""
+    tenants = []
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        for _ in range(count):
+            tenant_id = str(uuid.uuid4())
+            params = {
+                "tenant_id": tenant_id, "skus": skus, "days": days,
+                "locations": locations, "horizon": horizon, "start": START_DATE,
+            }
+            started = time.perf_counter()
+            with conn.cursor() as cur:
+                cur.execute(SEED, params)
+                cur.execute(REBUILD_ROLLUPS, {"tenant_id": tenant_id})
+                cur.execute(SEED_FORECASTS, params)
+            conn.commit()
+            print(f"Tenant {tenant_id} sembrado en {time.perf_counter() - started:.1f} s", file=sys.stderr)
+
+            token = create_access_token({"sub": "load_test", "tenant_id": tenant_id})
+            tenants.append(Tenant(tenant_id, token, skus, days, locations))
+        with conn.cursor() as cur:
+            for table in ("products", "sales", "inventory", "forecasts"):
+                cur.execute(f"ANALYZE {table}")
+        conn.commit()
+    finally:
+        conn.close()
+    return tenants
+
+
+def cleanup_tenants(tenants: List[Tenant]) -> None:
+    """Borra todo lo que la prueba ha escrito para sus tenants."""
+    ids = [t.tenant_id for t in tenants]
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        with conn.cursor() as cur:
+            for table in CLEANUP_TABLES:
+                cur.execute(f"DELETE FROM {table} WHERE tenant_id = ANY(%s::uuid[])", (ids,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _ingest_keys(tenant: Tenant, n: int, batch_size: int, prefix: str = "VINO"):
+    """
+    Pares (fecha, SKU) de la petición `n` de un tenant: posteriores al histórico
+    sembrado y distintos en cada petición, para que las ingestas inserten filas
+    nuevas y ningún lote repita una clave. Cada endpoint usa su propio `prefix`.
+    """
+    for i in range(batch_size):
+        k = n * batch_size + i
+        day = START_DATE + timedelta(days=tenant.days + k // tenant.skus)
+        yield day.isoformat(), f"{prefix}-{1 + k % tenant.skus}"
+
+
+def build_endpoints(batch_size: int, page_size: int) -> List[Endpoint]:
+    """Endpoints de la prueba, en el orden en que se ejecutan."""
+
+    def auth(tenant: Tenant) -> dict:
+        return {"Authorization": f"Bearer {tenant.token}"}
+
+    def sales_body(tenant: Tenant, n: int, prefix: str = "VINO") -> dict:
+        return {"tenant_id": tenant.tenant_id, "data": [
+            {"date": day, "sku": sku, "qty": 1 + i % 7, "price": 12.5, "channel": "online"}
+            for i, (day, sku) in enumerate(_ingest_keys(tenant, n, batch_size, prefix))
+        ]}
+
+    def inventory_body(tenant: Tenant, n: int) -> dict:
+        return {"tenant_id": tenant.tenant_id, "data": [
+            {"date": day, "sku": sku, "qty": 40 + i % 60, "location": "almacen_1"}
+            for i, (day, sku) in enumerate(_ingest_keys(tenant, n, batch_size))
+        ]}
+
+    def products_body(tenant: Tenant, n: int) -> dict:
+        # Actualiza productos existentes; un lote no puede repetir SKU.
+        return {"tenant_id": tenant.tenant_id, "data": [
+            {"sku": f"VINO-{1 + (n * batch_size + i) % tenant.skus}", "name": f"Vino {n}-{i}",
+             "category": "tinto", "price": 9.5 + n % 10}
+            for i in range(min(batch_size, tenant.skus))
+        ]}
+
+    def sales_ndjson(tenant: Tenant, n: int) -> bytes:
+        return "\n".join(json.dumps(r) for r in sales_body(tenant, n, "STREAM")["data"]).encode()
+
+    def data_read(dataset: str) -> Callable:
+        def build(tenant: Tenant, n: int) -> tuple:
+            return f"/api/data/{dataset}/{tenant.tenant_id}", {
+                "headers": auth(tenant), "params": {"limit": page_size},
+            }
+        return build
+
+    def analytics(kpi: str) -> Callable:
+        def build(tenant: Tenant, n: int) -> tuple:
+            return f"/api/data/analytics/{kpi}/{tenant.tenant_id}", {"headers": auth(tenant)}
+        return build
+
+    def results(aggregate: str) -> Callable:
+        def build(tenant: Tenant, n: int) -> tuple:
+            return f"/api/forecast/forecast/results/{tenant.tenant_id}", {
+                "params": {"secret": FORECAST_SECRET, "aggregate": aggregate},
+            }
+        return build
+
+    return [
+        Endpoint("ingest_sales", "POST", lambda t, n: ("/api/ingest/sales/", {"json": sales_body(t, n)})),
+        Endpoint("ingest_sales_bulk", "POST", lambda t, n: (
+            "/api/ingest/sales/", {"json": sales_body(t, n, "BULK"), "params": {"bulk": "true"}})),
+        Endpoint("ingest_sales_stream", "POST", lambda t, n: (
+            "/api/ingest/sales/stream", {
+                "content": sales_ndjson(t, n),
+                "params": {"tenant_id": t.tenant_id, "format": "ndjson"},
+            })),
+        Endpoint("ingest_inventory", "POST", lambda t, n: ("/api/ingest/inventory/", {"json": inventory_body(t, n)})),
+        Endpoint("ingest_products", "POST", lambda t, n: ("/api/ingest/products/", {"json": products_body(t, n)})),
+        Endpoint("data_sales", "GET", data_read("sales")),
+        Endpoint("data_inventory", "GET", data_read("inventory")),
+        Endpoint("data_products", "GET", data_read("products")),
+        Endpoint("analytics_total_sales", "GET", analytics("total_sales")),
+        Endpoint("analytics_total_inventory", "GET", analytics("total_inventory")),
+        Endpoint("analytics_sales_by_channel", "GET", analytics("sales_by_channel")),
+        Endpoint("analytics_sales_by_location", "GET", analytics("sales_by_location")),
+        Endpoint("analytics_total_inventory_value", "GET", analytics("total_inventory_value")),
+        Endpoint("analytics_summary", "GET", analytics("summary")),
+        Endpoint("forecast_results", "GET", results("day")),
+        Endpoint("forecast_results_weekly", "GET", results("week")),
+    ]
+
+
+def read_rss_kb(pid: int) -> Optional[int]:
+    """RSS actual del proceso en KiB, leído de `/proc/<pid>/status` (None fuera de Linux)."""
+    try:
+        with open(f"/proc/{pid}/status") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+class RssSampler:
+    """Muestrea en un hilo el RSS de un proceso y guarda el máximo observado."""
+
+    def __init__(self, pid: Optional[int], interval: float = 0.05):
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self) -> None:
+        rss = read_rss_kb(self.pid)
+        if rss is not None and (self.peak_kb is None or rss > self.peak_kb):
+            self.peak_kb = rss
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self) -> "RssSampler":
+        if self.pid is not None:
+            self._sample()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._sample()
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+async def drive(client: httpx.AsyncClient, endpoint: Endpoint, tenants: List[Tenant],
+                requests: int, concurrency: int, first: int = 0) -> dict:
+    """
+    Lanza `requests` peticiones contra `endpoint` con `concurrency` clientes a
+    la vez, numeradas a partir de `first`.
+    """
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    counter = iter(range(first, first + requests))
+
+    async def client_loop():
+        for n in counter:
+            tenant = tenants[n % len(tenants)]
+            path, kwargs = endpoint.build(tenant, n // len(tenants))
+            started = time.perf_counter()
+            try:
+                response = await client.request(endpoint.method, path, **kwargs)
+                await response.aread()
+                key = str(response.status_code)
+            except httpx.HTTPError as e:
+                key = type(e).__name__
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[key] = statuses.get(key, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    errors = sum(count for key, count in statuses.items() if not key.startswith(("2", "3")))
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": statuses,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+    }
+
+
+async def run_endpoints(base_url: str, endpoints: List[Endpoint], tenants: List[Tenant],
+                        requests: int, warmup: int, concurrency: int, server_pid: Optional[int]) -> dict:
+    results = {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        for endpoint in endpoints:
+            if warmup:
+                await drive(client, endpoint, tenants, warmup, min(concurrency, warmup))
+            with RssSampler(server_pid) as rss:
+                row = await drive(client, endpoint, tenants, requests, concurrency, first=warmup)
+            row["peak_rss_mb"] = round(rss.peak_kb / 1024, 1) if rss.peak_kb is not None else None
+            results[endpoint.name] = row
+            print(json.dumps({"endpoint": endpoint.name, **row}), file=sys.stderr)
+    return results
+
+
+def start_server(port: int, workers: int) -> subprocess.Popen:
+    """Arranca la API con uvicorn y espera a que responda."""
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=root,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"uvicorn terminó con código {server.returncode}")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return server
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("La API no respondió en 30 s.")
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(__file__), text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report: dict, baseline: dict) -> None:
+    """Imprime la variación de p95 y throughput respecto a una ejecución anterior."""
+    print(f"{'endpoint':34} {'p95 ms':>18} {'req/s':>18}")
+    for name, row in report["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(name)
+        if not before:
+            continue
+
+        def delta(key):
+            if not before.get(key):
+                return f"{row[key]}"
+            return f"{row[key]} ({(row[key] - before[key]) / before[key]:+.0%})"
+
+        print(f"{name:34} {delta('p95_ms'):>18} {delta('throughput_rps'):>18}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de la API contra un Postgres local.")
+    parser.add_argument("--tenants", type=int, default=4)
+    parser.add_argument("--skus", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--locations", type=int, default=3)
+    parser.add_argument("--horizon", type=int, default=14, help="Días de pronóstico sembrados por SKU.")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500, help="Peticiones medidas por endpoint.")
+    parser.add_argument("--warmup", type=int, default=20, help="Peticiones de calentamiento por endpoint.")
+    parser.add_argument("--batch-size", type=int, default=200, help="Registros por petición de ingesta.")
+    parser.add_argument("--page-size", type=int, default=500, help="`limit` de las lecturas de `/api/data/*`.")
+    parser.add_argument("--only", nargs="+", help="Ejecuta solo estos endpoints.")
+    parser.add_argument("--base-url", help="API ya levantada; si se omite se arranca uvicorn.")
+    parser.add_argument("--server-pid", type=int, help="PID de la API de `--base-url`, para medir su RSS.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="Workers de uvicorn (el RSS es el del proceso padre).")
+    parser.add_argument("--keep", action="store_true", help="No borra los tenants sembrados al terminar.")
+    parser.add_argument("--baseline", help="JSON de una ejecución anterior con el que comparar.")
+    parser.add_argument("--output", help="Fichero JSON donde guardar los resultados.")
+    args = parser.parse_args()
+
+    endpoints = build_endpoints(args.batch_size, args.page_size)
+    if args.only:
+        unknown = set(args.only) - {e.name for e in endpoints}
+        if unknown:
+            parser.error(f"Endpoints desconocidos: {', '.join(sorted(unknown))}")
+        endpoints = [e for e in endpoints if e.name in args.only]
+
+    tenants = seed_tenants(args.tenants, args.skus, args.days, args.locations, args.horizon)
+    server = None
+    try:
+        if args.base_url:
+            base_url, server_pid = args.base_url, args.server_pid
+        else:
+            server = start_server(args.port, args.workers)
+            base_url, server_pid = f"http://127.0.0.1:{args.port}", server.pid
+
+        results = asyncio.run(run_endpoints(
+            base_url, endpoints, tenants, args.requests, args.warmup, args.concurrency, server_pid,
+        ))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+        if not args.keep:
+            cleanup_tenants(tenants)
+
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "config": {
+            key: getattr(args, key) for key in (
+                "tenants", "skus", "days", "locations", "horizon", "concurrency",
+                "requests", "warmup", "batch_size", "page_size", "workers",
+            )
+        },
+        "endpoints": results,
+    }
+    print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            compare(report, json.load(fh))
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# benchmarks/sales_by_channel.py
+#
+# Benchmark de las ventas por canal/ubicación frente a la longitud del histórico
+# de inventario.
+#
+# Compara varios planes sobre los mismos datos sintéticos:
+#   - `legacy`: el JOIN original `sales` ⋈ `inventory` por SKU, que multiplica
+#     cada venta por el nº de fotos de inventario (coste histórico × histórico).
+#   - `pre_aggregated`: cada lado se agrega antes del JOIN sobre las tablas base.
+#   - `rollup_location` / `rollup_channel`: las consultas de
+#     `app/services/analytics.py` sobre las tablas de agregados.
+#
+# Todo se crea en tablas temporales (que tapan a las reales dentro de la sesión),
+# así que se puede lanzar contra cualquier base de datos sin modificarla:
+#
+#     DATABASE_URL=postgresql://... python -m benchmarks.sales_by_channel --days 30 90 365 730
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import psycopg2
+
+from app.database import DATABASE_URL
+from app.services.analytics import SALES_BY_CHANNEL_QUERY, SALES_BY_LOCATION_QUERY
+from app.services.rollups import REBUILD_ROLLUPS
+
+SCHEMA = """
+    CREATE TEMP TABLE sales (tenant_id uuid, date date, sku text, qty integer, price numeric, channel text);
+    CREATE TEMP TABLE inventory (tenant_id uuid, date date, sku text, qty integer, location text);
+    CREATE TEMP TABLE sales_daily_rollup (
+        tenant_id uuid, date date, sku text, channel text,
+        qty bigint, revenue numeric, row_count integer,
+        PRIMARY KEY (tenant_id, date, sku, channel)
+    );
+    CREATE TEMP TABLE inventory_sku_rollup (
+        tenant_id uuid, sku text, location text, qty bigint, snapshots integer,
+        PRIMARY KEY (tenant_id, sku, location)
+    );
+"""
+
+SEED = """
+    INSERT INTO sales (tenant_id, date, sku, qty, price, channel)
+    SELECT %(tenant_id)s, DATE '2020-01-01' + d, 'VINO-' || s, 1 + (d * s) %% 7, 10 + s %% 30,
+           (ARRAY['online', 'tienda', 'distribuidor'])[1 + (d + s) %% 3]
+    FROM generate_series(0, %(days)s - 1) d, generate_series(1, %(skus)s) s;
+
+    INSERT INTO inventory (tenant_id, date, sku, qty, location)
+    SELECT %(tenant_id)s, DATE '2020-01-01' + d, 'VINO-' || s, 50 + (d + s * l) %% 100, 'almacen_' || l
+    FROM generate_series(0, %(days)s - 1) d, generate_series(1, %(skus)s) s,
+         generate_series(1, %(locations)s) l;
+
+    CREATE INDEX ON sales (tenant_id, sku);
+    CREATE INDEX ON inventory (tenant_id, sku);
+    ANALYZE sales;
+    ANALYZE inventory;
+"""
+
+QUERIES = {
+    "legacy": """
+        SELECT i.location, SUM(s.qty * s.price)
+        FROM sales s
+        JOIN inventory i ON s.sku = i.sku AND s.tenant_id = i.tenant_id
+        WHERE s.tenant_id = %(tenant_id)s
+        GROUP BY i.location;
+    """,
+    "pre_aggregated": """
+        WITH sales_by_sku AS (
+            SELECT sku, SUM(qty * price) AS revenue
+            FROM sales WHERE tenant_id = %(tenant_id)s GROUP BY sku
+        ),
+        inventory_by_location AS (
+            SELECT sku, location,
+                   SUM(qty)::numeric / NULLIF(SUM(SUM(qty)) OVER (PARTITION BY sku), 0) AS share
+            FROM inventory WHERE tenant_id = %(tenant_id)s GROUP BY sku, location
+        )
+        SELECT i.location, SUM(s.revenue * i.share)
+        FROM sales_by_sku s
+        JOIN inventory_by_location i ON s.sku = i.sku
+        GROUP BY i.location;
+    """,
+    "rollup_location": SALES_BY_LOCATION_QUERY,
+    "rollup_channel": SALES_BY_CHANNEL_QUERY,
+}
+
+
+def time_query(cur, query: str, params: dict, repeat: int) -> dict:
+    """Ejecuta `query` `repeat` veces y devuelve la mediana y el mínimo en ms."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        cur.execute(query, params)
+        cur.fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {"median_ms": round(statistics.median(timings), 3), "min_ms": round(min(timings), 3)}
+
+
+def run(days_list, skus: int, locations: int, repeat: int, skip_legacy_after: int) -> list:
+    results = []
+    for days in days_list:
+        tenant_id = str(uuid.uuid4())
+        params = {"tenant_id": tenant_id, "days": days, "skus": skus, "locations": locations}
+
+        # Cada tamaño usa su propia conexión para que las tablas temporales
+        # desaparezcan al cerrarla.
+        conn = psycopg2.connect(DATABASE_URL)
+        try:
+            cur = conn.cursor()
+            cur.execute(SCHEMA)
+            cur.execute(SEED, params)
+            cur.execute(REBUILD_ROLLUPS, {"tenant_id": tenant_id})
+
+            row = {
+                "days": days,
+                "sales_rows": days * skus,
+                "inventory_rows": days * skus * locations,
+            }
+            for name, query in QUERIES.items():
+                if name == "legacy" and days > skip_legacy_after:
+                    row[name] = None
+                    continue
+                row[name] = time_query(cur, query, {"tenant_id": tenant_id}, repeat)
+            results.append(row)
+        finally:
+            conn.close()
+
+        print(json.dumps(row))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de las ventas por canal/ubicación frente al histórico de inventario.")
+    parser.add_argument("--days", type=int, nargs="+", default=[30, 90, 180, 365])
+    parser.add_argument("--skus", type=int, default=200)
+    parser.add_argument("--locations", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--skip-legacy-after", type=int, default=365,
+        help="No ejecuta el plan original por encima de estos días (su coste es cuadrático).",
+    )
+    parser.add_argument("--output", help="Fichero JSON donde guardar los resultados.")
+    args = parser.parse_args()
+
+    results = run(args.days, args.skus, args.locations, args.repeat, args.skip_legacy_after)
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,15 @@
 # main.py
 
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers import sales, products, inventory, data, auth, forecast, results
 from app.database import init_db_pool, close_db_pool
-from contextlib import asynccontextmanager
+from app.async_database import init_async_db_pool, close_async_db_pool
+from app.services.forecast_results import forecast_versions
+from app.services.metrics import CONTENT_TYPE, MetricsMiddleware, metrics
+from contextlib import asynccontextmanager, suppress
+import asyncio
 import logging
 
 # Configuración básica de logging
@@ -15,8 +20,15 @@ logging.basicConfig(level=logging.INFO)
 async def lifespan(app: FastAPI):
     # Código que se ejecuta al iniciar la aplicación
     init_db_pool()
+    await init_async_db_pool()
+    # Escucha las ejecuciones publicadas del job para mantener al día los ETags de resultados.
+    forecast_listener = asyncio.create_task(forecast_versions.listen())
     yield
     # Código que se ejecuta al detener la aplicación
+    forecast_listener.cancel()
+    with suppress(asyncio.CancelledError):
+        await forecast_listener
+    await close_async_db_pool()
     close_db_pool()
 
 # Creamos la instancia principal de la aplicación con el gestor de ciclo de vida
@@ -36,6 +48,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Latencia por ruta y peticiones en curso para `/metrics`. Se añade la última
+# para que envuelva a todos los demás middlewares.
+app.add_middleware(MetricsMiddleware)
+
 # Incluimos los routers
 app.include_router(sales.router, prefix="/api/ingest/sales", tags=["sales"])
 app.include_router(products.router, prefix="/api/ingest/products", tags=["products"])
@@ -48,4 +64,9 @@ app.include_router(results.router, prefix="/api/forecast", tags=["forecast"])
 @app.get("/")
 def read_root():
     """Endpoint de bienvenida para la API."""
-    return {"message": "Welcome to GrapeIQ API"}
\ No newline at end of file
+    return {"message": "Welcome to GrapeIQ API"}
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    """Métricas del proceso en el formato de texto de Prometheus."""
+    return PlainTextResponse(metrics.render(), media_type=CONTENT_TYPE)
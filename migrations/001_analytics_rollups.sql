@@ -0,0 +1,38 @@
+-- migrations/001_analytics_rollups.sql
+--
+-- Tablas de agregados para los KPIs del dashboard. Las mantienen los servicios
+-- de ingesta (`app/services/rollups.py`) dentro de la misma transacción que el
+-- UPSERT de `sales` e `inventory`, así que siempre son consistentes con ellas.
+
+CREATE TABLE IF NOT EXISTS sales_daily_rollup (
+    tenant_id uuid NOT NULL,
+    date date NOT NULL,
+    sku text NOT NULL,
+    channel text NOT NULL DEFAULT '',
+    qty bigint NOT NULL DEFAULT 0,
+    revenue numeric NOT NULL DEFAULT 0,
+    row_count integer NOT NULL DEFAULT 0,
+    PRIMARY KEY (tenant_id, date, sku, channel)
+);
+
+CREATE TABLE IF NOT EXISTS inventory_sku_rollup (
+    tenant_id uuid NOT NULL,
+    sku text NOT NULL,
+    location text NOT NULL,
+    qty bigint NOT NULL DEFAULT 0,
+    snapshots integer NOT NULL DEFAULT 0,
+    PRIMARY KEY (tenant_id, sku, location)
+);
+
+-- Carga inicial a partir de los datos existentes.
+INSERT INTO sales_daily_rollup (tenant_id, date, sku, channel, qty, revenue, row_count)
+SELECT tenant_id, date, sku, COALESCE(channel, ''), SUM(qty), SUM(qty * price), COUNT(*)
+FROM sales
+GROUP BY tenant_id, date, sku, COALESCE(channel, '')
+ON CONFLICT DO NOTHING;
+
+INSERT INTO inventory_sku_rollup (tenant_id, sku, location, qty, snapshots)
+SELECT tenant_id, sku, location, SUM(qty), COUNT(*)
+FROM inventory
+GROUP BY tenant_id, sku, location
+ON CONFLICT DO NOTHING;
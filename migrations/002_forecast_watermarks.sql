@@ -0,0 +1,18 @@
+-- migrations/002_forecast_watermarks.sql
+--
+-- Marcas de agua por SKU del job de pronóstico (`app/jobs/forecast/watermarks.py`).
+-- Guardan el estado de las ventas de cada SKU en el último ajuste, para que
+-- el job solo vuelva a entrenar los SKUs cuyas ventas han cambiado.
+
+CREATE TABLE IF NOT EXISTS forecast_watermarks (
+    tenant_id uuid NOT NULL,
+    sku text NOT NULL,
+    first_date date NOT NULL,
+    last_date date NOT NULL,
+    row_count integer NOT NULL,
+    checksum text NOT NULL,
+    mode text NOT NULL,
+    forecast_horizon integer NOT NULL,
+    updated_at timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (tenant_id, sku)
+);
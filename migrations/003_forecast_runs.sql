@@ -0,0 +1,88 @@
+-- migrations/003_forecast_runs.sql
+--
+-- Ejecuciones versionadas del job de pronóstico (`app/jobs/forecast/writer.py`).
+-- Cada ejecución escribe sus filas en `forecasts` con un `run_id` nuevo y, en
+-- la misma transacción, mueve el puntero `forecast_current_run` del tenant.
+-- Los lectores filtran por el `run_id` vigente, así que nunca ven una
+-- ejecución a medias; las filas de ejecuciones anteriores se purgan después.
+
+CREATE TABLE IF NOT EXISTS forecast_runs (
+    run_id bigserial PRIMARY KEY,
+    tenant_id uuid NOT NULL,
+    mode text NOT NULL,
+    forecast_horizon integer NOT NULL,
+    skus_refit integer NOT NULL DEFAULT 0,
+    rows_written integer NOT NULL DEFAULT 0,
+    created_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS forecast_runs_tenant_idx ON forecast_runs (tenant_id, run_id DESC);
+
+CREATE TABLE IF NOT EXISTS forecast_current_run (
+    tenant_id uuid PRIMARY KEY,
+    run_id bigint NOT NULL REFERENCES forecast_runs (run_id),
+    updated_at timestamptz NOT NULL DEFAULT now()
+);
+
+ALTER TABLE forecasts ADD COLUMN IF NOT EXISTS run_id bigint;
+
+-- Los pronósticos existentes pasan a una ejecución "legacy" por tenant.
+INSERT INTO forecast_runs (tenant_id, mode, forecast_horizon, rows_written)
+SELECT tenant_id, 'legacy', 0, COUNT(*)
+FROM forecasts
+WHERE run_id IS NULL
+  AND tenant_id NOT IN (SELECT tenant_id FROM forecast_current_run)
+GROUP BY tenant_id;
+
+INSERT INTO forecast_current_run (tenant_id, run_id)
+SELECT tenant_id, MAX(run_id)
+FROM forecast_runs
+WHERE mode = 'legacy'
+GROUP BY tenant_id
+ON CONFLICT (tenant_id) DO NOTHING;
+
+UPDATE forecasts f
+SET run_id = c.run_id
+FROM forecast_current_run c
+WHERE f.tenant_id = c.tenant_id
+  AND f.run_id IS NULL;
+
+-- Varias ejecuciones conviven en `forecasts` hasta que se purgan, así que una
+-- clave única o primaria sobre (tenant_id, sku, date) sin `run_id` haría fallar
+-- la escritura de la segunda. Se eliminan las restricciones y los índices
+-- únicos de la tabla que no incluyen `run_id` y la unicidad pasa a ser por
+-- ejecución.
+DO $$
+DECLARE
+    run_attnum smallint;
+    legacy record;
+BEGIN
+    SELECT attnum INTO run_attnum
+    FROM pg_attribute
+    WHERE attrelid = 'forecasts'::regclass AND attname = 'run_id';
+
+    FOR legacy IN
+        SELECT conname
+        FROM pg_constraint
+        WHERE conrelid = 'forecasts'::regclass
+          AND contype IN ('p', 'u')
+          AND NOT (run_attnum = ANY (conkey))
+    LOOP
+        EXECUTE format('ALTER TABLE forecasts DROP CONSTRAINT %I', legacy.conname);
+    END LOOP;
+
+    FOR legacy IN
+        SELECT i.indexrelid::regclass AS index_name
+        FROM pg_index i
+        WHERE i.indrelid = 'forecasts'::regclass
+          AND i.indisunique
+          AND NOT (run_attnum = ANY (i.indkey::smallint[]))
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)
+    LOOP
+        EXECUTE format('DROP INDEX %s', legacy.index_name);
+    END LOOP;
+END $$;
+
+-- Sustituye al índice no único que creaba una versión anterior de esta migración.
+DROP INDEX IF EXISTS forecasts_tenant_run_idx;
+CREATE UNIQUE INDEX IF NOT EXISTS forecasts_tenant_run_key ON forecasts (tenant_id, run_id, date, sku);
@@ -0,0 +1,32 @@
+-- migrations/004_forecast_jobs.sql
+--
+-- Cola persistente del job de pronóstico (`app/jobs/forecast/queue.py`).
+-- La API encola una fila por petición y los procesos de
+-- `python -m app.jobs.forecast.worker` las reclaman con `FOR UPDATE SKIP LOCKED`.
+
+CREATE TABLE IF NOT EXISTS forecast_jobs (
+    job_id bigserial PRIMARY KEY,
+    tenant_id uuid NOT NULL,
+    mode text NOT NULL,
+    forecast_horizon integer NOT NULL,
+    full_refresh boolean NOT NULL DEFAULT false,
+    status text NOT NULL DEFAULT 'queued'
+        CHECK (status IN ('queued', 'running', 'succeeded', 'failed')),
+    attempts integer NOT NULL DEFAULT 0,
+    max_attempts integer NOT NULL DEFAULT 3,
+    worker text,
+    error text,
+    enqueued_at timestamptz NOT NULL DEFAULT now(),
+    started_at timestamptz,
+    heartbeat_at timestamptz,
+    finished_at timestamptz
+);
+
+-- Deduplicación: como mucho un job en cola por tenant, modo y horizonte.
+CREATE UNIQUE INDEX IF NOT EXISTS forecast_jobs_queued_uniq
+    ON forecast_jobs (tenant_id, mode, forecast_horizon)
+    WHERE status = 'queued';
+
+-- Reclamación por orden de llegada y recuento de jobs en curso por tenant.
+CREATE INDEX IF NOT EXISTS forecast_jobs_queued_idx ON forecast_jobs (job_id) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS forecast_jobs_running_idx ON forecast_jobs (tenant_id) WHERE status = 'running';
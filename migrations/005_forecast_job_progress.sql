@@ -0,0 +1,8 @@
+-- migrations/005_forecast_job_progress.sql
+--
+-- Instrumentación de los jobs de pronóstico (`app/jobs/forecast/progress.py`):
+-- `progress` se actualiza mientras el job se ejecuta y `summary` guarda el
+-- resumen final (tiempos por etapa, contadores y percentiles de entrenamiento).
+
+ALTER TABLE forecast_jobs ADD COLUMN IF NOT EXISTS progress jsonb;
+ALTER TABLE forecast_jobs ADD COLUMN IF NOT EXISTS summary jsonb;
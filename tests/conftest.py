@@ -0,0 +1,124 @@
+# tests/conftest.py
+#
+# Utilidades compartidas por los tests de los endpoints asíncronos.
+# Se simula la conexión de psycopg 3 para no depender de una base de datos real.
+
+import os
+import sys
+# Añade el directorio raíz del proyecto al sys.path para que los módulos puedan ser encontrados.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from contextlib import asynccontextmanager
+from app.async_database import get_async_db_connection
+from app.services.auth import create_access_token
+from app.services.cache import analytics_cache
+
+TEST_TENANT_ID = "a1b2c3d4-e5f6-7890-1234-567890abcdef"
+
+
+class FakeAsyncCursor:
+    """Cursor asíncrono simulado que devuelve filas predefinidas."""
+
+    def __init__(self, results):
+        self._results = list(results)
+        self._rows = []
+        self.executed = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, query, params=None):
+        self.executed.append((query, params))
+        self._rows = self._results.pop(0) if self._results else []
+
+    async def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    async def fetchall(self):
+        return list(self._rows)
+
+    async def fetchmany(self, size=0):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for row in self._rows:
+            yield row
+
+
+class FakeAsyncConnection:
+    """
+    Conexión asíncrona simulada. `results` es una lista con las filas
+    que devolverá cada `execute`, en orden.
+    """
+
+    def __init__(self, results=None):
+        self.cursor_obj = FakeAsyncCursor(results or [])
+        self.cursor_names = []
+
+    def cursor(self, *args, **kwargs):
+        self.cursor_names.append(kwargs.get("name"))
+        return self.cursor_obj
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+    @property
+    def executed(self):
+        return self.cursor_obj.executed
+
+
+@pytest.fixture(autouse=True)
+def clear_analytics_cache():
+    """Vacía la caché analítica para que los tests no compartan resultados."""
+    analytics_cache.backend.clear()
+    yield
+    analytics_cache.backend.clear()
+
+
+@pytest.fixture
+def auth_headers():
+    """Cabeceras con un token válido para el tenant de prueba."""
+    token = create_access_token({"sub": "admin", "tenant_id": TEST_TENANT_ID})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def fake_connection_factory(conn):
+    """
+    Devuelve un sustituto de `async_db_connection` que presta siempre `conn`.
+    Útil para el código que abre su propia conexión (p. ej. las exportaciones).
+    """
+    @asynccontextmanager
+    async def factory():
+        yield conn
+
+    return factory
+
+
+@pytest.fixture
+def fake_async_db():
+    """
+    Sustituye la dependencia del pool asíncrono por una conexión simulada.
+    Devuelve una función que recibe las filas a devolver y la conexión creada.
+    """
+    from main import app
+
+    def install(results=None):
+        conn = FakeAsyncConnection(results)
+
+        async def override():
+            yield conn
+
+        app.dependency_overrides[get_async_db_connection] = override
+        return conn
+
+    yield install
+    app.dependency_overrides.pop(get_async_db_connection, None)
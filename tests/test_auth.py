@@ -0,0 +1,99 @@
+# tests/test_auth.py
+#
+# Tests de la verificación de tokens, su caché y la dependencia de
+# autorización por tenant.
+
+import os
+import sys
+# Añade el directorio raíz del proyecto al sys.path para que los módulos puedan ser encontrados.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+import pytest
+from fastapi import HTTPException
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from main import app
+from app.services import auth
+from app.services.auth import VerifiedTokenCache, create_access_token, token_cache, verify_token
+from conftest import TEST_TENANT_ID
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def clear_token_cache():
+    token_cache.clear()
+    yield
+    token_cache.clear()
+
+
+def test_verify_token_decodes_each_token_once():
+    """
+    Prueba que un token ya verificado se sirva desde la caché sin volver a
+    comprobar la firma.
+    """
+    token = create_access_token({"sub": "admin", "tenant_id": TEST_TENANT_ID})
+
+    with patch.object(auth.jwt, "decode", wraps=auth.jwt.decode) as mock_decode:
+        for _ in range(3):
+            assert verify_token(token)["tenant_id"] == TEST_TENANT_ID
+    assert mock_decode.call_count == 1
+    assert token_cache.stats()["hits"] == 2
+
+
+def test_token_cache_honours_exp_and_size():
+    """
+    Prueba que las entradas caduquen en el `exp` del token y que la caché
+    descarte la menos usada al llenarse.
+    """
+    now = [1000.0]
+    cache = VerifiedTokenCache(max_entries=2, ttl=300, clock=lambda: now[0])
+
+    cache.set("a", {"tenant_id": "t", "exp": 1010})
+    cache.set("b", {"tenant_id": "t"})
+    assert cache.get("a") is not None
+    now[0] = 1010.0
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
+
+    cache.set("c", {})
+    cache.set("d", {})
+    assert cache.get("b") is None
+    assert cache.stats()["entries"] == 2
+
+
+def test_cached_token_is_verified_again_after_exp():
+    """
+    Prueba que, pasado el `exp` del token, la caché deje de servirlo y la
+    firma (y la caducidad) se vuelvan a comprobar.
+    """
+    exp = int(time.time()) + 60
+    token = create_access_token({"sub": "admin", "tenant_id": TEST_TENANT_ID, "exp": exp})
+    verify_token(token)
+
+    with patch.object(token_cache, "_clock", return_value=exp + 1), \
+         patch.object(auth.jwt, "decode", side_effect=auth.JWTError("Signature has expired.")):
+        with pytest.raises(HTTPException) as excinfo:
+            verify_token(token)
+    assert excinfo.value.status_code == 401
+    assert token_cache.stats()["entries"] == 0
+
+
+def test_authorize_tenant_rejects_other_tenants():
+    """
+    Prueba que la dependencia compartida devuelva 401 sin token válido y 403
+    si el token es de otro tenant.
+    """
+    response = client.get(
+        f"/api/data/analytics/total_sales/{TEST_TENANT_ID}",
+        headers={"Authorization": "Bearer no-es-un-jwt"},
+    )
+    assert response.status_code == 401
+
+    token = create_access_token({"sub": "otro", "tenant_id": "00000000-0000-0000-0000-000000000000"})
+    response = client.get(
+        f"/api/data/analytics/total_sales/{TEST_TENANT_ID}",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 403
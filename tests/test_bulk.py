@@ -0,0 +1,40 @@
+# tests/test_bulk.py
+#
+# Tests para las utilidades de ingesta masiva con `COPY`.
+
+import os
+import sys
+# Añade el directorio raíz del proyecto al sys.path para que los módulos puedan ser encontrados.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.bulk import CopyRowStream
+
+def test_copy_row_stream_escapes_special_values():
+    """
+    Prueba que los valores nulos y los caracteres especiales se serialicen
+    correctamente en el formato de texto de `COPY`.
+    """
+    stream = CopyRowStream([("VINO-001", None, "línea\ncon\ttab", "a\\b")])
+
+    assert stream.read() == "VINO-001\t\\N\tlínea\\ncon\\ttab\ta\\\\b\n"
+    assert stream.rows_written == 1
+
+def test_copy_row_stream_reads_in_chunks():
+    """
+    Prueba que el stream entregue los datos por bloques sin perder filas.
+    """
+    rows = [(i, f"SKU-{i}") for i in range(1000)]
+    stream = CopyRowStream(rows)
+
+    chunks = []
+    while True:
+        chunk = stream.read(64)
+        if not chunk:
+            break
+        assert len(chunk) <= 64
+        chunks.append(chunk)
+
+    lines = "".join(chunks).splitlines()
+    assert len(lines) == 1000
+    assert lines[-1] == "999\tSKU-999"
+    assert stream.rows_written == 1000
@@ -0,0 +1,115 @@
+# tests/test_cache.py
+#
+# Tests para la caché de resultados analíticos.
+
+import os
+import sys
+# Añade el directorio raíz del proyecto al sys.path para que los módulos puedan ser encontrados.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import asyncio
+from unittest.mock import patch, Mock
+from fastapi.testclient import TestClient
+from main import app
+from app.services.cache import AnalyticsCache, InMemoryLRUCache
+from conftest import TEST_TENANT_ID
+
+client = TestClient(app)
+
+def _compute(value, calls):
+    async def compute():
+        calls.append(value)
+        return value
+    return compute
+
+def test_lru_cache_expires_entries_after_ttl():
+    """
+    Prueba que las entradas caduquen al superar su TTL.
+    """
+    now = [0.0]
+    cache = InMemoryLRUCache(clock=lambda: now[0])
+    cache.set(("t1", "total_sales", ()), 10.0, ttl=5)
+
+    assert cache.get(("t1", "total_sales", ())) == (True, 10.0)
+    now[0] = 6.0
+    assert cache.get(("t1", "total_sales", ())) == (False, None)
+
+def test_lru_cache_evicts_least_recently_used():
+    """
+    Prueba que, al superar el número máximo de entradas, se expulse la menos usada.
+    """
+    cache = InMemoryLRUCache(max_entries=2)
+    cache.set(("t1", "a", ()), 1, ttl=60)
+    cache.set(("t1", "b", ()), 2, ttl=60)
+    cache.get(("t1", "a", ()))
+    cache.set(("t1", "c", ()), 3, ttl=60)
+
+    assert cache.get(("t1", "b", ()))[0] is False
+    assert cache.get(("t1", "a", ()))[0] is True
+    assert cache.info()["evictions"] == 1
+
+def test_invalidation_only_touches_dependent_metrics():
+    """
+    Prueba que una ingesta de productos invalide solo las métricas que leen `products`
+    y solo para ese tenant.
+    """
+    cache = AnalyticsCache(InMemoryLRUCache(), ttl=60)
+    calls = []
+    for tenant in ("t1", "t2"):
+        for metric in ("total_sales", "total_inventory_value"):
+            asyncio.run(cache.get_or_compute(tenant, metric, (), _compute(metric, calls)))
+
+    cache.invalidate("t1", ["products"])
+
+    asyncio.run(cache.get_or_compute("t1", "total_sales", (), _compute("total_sales", calls)))
+    asyncio.run(cache.get_or_compute("t1", "total_inventory_value", (), _compute("total_inventory_value", calls)))
+    asyncio.run(cache.get_or_compute("t2", "total_inventory_value", (), _compute("total_inventory_value", calls)))
+
+    # 4 cálculos iniciales + 1 recálculo del valor de inventario de t1.
+    assert len(calls) == 5
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 5
+
+def test_value_computed_during_invalidation_is_not_cached():
+    """
+    Prueba que un cálculo que empezó antes de una ingesta no quede guardado.
+    """
+    cache = AnalyticsCache(InMemoryLRUCache(), ttl=60)
+
+    async def compute_with_concurrent_ingest():
+        cache.invalidate("t1", ["sales"])
+        return 1.0
+
+    asyncio.run(cache.get_or_compute("t1", "total_sales", (), compute_with_concurrent_ingest))
+
+    assert cache.backend.get(("t1", "total_sales", ()))[0] is False
+
+def test_sales_ingestion_invalidates_cached_total_sales(fake_async_db, auth_headers):
+    """
+    Prueba de extremo a extremo: la segunda lectura sale de la caché y una
+    ingesta de ventas del tenant la invalida.
+    """
+    conn = fake_async_db([[(100,)], [(150,)]])
+
+    assert client.get(f"/api/data/analytics/total_sales/{TEST_TENANT_ID}", headers=auth_headers).json() == {"total_sales": 100.0}
+    assert client.get(f"/api/data/analytics/total_sales/{TEST_TENANT_ID}", headers=auth_headers).json() == {"total_sales": 100.0}
+    assert len(conn.executed) == 1
+
+    with patch('app.services.sales.db_connection') as mock_db_connection:
+        mock_conn = Mock()
+        mock_db_connection.return_value.__enter__.return_value = mock_conn
+        mock_conn.cursor.return_value.mogrify.side_effect = lambda sql, params: (sql % params).encode('utf-8')
+        response = client.post("/api/ingest/sales/", json={
+            "tenant_id": TEST_TENANT_ID,
+            "data": [{"date": "2024-01-03", "sku": "VINO-001", "qty": 1, "price": 50.0, "channel": "online"}],
+        })
+        assert response.status_code == 201
+
+    assert client.get(f"/api/data/analytics/total_sales/{TEST_TENANT_ID}", headers=auth_headers).json() == {"total_sales": 150.0}
+    assert len(conn.executed) == 2
+
+    # Los contadores de la caché son de todo el proceso: se publican en
+    # `/metrics` y no en un endpoint al alcance de cualquier tenant.
+    assert client.get("/api/data/analytics/cache/stats", headers=auth_headers).status_code == 404
+    assert 'analytics_cache_lookups{metric="total_sales",result="hit"}' in client.get("/metrics").text
@@ -0,0 +1,247 @@
+# tests/test_data.py
+#
+# Tests para los endpoints de consulta y analítica de `/api/data`.
+# La conexión asíncrona se simula con el fixture `fake_async_db` de conftest.py.
+
+import base64
+import io
+import json
+import os
+import sys
+# Añade el directorio raíz del proyecto al sys.path para que los módulos puedan ser encontrados.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from datetime import date
+from decimal import Decimal
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from main import app
+from conftest import TEST_TENANT_ID, FakeAsyncConnection, fake_connection_factory
+
+client = TestClient(app)
+
+def test_get_sales_data(fake_async_db, auth_headers):
+    """
+    Prueba que el endpoint de ventas devuelva los registros del tenant.
+    """
+    conn = fake_async_db([[
+        (date(2024, 1, 1), "VINO-001", 10, Decimal("15.50"), "online", TEST_TENANT_ID),
+    ]])
+
+    response = client.get(f"/api/data/sales/{TEST_TENANT_ID}", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.json()["data"] == [{
+        "date": "2024-01-01", "sku": "VINO-001", "qty": 10,
+        "price": 15.5, "channel": "online", "tenant_id": TEST_TENANT_ID,
+    }]
+    assert response.json()["next_cursor"] is None
+    assert conn.executed[0][1][0] == TEST_TENANT_ID
+
+def test_get_sales_data_paginates_with_projection(fake_async_db, auth_headers):
+    """
+    Prueba la paginación por clave `(date, sku)`, los filtros y la proyección de columnas.
+    """
+    # Se piden 2 filas; la consulta devuelve 3 (una extra) porque hay más páginas.
+    conn = fake_async_db([[
+        ("VINO-001", 10, date(2024, 1, 1)),
+        ("VINO-002", 5, date(2024, 1, 1)),
+        ("VINO-001", 7, date(2024, 1, 2)),
+    ]])
+
+    response = client.get(
+        f"/api/data/sales/{TEST_TENANT_ID}?limit=2&fields=sku,qty&sku=VINO-001&sku=VINO-002&date_from=2024-01-01",
+        headers=auth_headers,
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["data"] == [{"sku": "VINO-001", "qty": 10}, {"sku": "VINO-002", "qty": 5}]
+    assert body["next_cursor"] is not None
+
+    query, params = conn.executed[0]
+    assert query.startswith("SELECT sku, qty, date FROM sales")
+    assert "ORDER BY date, sku" in query
+    assert params == [TEST_TENANT_ID, date(2024, 1, 1), ["VINO-001", "VINO-002"], 3]
+
+    # La siguiente página continúa después de la última clave devuelta.
+    conn = fake_async_db([[]])
+    response = client.get(
+        f"/api/data/sales/{TEST_TENANT_ID}?limit=2&fields=sku,qty&cursor={body['next_cursor']}",
+        headers=auth_headers,
+    )
+    query, params = conn.executed[0]
+    assert "(date, sku) > (%s, %s)" in query
+    assert params == [TEST_TENANT_ID, date(2024, 1, 1), "VINO-002", 3]
+
+@pytest.mark.parametrize("values", [[20240101, "VINO-001"], {"date": "2024-01-01"}, ["2024-13-01", "VINO-001"]])
+def test_get_sales_data_rejects_tampered_cursors(fake_async_db, auth_headers, values):
+    """
+    Prueba que un cursor manipulado (fecha que no es cadena, objeto en vez de
+    lista, fecha imposible) devuelva un 400 y no un 500.
+    """
+    fake_async_db()
+    cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    response = client.get(f"/api/data/sales/{TEST_TENANT_ID}?cursor={cursor}", headers=auth_headers)
+
+    assert response.status_code == 400
+
+def test_get_sales_data_rejects_unknown_fields(fake_async_db, auth_headers):
+    """
+    Prueba que una proyección con columnas desconocidas devuelva un 400.
+    """
+    fake_async_db()
+
+    response = client.get(f"/api/data/sales/{TEST_TENANT_ID}?fields=sku,password", headers=auth_headers)
+
+    assert response.status_code == 400
+
+def test_export_sales_streams_ndjson_with_server_cursor(auth_headers):
+    """
+    Prueba que la exportación use un cursor de servidor y emita una línea NDJSON por fila.
+    """
+    conn = FakeAsyncConnection([[
+        (date(2024, 1, 1), "VINO-001", 10),
+        (date(2024, 1, 2), "VINO-002", 5),
+        (date(2024, 1, 3), "VINO-003", 1),
+    ]])
+
+    with patch('app.services.raw_data.async_db_connection', fake_connection_factory(conn)):
+        response = client.get(
+            f"/api/data/sales/{TEST_TENANT_ID}/export?fields=date,sku,qty&itersize=100",
+            headers=auth_headers,
+        )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert response.text.splitlines() == [
+        '{"date": "2024-01-01", "sku": "VINO-001", "qty": 10}',
+        '{"date": "2024-01-02", "sku": "VINO-002", "qty": 5}',
+        '{"date": "2024-01-03", "sku": "VINO-003", "qty": 1}',
+    ]
+    assert conn.cursor_names == ["export_sales"]
+    assert conn.cursor_obj.itersize == 100
+
+def test_export_inventory_as_csv(auth_headers):
+    """
+    Prueba que la exportación CSV incluya la cabecera con las columnas proyectadas.
+    """
+    conn = FakeAsyncConnection([[("VINO-001", 100, "almacen_a")]])
+
+    with patch('app.services.raw_data.async_db_connection', fake_connection_factory(conn)):
+        response = client.get(
+            f"/api/data/inventory/{TEST_TENANT_ID}/export?format=csv&fields=sku,qty,location",
+            headers=auth_headers,
+        )
+
+    assert response.status_code == 200
+    assert response.text == "sku,qty,location\nVINO-001,100,almacen_a\n"
+
+def test_export_sales_as_arrow_stream(auth_headers):
+    """
+    Prueba que la exportación Arrow se construya por bloques de columnas y
+    se pueda leer directamente con pyarrow.
+    """
+    pa = pytest.importorskip("pyarrow")
+    conn = FakeAsyncConnection([[
+        (date(2024, 1, d), f"VINO-00{d}", d, Decimal("10.50"), "online", TEST_TENANT_ID)
+        for d in range(1, 6)
+    ]])
+
+    with patch('app.services.raw_data.async_db_connection', fake_connection_factory(conn)):
+        response = client.get(
+            f"/api/data/sales/{TEST_TENANT_ID}/export?format=arrow&itersize=100",
+            headers=auth_headers,
+        )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    table = pa.ipc.open_stream(io.BytesIO(response.content)).read_all()
+    assert table.column_names == ["date", "sku", "qty", "price", "channel", "tenant_id"]
+    assert table.num_rows == 5
+    assert table.column("qty").to_pylist() == [1, 2, 3, 4, 5]
+    assert table.column("price").to_pylist() == [10.5] * 5
+
+def test_get_sales_data_forbidden_for_other_tenant(fake_async_db, auth_headers):
+    """
+    Prueba que un token no pueda leer los datos de otro tenant.
+    """
+    fake_async_db()
+
+    response = client.get("/api/data/sales/00000000-0000-0000-0000-000000000000", headers=auth_headers)
+
+    assert response.status_code == 403
+
+def test_get_total_sales(fake_async_db, auth_headers):
+    """
+    Prueba que el endpoint de ventas totales use la analítica asíncrona.
+    """
+    fake_async_db([[(Decimal("155.00"),)]])
+
+    response = client.get(f"/api/data/analytics/total_sales/{TEST_TENANT_ID}", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.json() == {"total_sales": 155.0}
+
+def test_sales_by_channel_and_location_are_pre_aggregated(fake_async_db, auth_headers):
+    """
+    Prueba que las ventas por canal usen la columna `channel` y que las ventas
+    por ubicación agreguen cada lado antes del JOIN (sin multiplicar por las
+    fotos de inventario).
+    """
+    conn = fake_async_db([
+        [("online", Decimal("100.00")), ("tienda", Decimal("55.00"))],
+        [("almacen_a", Decimal("93.00")), ("almacen_b", Decimal("62.00"))],
+    ])
+
+    by_channel = client.get(f"/api/data/analytics/sales_by_channel/{TEST_TENANT_ID}", headers=auth_headers)
+    by_location = client.get(f"/api/data/analytics/sales_by_location/{TEST_TENANT_ID}", headers=auth_headers)
+
+    assert by_channel.json() == {"sales_by_channel": {"online": 100.0, "tienda": 55.0}}
+    assert by_location.json() == {"sales_by_location": {"almacen_a": 93.0, "almacen_b": 62.0}}
+
+    channel_sql, location_sql = (query for query, _ in conn.executed)
+    assert "inventory" not in channel_sql
+    assert "JOIN inventory " not in location_sql
+    assert "FROM inventory_sku_rollup" in location_sql
+
+def test_sales_by_sku_reads_the_rollup(fake_async_db, auth_headers):
+    """
+    Prueba que las ventas por SKU del gráfico se agreguen en el servidor sobre
+    el rollup, y no sobre una página de ventas.
+    """
+    conn = fake_async_db([[("VINO-001", Decimal("155.00")), ("VINO-002", None)]])
+
+    response = client.get(f"/api/data/analytics/sales_by_sku/{TEST_TENANT_ID}", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.json() == {"sales_by_sku": {"VINO-001": 155.0, "VINO-002": 0.0}}
+    (sku_sql, _), = conn.executed
+    assert "FROM sales_daily_rollup" in sku_sql
+    assert "GROUP BY sku" in sku_sql
+
+def test_get_dashboard_summary(fake_async_db, auth_headers):
+    """
+    Prueba que el resumen del dashboard devuelva todos los KPIs en una sola consulta.
+    """
+    conn = fake_async_db([[
+        (
+            Decimal("155.00"), 150, Decimal("1800.00"),
+            {"online": 100.0, "tienda": 55},
+            {"almacen_a": 93.0, "almacen_b": 62},
+        ),
+    ]])
+
+    response = client.get(f"/api/data/analytics/summary/{TEST_TENANT_ID}", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "total_sales": 155.0,
+        "total_inventory": 150,
+        "total_inventory_value": 1800.0,
+        "sales_by_channel": {"online": 100.0, "tienda": 55.0},
+        "sales_by_location": {"almacen_a": 93.0, "almacen_b": 62.0},
+    }
+    assert len(conn.executed) == 1
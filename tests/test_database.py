@@ -0,0 +1,73 @@
+# tests/test_database.py
+#
+# Tests para el pool de conexiones compartido.
+# Mockeamos `ThreadedConnectionPool` para no depender de una base de datos real.
+
+import os
+import sys
+# Añade el directorio raíz del proyecto al sys.path para que los módulos puedan ser encontrados.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+import psycopg2
+from unittest.mock import patch, MagicMock
+from psycopg2 import extensions
+from app.database import ConnectionPool, PoolTimeoutError
+
+def _mock_connection():
+    conn = MagicMock()
+    conn.closed = 0
+    conn.get_transaction_status.return_value = extensions.TRANSACTION_STATUS_IDLE
+    return conn
+
+def test_pool_times_out_when_exhausted():
+    """
+    Prueba que, con el pool agotado, `getconn` espere como mucho `timeout`
+    segundos y lance `PoolTimeoutError`.
+    """
+    with patch('app.database.psycopg2.pool.ThreadedConnectionPool') as mock_pool_cls:
+        mock_pool_cls.return_value.getconn.side_effect = lambda: _mock_connection()
+        db = ConnectionPool("postgresql://test", minconn=1, maxconn=1, timeout=0.05)
+
+        conn = db.getconn()
+        with pytest.raises(PoolTimeoutError):
+            db.getconn()
+
+        db.putconn(conn)
+        assert db.getconn() is not None
+        assert db.in_use == 1
+
+def test_pool_replaces_broken_connection_on_checkout():
+    """
+    Prueba que una conexión que falla el health check se descarte
+    y se entregue una nueva.
+    """
+    broken = _mock_connection()
+    broken.cursor.return_value.__enter__.side_effect = psycopg2.OperationalError("server closed the connection")
+    healthy = _mock_connection()
+
+    with patch('app.database.psycopg2.pool.ThreadedConnectionPool') as mock_pool_cls:
+        mock_pool = mock_pool_cls.return_value
+        mock_pool.getconn.side_effect = [broken, healthy]
+        db = ConnectionPool("postgresql://test", minconn=1, maxconn=2, timeout=0.05)
+
+        assert db.getconn() is healthy
+        mock_pool.putconn.assert_called_once_with(broken, close=True)
+
+def test_putconn_rolls_back_open_transaction():
+    """
+    Prueba que una conexión devuelta con una transacción abierta se limpie
+    antes de volver al pool.
+    """
+    conn = _mock_connection()
+    conn.get_transaction_status.return_value = extensions.TRANSACTION_STATUS_INTRANS
+
+    with patch('app.database.psycopg2.pool.ThreadedConnectionPool') as mock_pool_cls:
+        mock_pool_cls.return_value.getconn.return_value = conn
+        db = ConnectionPool("postgresql://test", minconn=1, maxconn=1, healthcheck_interval=60)
+
+        db.putconn(db.getconn())
+
+        conn.rollback.assert_called()
+        mock_pool_cls.return_value.putconn.assert_called_once_with(conn)
+        assert db.in_use == 0
@@ -0,0 +1,492 @@
+# tests/test_forecast_job.py
+#
+# Tests del job de pronóstico. Se usan series sintéticas en memoria y se
+# mockea la conexión a la base de datos.
+
+import os
+import sys
+# Añade el directorio raíz del proyecto al sys.path para que los módulos puedan ser encontrados.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from datetime import date
+from functools import partial
+from unittest.mock import MagicMock, patch
+
+from app.jobs.forecast import features, global_model, job, loader
+from app.jobs.forecast.loader import SalesHistory, build_history, load_sales_history
+from app.jobs.forecast.progress import ForecastRunStats, ProgressReporter
+from app.jobs.forecast.registry import ModelRegistry
+from app.jobs.forecast.watermarks import SkuWatermark, StoredWatermark, changed_skus
+from tests.conftest import TEST_TENANT_ID
+
+
+@pytest.fixture(autouse=True)
+def model_registry_dir(tmp_path, monkeypatch):
+    """Los modelos que guarda el job van a un directorio temporal."""
+    monkeypatch.setattr(job, "ModelRegistry", partial(ModelRegistry, str(tmp_path)))
+    return tmp_path
+
+
+def make_sales_df(n_skus: int = 5, n_days: int = 80) -> pd.DataFrame:
+    """DataFrame pivotado (fechas × SKUs) como el que devuelve `get_sales_data`."""
+    rng = np.random.default_rng(42)
+    index = pd.date_range("2024-01-01", periods=n_days, freq="D", name="date")
+    data = {
+        f"VINO-{i:03d}": rng.poisson(5 + i, size=n_days).astype(float)
+        for i in range(n_skus)
+    }
+    return pd.DataFrame(data, index=index)
+
+
+def test_build_history_from_sorted_batches():
+    """
+    Prueba que el cargador construya el histórico compacto a partir de bloques
+    ordenados por (sku, fecha), con el calendario completo entre la primera y
+    la última fecha.
+    """
+    batches = [
+        [("VINO-001", date(2024, 1, 1), 3), ("VINO-001", date(2024, 1, 3), 5)],
+        [("VINO-002", date(2024, 1, 2), 7)],
+    ]
+
+    history = build_history(batches)
+
+    assert list(history.skus) == ["VINO-001", "VINO-002"]
+    assert history.qty.dtype == np.int32 and history.days.dtype == np.int32
+    assert history.n_days == 3
+    np.testing.assert_array_equal(history.dense_series(0), [3, 0, 5])
+    frame = history.to_frame()
+    assert list(frame.index) == list(pd.date_range("2024-01-01", periods=3))
+    np.testing.assert_array_equal(frame["VINO-002"], [0, 7, 0])
+
+
+def test_build_history_drops_rows_outside_the_calendar():
+    """
+    Prueba que las filas fuera de `start`/`end` (p. ej. ingeridas después de
+    leer las marcas de agua) se descarten en lugar de romper o desplazar la serie.
+    """
+    batches = [
+        [("VINO-001", date(2023, 12, 31), 9), ("VINO-001", date(2024, 1, 2), 3)],
+        [("VINO-001", date(2024, 1, 9), 4), ("VINO-002", date(2024, 1, 9), 6)],
+    ]
+
+    history = build_history(batches, start=date(2024, 1, 1), end=date(2024, 1, 5))
+
+    assert list(history.skus) == ["VINO-001"]
+    assert history.n_days == 5
+    np.testing.assert_array_equal(history.dense_series(0), [0, 3, 0, 0, 0])
+    assert history.to_frame()["VINO-001"].sum() == 3
+
+
+def test_load_sales_history_filters_skus_and_dates_in_sql():
+    """
+    Prueba que la consulta del cargador se limite a los SKUs y a las fechas pedidas.
+    """
+    mock_conn = MagicMock()
+    mock_cursor = mock_conn.cursor.return_value.__enter__.return_value
+    mock_cursor.fetchmany.side_effect = [[("VINO-001", date(2024, 1, 2), 3)], []]
+    with patch.object(loader, "db_connection") as mock_db_connection:
+        mock_db_connection.return_value.__enter__.return_value = mock_conn
+        history = load_sales_history(TEST_TENANT_ID, ["VINO-001"], date(2024, 1, 1), date(2024, 1, 5))
+
+    sql, params = mock_cursor.execute.call_args[0]
+    assert "sku = ANY(%s)" in sql and "date >= %s" in sql and "date <= %s" in sql
+    assert params == [TEST_TENANT_ID, ["VINO-001"], date(2024, 1, 1), date(2024, 1, 5)]
+    assert history.n_days == 5
+
+
+def test_sales_history_round_trips_dense_frame():
+    """
+    Prueba que `from_frame` y `to_frame` conserven la matriz de ventas.
+    """
+    sales_df = make_sales_df(n_skus=3, n_days=20)
+
+    history = SalesHistory.from_frame(sales_df)
+
+    np.testing.assert_array_equal(history.to_frame().to_numpy(), sales_df.to_numpy())
+    assert history.n_rows == np.count_nonzero(sales_df.to_numpy())
+
+
+def test_iter_sku_chunks_sends_only_each_sku_series():
+    """
+    Prueba que cada bloque lleve únicamente los vectores de sus SKUs.
+    """
+    sales_df = make_sales_df(n_skus=5, n_days=10)
+
+    chunks = list(job.iter_sku_chunks(SalesHistory.from_frame(sales_df), 2))
+
+    assert [[sku for sku, _ in chunk] for chunk in chunks] == [
+        ["VINO-000", "VINO-001"], ["VINO-002", "VINO-003"], ["VINO-004"],
+    ]
+    sku, values = chunks[0][0]
+    assert isinstance(values, np.ndarray)
+    np.testing.assert_array_equal(values, sales_df["VINO-000"])
+
+
+def test_parallel_forecast_matches_serial_order_and_values():
+    """
+    Prueba que el pool de procesos produzca las mismas predicciones y en el
+    mismo orden que la ejecución en serie.
+    """
+    history = SalesHistory.from_frame(make_sales_df())
+
+    serial = job.forecast_all_skus(TEST_TENANT_ID, history, 7, workers=1, chunk_size=2)
+    parallel = job.forecast_all_skus(TEST_TENANT_ID, history, 7, workers=2, chunk_size=2)
+
+    assert len(serial) == 5 * 7
+    assert [(r["sku"], r["date"]) for r in parallel] == [(r["sku"], r["date"]) for r in serial]
+    np.testing.assert_allclose(
+        [r["predicted_qty"] for r in parallel],
+        [r["predicted_qty"] for r in serial],
+    )
+    assert {r["model_used"] for r in serial} == {"lightgbm"}
+
+
+def watermarks_for(sales_df: pd.DataFrame, checksum: str = "v1"):
+    """Marcas de agua de cada SKU del DataFrame (mismo checksum para todos)."""
+    first, last = sales_df.index[0].date(), sales_df.index[-1].date()
+    return {
+        sku: SkuWatermark(first, last, len(sales_df), checksum)
+        for sku in sales_df.columns
+    }
+
+
+def run_job_with(sales_df, stored, **kwargs):
+    """
+    Ejecuta el job con las ventas de `sales_df` y las marcas guardadas `stored`.
+    Devuelve la conexión y el cursor de escritura, el mock de
+    `load_sales_history` y el resumen de la ejecución.
+    """
+    mock_conn = MagicMock()
+    mock_cursor = mock_conn.cursor.return_value.__enter__.return_value
+    mock_cursor.fetchone.return_value = (41,)
+    mock_cursor.rowcount = 0
+
+    def load(tenant_id, skus=None, start=None, end=None):
+        selected = sales_df if skus is None else sales_df[list(skus)]
+        return SalesHistory.from_frame(selected)
+
+    with patch.object(job, "fetch_sales_watermarks", return_value=watermarks_for(sales_df)), \
+         patch.object(job, "fetch_stored_watermarks", return_value=stored), \
+         patch.object(job, "load_sales_history", side_effect=load) as mock_load, \
+         patch.object(job, "db_connection") as mock_db_connection:
+        mock_db_connection.return_value.__enter__.return_value = mock_conn
+        summary = job.run_forecast_job(TEST_TENANT_ID, forecast_horizon=7, workers=1, mode="per_sku", **kwargs)
+
+    return mock_conn, mock_cursor, mock_load, summary
+
+
+def copied_forecasts(mock_cursor):
+    """Filas enviadas con `COPY` a `forecasts`, como listas de campos de texto."""
+    sql, stream = mock_cursor.copy_expert.call_args[0]
+    assert sql.startswith("COPY forecasts")
+    return [line.split("\t") for line in stream.read().splitlines()]
+
+
+def executed_sql(mock_cursor, fragment):
+    """Llamadas a `execute` cuya sentencia contiene `fragment`."""
+    return [c[0] for c in mock_cursor.execute.call_args_list if fragment in c[0][0]]
+
+
+def test_run_forecast_job_writes_all_predictions():
+    """
+    Prueba que el job guarde las predicciones de todos los SKUs en la primera ejecución.
+    """
+    sales_df = make_sales_df(n_skus=3)
+
+    mock_conn, mock_cursor, mock_load, summary = run_job_with(sales_df, stored={})
+
+    # Solo se cargan los SKUs con marca de agua, dentro de su ventana de fechas.
+    assert mock_load.call_args.kwargs["skus"] == ["VINO-000", "VINO-001", "VINO-002"]
+    assert mock_load.call_args.kwargs["end"] == sales_df.index[-1].date()
+
+    rows = copied_forecasts(mock_cursor)
+    assert len(rows) == 3 * 7
+    assert [row[1] for row in rows[::7]] == ["VINO-000", "VINO-001", "VINO-002"]
+    assert {row[5] for row in rows} == {"41"}
+    mock_cursor.executemany.assert_called_once()
+    watermark_rows = mock_cursor.executemany.call_args[0][1]
+    assert [row[1] for row in watermark_rows] == ["VINO-000", "VINO-001", "VINO-002"]
+    # Publicación de la ejecución y, después, purga de las anteriores.
+    assert executed_sql(mock_cursor, "INSERT INTO forecast_current_run")[0][1][1] == 41
+    assert mock_conn.commit.call_count == 2
+    assert executed_sql(mock_cursor, "DELETE FROM forecasts")[0][1] == (TEST_TENANT_ID, 41)
+
+    # Resumen de la ejecución: etapas, contadores y tiempos de entrenamiento.
+    assert set(summary["stages"]) == {"watermarks", "load", "forecast", "write", "purge"}
+    assert summary["counters"]["skus_done"] == 3
+    assert summary["counters"]["rows_loaded"] == np.count_nonzero(sales_df.to_numpy())
+    assert summary["counters"]["predictions_written"] == 3 * 7
+    assert summary["counters"]["models_scratch"] == 3
+    assert set(summary["fit_seconds"]) == {"p50", "p95", "p99", "max"}
+    assert summary["run_id"] == 41
+
+
+def test_run_forecast_job_only_refits_changed_skus(model_registry_dir):
+    """
+    Prueba que solo se recalculen (y se sustituyan) los SKUs cuyas ventas
+    han cambiado, y que se borren los de SKUs que ya no tienen ventas,
+    también sus modelos guardados.
+    """
+    registry = ModelRegistry(str(model_registry_dir))
+    old_model_paths = [
+        *registry._paths(TEST_TENANT_ID, "VINO-OLD", features.FEATURE_VERSION),
+        *registry._paths(TEST_TENANT_ID, "VINO-OLD", "1"),
+    ]
+    for path in old_model_paths:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, "w").close()
+
+    sales_df = make_sales_df(n_skus=3)
+    stored = {
+        sku: StoredWatermark(watermark, "per_sku", 7)
+        for sku, watermark in watermarks_for(sales_df).items()
+    }
+    stored["VINO-001"] = StoredWatermark(watermarks_for(sales_df, "v0")["VINO-001"], "per_sku", 7)
+    stored["VINO-OLD"] = StoredWatermark(watermarks_for(sales_df)["VINO-000"], "per_sku", 7)
+
+    mock_conn, mock_cursor, mock_load, _ = run_job_with(sales_df, stored)
+
+    assert mock_load.call_args.kwargs["skus"] == ["VINO-001"]
+    # Las predicciones del resto de SKUs se copian de la ejecución anterior.
+    (carry_params,) = [params for _, params in executed_sql(mock_cursor, "INSERT INTO forecasts")]
+    assert carry_params == (41, TEST_TENANT_ID, 41, ["VINO-001", "VINO-OLD"])
+    rows = copied_forecasts(mock_cursor)
+    assert {row[1] for row in rows} == {"VINO-001"}
+    assert mock_conn.commit.call_count == 2
+    assert not any(os.path.exists(path) for path in old_model_paths)
+
+
+def test_run_forecast_job_skips_when_nothing_changed():
+    """
+    Prueba que el job no entrene ni escriba nada si ningún SKU ha cambiado,
+    salvo que se pida un recálculo completo.
+    """
+    sales_df = make_sales_df(n_skus=2)
+    stored = {
+        sku: StoredWatermark(watermark, "per_sku", 7)
+        for sku, watermark in watermarks_for(sales_df).items()
+    }
+
+    mock_conn, _, mock_load, summary = run_job_with(sales_df, stored)
+    mock_load.assert_not_called()
+    mock_conn.commit.assert_not_called()
+    assert summary["counters"]["skus_refit"] == 0
+    assert summary["run_id"] is None
+
+    mock_conn, mock_cursor, _, _ = run_job_with(sales_df, stored, full_refresh=True)
+    assert len(copied_forecasts(mock_cursor)) == 2 * 7
+    assert mock_conn.commit.call_count == 2
+
+
+def test_global_prediction_matrix_uses_known_lags():
+    """
+    Prueba que la matriz de predicción del modelo global use los valores
+    reales para los lags dentro del histórico y la última semana conocida
+    para los que caen en el futuro.
+    """
+    sales_df = pd.DataFrame(
+        {"A": np.arange(30, dtype=float), "B": np.arange(100, 130, dtype=float)},
+        index=pd.date_range("2024-01-01", periods=30, freq="D", name="date"),
+    )
+    categories = global_model.sku_categories(sales_df.columns, {"A": "tinto"})
+
+    future, X = global_model.build_prediction_matrix(sales_df, categories, 10)
+
+    assert future[0] == pd.Timestamp("2024-01-31")
+    assert len(X) == 10 * 2
+    a_rows = X[X["sku"] == "A"]
+    # Día +1: lag_7 -> índice 23 (real). Día +8: lag_7 caería en el futuro -> índice 23 de nuevo.
+    assert a_rows["lag_7"].tolist()[0] == 23.0
+    assert a_rows["lag_7"].tolist()[7] == 23.0
+    assert a_rows["lag_28"].tolist()[0] == 2.0
+    assert set(X["category"]) == {"tinto", global_model.UNKNOWN_CATEGORY}
+
+
+def test_global_mode_forecasts_every_sku_in_order():
+    """
+    Prueba que el modo global devuelva el horizonte completo de cada SKU,
+    ordenado por SKU y con fechas posteriores al histórico.
+    """
+    sales_df = make_sales_df()
+
+    results = global_model.forecast_global(TEST_TENANT_ID, sales_df, 7, {"VINO-000": "tinto"})
+
+    assert len(results) == 5 * 7
+    assert [r["sku"] for r in results[::7]] == list(sales_df.columns)
+    assert min(r["date"] for r in results) > sales_df.index[-1].date()
+    assert all(r["predicted_qty"] >= 0 for r in results)
+    assert {r["model_used"] for r in results} == {"lightgbm_global"}
+
+
+def test_compare_forecast_modes_reports_time_and_accuracy():
+    """
+    Prueba que la comparación devuelva tiempo y precisión de ambos modos.
+    """
+    report = job.compare_forecast_modes(make_sales_df(), forecast_horizon=7)
+
+    assert set(report) == {"per_sku", "global"}
+    for metrics in report.values():
+        assert metrics["seconds"] >= 0
+        assert metrics["mae"] >= 0
+        assert metrics["wape"] is not None
+
+
+def test_forecast_sku_holdout_does_not_leak_the_evaluated_days():
+    """
+    Prueba que, al evaluar, los lags futuros se rellenen con el último valor
+    de entrenamiento y no con el último día del periodo evaluado.
+    """
+    series = make_sales_df(n_skus=1, n_days=80)["VINO-000"]
+    series.iloc[-1] = 1000.0
+    booster = MagicMock()
+    booster.predict.side_effect = lambda X: np.zeros(len(X))
+
+    with patch.object(job, "fit_sku_model", return_value=(booster, "trained")):
+        job.forecast_sku("benchmark", "VINO-000", series, 7, holdout=True)
+        job.forecast_sku("benchmark", "VINO-000", series, 7)
+
+    holdout_X, production_X = (call[0][0] for call in booster.predict.call_args_list)
+    assert (holdout_X[features.LAG_FEATURES].to_numpy() == series.iloc[-8]).all()
+    assert (production_X[features.LAG_FEATURES].to_numpy() == 1000.0).all()
+
+
+def test_resolve_forecast_mode_per_tenant():
+    """
+    Prueba la prioridad del modo: petición > configuración del tenant > defecto.
+    """
+    with patch.dict(job.FORECAST_TENANT_MODES, {TEST_TENANT_ID: "global"}):
+        assert job.resolve_forecast_mode(TEST_TENANT_ID) == "global"
+        assert job.resolve_forecast_mode(TEST_TENANT_ID, "per_sku") == "per_sku"
+    assert job.resolve_forecast_mode("otro-tenant") == job.FORECAST_MODE
+
+
+def test_feature_arrays_match_pandas_reference():
+    """
+    Prueba que las características vectorizadas coincidan con el cálculo
+    equivalente columna a columna con pandas.
+    """
+    sales_df = make_sales_df(n_skus=4, n_days=60)
+    values = sales_df.to_numpy()
+
+    calendar, series = features.build_feature_arrays(values, sales_df.index)
+
+    np.testing.assert_array_equal(calendar["weekday"], sales_df.index.weekday)
+    for sku_position, sku in enumerate(sales_df.columns):
+        column = sales_df[sku]
+        np.testing.assert_allclose(series["lag_7"][:, sku_position], column.shift(7).fillna(0))
+        expected_mean = column.shift(1).rolling(7, min_periods=1).mean().fillna(0)
+        np.testing.assert_allclose(series["rolling_mean_7"][:, sku_position], expected_mean)
+
+
+def test_create_features_uses_only_the_target_column():
+    """
+    Prueba que los lags se calculen sobre la serie y no sobre la suma de
+    todas las columnas (incluidas las de calendario).
+    """
+    df = make_sales_df(n_skus=1, n_days=30).rename(columns={"VINO-000": "total_qty"})
+
+    result = job.create_features(df)
+
+    np.testing.assert_allclose(result["lag_7"].iloc[7:], df["total_qty"].iloc[:-7])
+    assert list(result.columns) == ["total_qty"] + features.FEATURES
+
+
+def test_changed_skus_detects_new_modified_and_reconfigured_skus():
+    """
+    Prueba qué SKUs se consideran cambiados respecto a las marcas guardadas.
+    """
+    current = watermarks_for(make_sales_df(n_skus=4))
+    stored = {
+        "VINO-000": StoredWatermark(current["VINO-000"], "per_sku", 14),
+        "VINO-001": StoredWatermark(current["VINO-001"]._replace(row_count=1), "per_sku", 14),
+        "VINO-002": StoredWatermark(current["VINO-002"], "global", 14),
+    }
+
+    assert changed_skus(current, stored, "per_sku", 14) == ["VINO-001", "VINO-002", "VINO-003"]
+    assert changed_skus(current, stored, "per_sku", 7) == sorted(current)
+
+
+def training_data(n_days: int = 120):
+    """Características y objetivo de un SKU, como los que usa `forecast_sku`."""
+    series = make_sales_df(n_skus=1, n_days=n_days)["VINO-000"]
+    X = job.create_features(series.to_frame(name="total_qty")).drop(columns="total_qty")
+    return X, series.to_numpy()
+
+
+def test_fit_sku_model_reuses_and_warm_starts_saved_models(model_registry_dir):
+    """
+    Prueba el ciclo del registro de modelos: se entrena y guarda, se reutiliza
+    si no hay datos nuevos, se sigue entrenando solo con las filas nuevas y se
+    descarta si el histórico ya entrenado cambia.
+    """
+    registry = ModelRegistry(str(model_registry_dir))
+    X, y = training_data()
+
+    booster, strategy = job.fit_sku_model(TEST_TENANT_ID, "VINO/000", X[:100], y[:100], registry=registry)
+    assert strategy == "scratch"
+    saved = registry.load(TEST_TENANT_ID, "VINO/000", features.FEATURE_VERSION)
+    assert saved is not None
+    assert saved[1].train_rows == 100
+    assert saved[1].trained_until == X.index[99].date()
+
+    _, strategy = job.fit_sku_model(TEST_TENANT_ID, "VINO/000", X[:100], y[:100], registry=registry)
+    assert strategy == "reused"
+
+    warm, strategy = job.fit_sku_model(TEST_TENANT_ID, "VINO/000", X, y, registry=registry)
+    assert strategy == "warm_start"
+    assert warm.num_trees() > booster.num_trees()
+    assert registry.load(TEST_TENANT_ID, "VINO/000", features.FEATURE_VERSION)[1].warm_starts == 1
+
+    corrected = y.copy()
+    corrected[10] += 5
+    _, strategy = job.fit_sku_model(TEST_TENANT_ID, "VINO/000", X, corrected, registry=registry)
+    assert strategy == "scratch"
+
+
+def test_fit_sku_model_without_reuse_always_trains():
+    """
+    Prueba que con la reutilización desactivada siempre se entrene desde cero.
+    """
+    X, y = training_data()
+
+    _, strategy = job.fit_sku_model(TEST_TENANT_ID, "VINO-000", X, y, registry=None)
+
+    assert strategy == "scratch"
+
+
+def test_progress_reporter_throttles_database_writes():
+    """
+    Prueba que el progreso se publique como mucho una vez por intervalo
+    (salvo que se fuerce) y que incluya el ritmo y la estimación restante.
+    """
+    stats = ForecastRunStats()
+    reporter = ProgressReporter(9, stats, interval=60)
+    reporter.skus_total = 4
+
+    mock_conn = MagicMock()
+    mock_cursor = mock_conn.cursor.return_value.__enter__.return_value
+    with patch("app.jobs.forecast.progress.db_connection") as mock_db_connection:
+        mock_db_connection.return_value.__enter__.return_value = mock_conn
+        with stats.stage("forecast"):
+            stats.record_sku({"features": 0.1, "fit": 0.5, "predict": 0.01, "strategy": "scratch"})
+            reporter.update()
+            reporter.update()
+            reporter.update(force=True, stage="done")
+
+    assert mock_cursor.execute.call_count == 2
+    progress = json.loads(mock_cursor.execute.call_args[0][1][0])
+    assert progress["stage"] == "done"
+    assert (progress["skus_done"], progress["skus_total"]) == (1, 4)
+    assert progress["skus_per_second"] > 0
+    assert progress["eta_seconds"] is not None
+
+    # El modelo global cuenta una vez sus tiempos y todos los SKUs que cubre.
+    stats.record_model({"fit": 2.0, "predict": 0.1, "strategy": "global"}, skus=3)
+    assert stats.counters["skus_done"] == 4
+    assert stats.counters["models_global"] == 1
+    assert stats.fit_seconds == [0.5, 2.0]
@@ -0,0 +1,169 @@
+# tests/test_forecast_queue.py
+#
+# Tests de la cola de pronósticos, de los workers y de los endpoints que
+# encolan jobs y consultan su estado. La base de datos se mockea.
+
+import os
+import sys
+# Añade el directorio raíz del proyecto al sys.path para que los módulos puedan ser encontrados.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import threading
+from unittest.mock import MagicMock, patch
+from fastapi.testclient import TestClient
+from main import app
+from app.jobs.forecast import queue, worker
+from app.jobs.forecast.queue import ForecastJob
+from conftest import TEST_TENANT_ID
+
+client = TestClient(app)
+
+SECRET = "super-secret-key-123"
+
+
+def mock_queue_db(fetchone_results):
+    """Parchea la conexión de la cola; `fetchone` devuelve `fetchone_results` en orden."""
+    mock_conn = MagicMock()
+    mock_cursor = mock_conn.cursor.return_value.__enter__.return_value
+    mock_cursor.fetchone.side_effect = fetchone_results
+    patcher = patch.object(queue, "db_connection")
+    mock_db_connection = patcher.start()
+    mock_db_connection.return_value.__enter__.return_value = mock_conn
+    return patcher, mock_conn, mock_cursor
+
+
+def test_run_forecast_enqueues_job():
+    """
+    Prueba que el endpoint encole el job en lugar de ejecutarlo en la API.
+    """
+    with patch("app.routers.forecast.enqueue_forecast_job", return_value=(7, True)) as mock_enqueue:
+        response = client.post(
+            f"/api/forecast/forecast/run?tenant_id={TEST_TENANT_ID}&secret={SECRET}&mode=global&full_refresh=true"
+        )
+
+    assert response.status_code == 202
+    assert response.json()["job_id"] == 7
+    assert response.json()["deduplicated"] is True
+    args = mock_enqueue.call_args[0]
+    assert (str(args[0]), args[1], args[2], args[3]) == (TEST_TENANT_ID, "global", 14, True)
+
+
+def test_get_forecast_job_status():
+    """
+    Prueba que el endpoint de estado devuelva el job del tenant o un 404.
+    """
+    job = {"job_id": 7, "tenant_id": TEST_TENANT_ID, "status": "running"}
+    with patch("app.routers.forecast.get_job", return_value=job):
+        response = client.get(f"/api/forecast/forecast/jobs/7?tenant_id={TEST_TENANT_ID}&secret={SECRET}")
+    assert response.status_code == 200
+    assert response.json()["status"] == "running"
+
+    with patch("app.routers.forecast.get_job", return_value=None):
+        response = client.get(f"/api/forecast/forecast/jobs/8?tenant_id={TEST_TENANT_ID}&secret={SECRET}")
+    assert response.status_code == 404
+
+
+def test_enqueue_deduplicates_queued_jobs():
+    """
+    Prueba que el encolado use un UPSERT sobre los jobs en cola.
+    """
+    patcher, mock_conn, mock_cursor = mock_queue_db([(3, True)])
+    try:
+        assert queue.enqueue_forecast_job(TEST_TENANT_ID, "per_sku", 14) == (3, True)
+    finally:
+        patcher.stop()
+
+    sql, params = mock_cursor.execute.call_args[0]
+    assert "ON CONFLICT (tenant_id, mode, forecast_horizon) WHERE status = 'queued'" in sql
+    assert params == (TEST_TENANT_ID, "per_sku", 14, False)
+    mock_conn.commit.assert_called_once()
+
+
+def test_claim_next_job_uses_skip_locked_and_tenant_limit():
+    """
+    Prueba que se reclame el primer job disponible y que no se supere el
+    límite de jobs en curso del tenant.
+    """
+    claimed = (5, TEST_TENANT_ID, "per_sku", 14, False, 1)
+    patcher, mock_conn, mock_cursor = mock_queue_db([(5, TEST_TENANT_ID), (0,), claimed])
+    try:
+        job = queue.claim_next_job("w1", tenant_limit=1)
+    finally:
+        patcher.stop()
+
+    assert job == ForecastJob(*claimed)
+    assert "FOR UPDATE SKIP LOCKED" in mock_cursor.execute.call_args_list[0][0][0]
+    assert mock_cursor.execute.call_args_list[-1][0][1] == ("w1", 5)
+    mock_conn.commit.assert_called_once()
+
+    # Otro worker ya tiene un job del tenant en curso.
+    patcher, mock_conn, mock_cursor = mock_queue_db([(6, TEST_TENANT_ID), (1,)])
+    try:
+        assert queue.claim_next_job("w2", tenant_limit=1) is None
+    finally:
+        patcher.stop()
+    mock_conn.commit.assert_not_called()
+
+
+def test_process_next_job_records_outcome():
+    """
+    Prueba que el worker marque el job como terminado o como fallido.
+    """
+    job = ForecastJob(5, TEST_TENANT_ID, "per_sku", 14, False, 1)
+
+    summary = {"total_seconds": 1.5}
+
+    with patch.object(worker, "claim_next_job", return_value=job), \
+         patch.object(worker, "run_forecast_job", return_value=summary) as mock_run, \
+         patch.object(worker, "finish_job") as mock_finish:
+        assert worker.process_next_job("w1", heartbeat_interval=60) is True
+    mock_run.assert_called_once_with(TEST_TENANT_ID, forecast_horizon=14, mode="per_sku", full_refresh=False, job_id=5)
+    mock_finish.assert_called_once_with(5, summary=summary)
+
+    with patch.object(worker, "claim_next_job", return_value=job), \
+         patch.object(worker, "run_forecast_job", side_effect=RuntimeError("sin conexión")), \
+         patch.object(worker, "finish_job") as mock_finish:
+        worker.process_next_job("w1", heartbeat_interval=60)
+    mock_finish.assert_called_once_with(5, error="sin conexión")
+
+    with patch.object(worker, "claim_next_job", return_value=None):
+        assert worker.process_next_job("w1") is False
+
+
+def test_requeue_stale_jobs_requeues_one_of_identical_jobs():
+    """
+    Prueba que, si dos jobs idénticos quedan huérfanos a la vez, solo uno
+    vuelva a la cola (el índice único de jobs en cola no admite dos) y el
+    otro se dé por fallido con su hora de fin.
+    """
+    patcher, mock_conn, mock_cursor = mock_queue_db([])
+    mock_cursor.fetchall.return_value = [(5, "queued"), (6, "failed")]
+    try:
+        assert queue.requeue_stale_jobs(stale_seconds=600) == 2
+    finally:
+        patcher.stop()
+
+    sql, params = mock_cursor.execute.call_args[0]
+    assert params == (600,)
+    assert "PARTITION BY j.tenant_id, j.mode, j.forecast_horizon" in sql
+    assert ") = 1 AS requeue" in sql
+    assert "finished_at = CASE WHEN s.requeue THEN NULL ELSE now() END" in sql
+    mock_conn.commit.assert_called_once()
+
+
+def test_worker_loop_claims_jobs_when_requeue_fails():
+    """
+    Prueba que un error al recuperar huérfanos no impida reclamar jobs.
+    """
+    stop = threading.Event()
+
+    def process(worker_name):
+        stop.set()
+        return True
+
+    with patch.object(worker, "init_db_pool"), patch.object(worker, "close_db_pool"), \
+         patch.object(worker, "requeue_stale_jobs", side_effect=RuntimeError("duplicate key")), \
+         patch.object(worker, "process_next_job", side_effect=process) as mock_process:
+        worker.worker_loop("w1", stop=stop, poll_interval=0)
+
+    mock_process.assert_called_once_with("w1")
@@ -22,10 +22,10 @@ def test_ingest_inventory_success():
     Prueba que el endpoint de ingesta de inventario funcione correctamente con datos válidos.
     El test mockea la conexión a la base de datos para evitar llamadas reales.
     """
-    with patch('app.services.inventory.get_db_connection') as mock_get_conn:
+    with patch('app.services.inventory.db_connection') as mock_db_connection:
         mock_conn = Mock()
         mock_cursor = Mock()
-        mock_get_conn.return_value = mock_conn
+        mock_db_connection.return_value.__enter__.return_value = mock_conn
         mock_conn.cursor.return_value = mock_cursor
         
         # Simula el comportamiento de mogrify, que se usa para escapar los valores.
@@ -47,11 +47,17 @@ def test_ingest_inventory_success():
         assert response.json() == {"message": "Inventory data ingested successfully."}
         
         # Verificamos que los métodos del mock se hayan llamado.
-        mock_get_conn.assert_called_once()
-        mock_cursor.execute.assert_called_once()
+        mock_db_connection.assert_called_once()
+        # Bloqueo del tenant, staging, INSERT ... VALUES, delta del rollup y fusión.
+        assert mock_cursor.execute.call_count == 5
+        statements = [call[0][0] for call in mock_cursor.execute.call_args_list]
+        assert "INSERT INTO inventory_sku_rollup" in statements[3]
+        assert "ON CONFLICT (tenant_id, date, sku, location)" in statements[4]
         mock_conn.commit.assert_called_once()
         mock_cursor.close.assert_called_once()
-        mock_conn.close.assert_called_once()
+        # La conexión se devuelve al pool en lugar de cerrarse.
+        mock_db_connection.return_value.__exit__.assert_called_once()
+        mock_conn.close.assert_not_called()
 
 def test_ingest_inventory_invalid_data():
     """
@@ -0,0 +1,123 @@
+# tests/test_metrics.py
+#
+# Tests de las métricas en proceso (`app/services/metrics.py`) y del endpoint
+# `/metrics`. La base de datos se mockea.
+
+import os
+import sys
+# Añade el directorio raíz del proyecto al sys.path para que los módulos puedan ser encontrados.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from unittest.mock import Mock, patch
+from fastapi.testclient import TestClient
+from main import app
+from app.jobs.forecast import worker
+from app.jobs.forecast.queue import ForecastJob
+from app.services import metrics as metrics_module
+from app.services.metrics import MetricsRegistry
+from conftest import TEST_TENANT_ID
+
+client = TestClient(app)
+
+
+def test_registry_renders_prometheus_text():
+    """
+    Prueba el formato de texto de contadores, gauges e histogramas.
+    """
+    registry = MetricsRegistry()
+    requests = registry.counter("demo_requests_total", "Peticiones.", ("route",))
+    in_flight = registry.gauge("demo_in_flight", "En curso.")
+    latency = registry.histogram("demo_seconds", "Latencia.", ("route",), buckets=(0.1, 1.0))
+    registry.register_collector(lambda: in_flight.set(value=3))
+
+    requests.inc('/a"b', amount=2)
+    latency.observe("/a", value=0.05)
+    latency.observe("/a", value=0.5)
+    latency.observe("/a", value=5.0)
+
+    text = registry.render()
+    assert "# TYPE demo_requests_total counter" in text
+    assert 'demo_requests_total{route="/a\\"b"} 2.0' in text
+    assert "demo_in_flight 3" in text
+    assert 'demo_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{route="/a",le="1.0"} 2' in text
+    assert 'demo_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'demo_seconds_sum{route="/a"} 5.55' in text
+    assert 'demo_seconds_count{route="/a"} 3' in text
+
+
+def test_middleware_records_route_template_and_metrics_endpoint():
+    """
+    Prueba que la latencia se agrupe por la plantilla de la ruta (no por la
+    URL) y que `/metrics` la exponga.
+    """
+    histogram = metrics_module.http_request_duration
+    before = histogram.count("GET", "/api/forecast/forecast/results/{tenant_id}", "403")
+
+    client.get(f"/api/forecast/forecast/results/{TEST_TENANT_ID}?secret=otra")
+    client.get("/no-existe")
+
+    assert histogram.count("GET", "/api/forecast/forecast/results/{tenant_id}", "403") == before + 1
+    assert histogram.count("GET", "unmatched", "404") >= 1
+    assert metrics_module.http_requests_in_flight.value("GET") == 0
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'route="/api/forecast/forecast/results/{tenant_id}"' in response.text
+    assert TEST_TENANT_ID not in response.text
+
+
+def test_ingest_counts_rows_per_table():
+    """
+    Prueba que una ingesta sume sus filas a `ingest_rows_total` de su tabla.
+    """
+    before = metrics_module.ingest_rows.value("sales", "values")
+    with patch('app.services.sales.db_connection') as mock_db_connection:
+        mock_conn = Mock()
+        mock_cursor = Mock()
+        mock_db_connection.return_value.__enter__.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.mogrify.side_effect = lambda sql, params: (sql % params).encode('utf-8')
+
+        response = client.post("/api/ingest/sales", json={"tenant_id": TEST_TENANT_ID, "data": [
+            {"date": "2024-01-01", "sku": "VINO-001", "qty": 10, "price": 15.5, "channel": "online"},
+            {"date": "2024-01-02", "sku": "VINO-002", "qty": 5, "price": 20.0, "channel": "tienda"},
+        ]})
+
+    assert response.status_code == 201
+    assert metrics_module.ingest_rows.value("sales", "values") == before + 2
+
+
+def test_pool_collector_reports_utilization():
+    """
+    Prueba que el colector del pool síncrono publique su ocupación.
+    """
+    pool = Mock(in_use=3, maxconn=4)
+    with patch('app.database.db_pool', pool):
+        metrics_module.metrics.render()
+
+    assert metrics_module.db_pool_connections_in_use.value("sync") == 3
+    assert metrics_module.db_pool_utilization.value("sync") == 0.75
+
+
+def test_worker_records_forecast_job_duration():
+    """
+    Prueba que el worker registre la duración del job y de sus etapas.
+    """
+    job = ForecastJob(5, TEST_TENANT_ID, "global", 14, False, 1)
+    histogram = metrics_module.forecast_job_duration
+    before = histogram.count("global", "succeeded"), histogram.count("global", "failed")
+
+    with patch.object(worker, "claim_next_job", return_value=job), \
+         patch.object(worker, "run_forecast_job", return_value={"stages": {"forecast": 2.0}}), \
+         patch.object(worker, "finish_job"):
+        worker.process_next_job("w1", heartbeat_interval=60)
+    with patch.object(worker, "claim_next_job", return_value=job), \
+         patch.object(worker, "run_forecast_job", side_effect=RuntimeError("sin conexión")), \
+         patch.object(worker, "finish_job"):
+        worker.process_next_job("w1", heartbeat_interval=60)
+
+    assert histogram.count("global", "succeeded") == before[0] + 1
+    assert histogram.count("global", "failed") == before[1] + 1
+    assert metrics_module.forecast_job_stage_duration.count("forecast") >= 1
@@ -0,0 +1,137 @@
+# tests/test_results.py
+#
+# Tests para el endpoint de resultados de pronóstico.
+# La conexión asíncrona se simula con los fakes de conftest.py.
+
+import os
+import sys
+# Añade el directorio raíz del proyecto al sys.path para que los módulos puedan ser encontrados.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import io
+import pytest
+from datetime import date
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from main import app
+from app.services.forecast_results import build_results_query, forecast_versions
+from conftest import TEST_TENANT_ID, FakeAsyncConnection, fake_connection_factory
+
+client = TestClient(app)
+
+SECRET = "super-secret-key-123"
+RESULTS_URL = f"/api/forecast/forecast/results/{TEST_TENANT_ID}?secret={SECRET}"
+
+
+@pytest.fixture(autouse=True)
+def clear_forecast_versions():
+    forecast_versions.clear()
+    yield
+    forecast_versions.clear()
+
+
+def get_results(conn, url=RESULTS_URL, **kwargs):
+    """Llama al endpoint con `conn` como conexión del pool asíncrono."""
+    with patch('app.routers.results.async_db_connection', fake_connection_factory(conn)), \
+         patch('app.services.raw_data.async_db_connection', fake_connection_factory(conn)):
+        return client.get(url, **kwargs)
+
+
+def test_get_forecast_results_json():
+    """
+    Prueba que los resultados se devuelvan como lista de diccionarios,
+    leídos de la ejecución vigente.
+    """
+    conn = FakeAsyncConnection([[(41,)], [("VINO-001", date(2024, 2, 1), 3.5, "lightgbm")]])
+
+    response = get_results(conn)
+
+    assert response.status_code == 200
+    assert response.json() == [
+        {"sku": "VINO-001", "date": "2024-02-01", "predicted_qty": 3.5, "model_used": "lightgbm"}
+    ]
+    assert response.headers["ETag"].startswith('"41-')
+    query, params = conn.executed[1]
+    assert "run_id = %s" in query
+    assert params == [TEST_TENANT_ID, 41]
+
+def test_get_forecast_results_not_found():
+    """
+    Prueba que un tenant sin ejecuciones publicadas devuelva un 404.
+    """
+    response = get_results(FakeAsyncConnection([[]]))
+
+    assert response.status_code == 404
+
+def test_get_forecast_results_invalid_secret():
+    """
+    Prueba que una clave secreta incorrecta devuelva un 403.
+    """
+    response = client.get(f"/api/forecast/forecast/results/{TEST_TENANT_ID}?secret=otra")
+
+    assert response.status_code == 403
+
+def test_get_forecast_results_filters_and_aggregates_in_sql():
+    """
+    Prueba que los filtros y la agregación se pasen a la consulta.
+    """
+    conn = FakeAsyncConnection([[(41,)], [("VINO-001", date(2024, 1, 29), 24.5, "lightgbm")]])
+
+    response = get_results(
+        conn,
+        f"{RESULTS_URL}&sku=VINO-002&sku=VINO-001&date_from=2024-02-01&date_to=2024-02-29"
+        f"&model_used=lightgbm&aggregate=week",
+    )
+
+    assert response.status_code == 200
+    assert response.json()[0]["date"] == "2024-01-29"
+    query, params = conn.executed[1]
+    assert "date_trunc('week', date)" in query and "GROUP BY sku, period" in query
+    assert params == [
+        TEST_TENANT_ID, 41, ["VINO-001", "VINO-002"], date(2024, 2, 1), date(2024, 2, 29), "lightgbm",
+    ]
+
+def test_build_results_query_rejects_unknown_aggregation():
+    """
+    Prueba que solo se acepten las agregaciones soportadas.
+    """
+    with pytest.raises(ValueError):
+        build_results_query(TEST_TENANT_ID, 1, aggregate="year")
+
+def test_get_forecast_results_not_modified_without_database():
+    """
+    Prueba que una petición con el ETag vigente reciba un 304 sin consultar
+    la base de datos, y que una ejecución nueva invalide el ETag.
+    """
+    conn = FakeAsyncConnection([[(41,)], [("VINO-001", date(2024, 2, 1), 3.5, "lightgbm")]])
+    etag = get_results(conn).headers["ETag"]
+
+    with patch('app.routers.results.async_db_connection', side_effect=AssertionError("sin BD")):
+        response = client.get(RESULTS_URL, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+    # El writer anuncia una ejecución nueva: el ETag anterior deja de valer.
+    forecast_versions.handle_notification(f"{TEST_TENANT_ID}:42")
+    conn = FakeAsyncConnection([[(42,)], [("VINO-001", date(2024, 2, 1), 4.0, "lightgbm")]])
+    response = get_results(conn, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"].startswith('"42-')
+
+def test_get_forecast_results_as_parquet():
+    """
+    Prueba que los resultados se puedan descargar como Parquet.
+    """
+    pq = pytest.importorskip("pyarrow.parquet")
+    conn = FakeAsyncConnection([[(41,)], [
+        ("VINO-001", date(2024, 2, 1), 3.5, "lightgbm"),
+        ("VINO-002", date(2024, 2, 1), 1.0, "simple_moving_average"),
+    ]])
+
+    response = get_results(conn, f"{RESULTS_URL}&format=parquet")
+
+    assert response.status_code == 200
+    assert "ETag" in response.headers
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.column_names == ["sku", "date", "predicted_qty", "model_used"]
+    assert table.column("sku").to_pylist() == ["VINO-001", "VINO-002"]
@@ -8,10 +8,14 @@ import sys
 # Añade el directorio raíz del proyecto al sys.path para que los módulos puedan ser encontrados.
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+import asyncio
+import csv
 import pytest
 from unittest.mock import patch, Mock
 from fastapi.testclient import TestClient
 from main import app
+from app.models.sales import SalesRecord
+from app.services.streaming import StreamValidationError, iter_record_batches
 from datetime import date
 import uuid
 
@@ -26,10 +30,10 @@ def test_ingest_sales_success():
     Prueba que el endpoint de ingesta de ventas funcione correctamente con datos válidos.
     Ahora usamos un patch para simular la conexión a la base de datos.
     """
-    with patch('app.services.sales.get_db_connection') as mock_get_conn:
+    with patch('app.services.sales.db_connection') as mock_db_connection:
         mock_conn = Mock()
         mock_cursor = Mock()
-        mock_get_conn.return_value = mock_conn
+        mock_db_connection.return_value.__enter__.return_value = mock_conn
         mock_conn.cursor.return_value = mock_cursor
         mock_cursor.mogrify.side_effect = lambda sql, params: (sql % params).encode('utf-8')
 
@@ -48,11 +52,18 @@ def test_ingest_sales_success():
         assert response.json() == {"message": "Sales data ingested successfully."}
         
         # Verificamos que los métodos del mock se hayan llamado correctamente.
-        mock_get_conn.assert_called_once()
-        mock_cursor.execute.assert_called_once()
+        mock_db_connection.assert_called_once()
+        # Bloqueo del tenant, staging, INSERT ... VALUES, delta del rollup y fusión.
+        assert mock_cursor.execute.call_count == 5
+        statements = [call[0][0] for call in mock_cursor.execute.call_args_list]
+        assert "pg_advisory_xact_lock" in statements[0]
+        assert "INSERT INTO sales_daily_rollup" in statements[3]
+        assert "ON CONFLICT (tenant_id, date, sku)" in statements[4]
         mock_conn.commit.assert_called_once()
         mock_cursor.close.assert_called_once()
-        mock_conn.close.assert_called_once()
+        # La conexión se devuelve al pool en lugar de cerrarse.
+        mock_db_connection.return_value.__exit__.assert_called_once()
+        mock_conn.close.assert_not_called()
     
 def test_ingest_sales_invalid_data():
     """
@@ -68,4 +79,199 @@ def test_ingest_sales_invalid_data():
     
     response = client.post("/api/ingest/sales", json=sales_data_invalid)
     
-    assert response.status_code == 422
\ No newline at end of file
+    assert response.status_code == 422
+
+def test_ingest_sales_bulk_uses_copy():
+    """
+    Prueba que el modo `bulk` cargue los registros con `COPY` en una tabla de staging
+    y exponga las métricas de rendimiento en las cabeceras de la respuesta.
+    """
+    with patch('app.services.sales.db_connection') as mock_db_connection:
+        mock_conn = Mock()
+        mock_cursor = Mock()
+        mock_db_connection.return_value.__enter__.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+
+        copied = []
+        mock_cursor.copy_expert.side_effect = lambda sql, stream: copied.append(stream.read())
+
+        tenant_id = uuid.uuid4()
+        sales_data = {
+            "tenant_id": str(tenant_id),
+            "data": [
+                {"date": "2024-01-01", "sku": "VINO-001", "qty": 10, "price": 15.5, "channel": "online"},
+                {"date": "2024-01-02", "sku": "VINO-002", "qty": 5, "price": 20.0, "channel": "tienda"},
+            ]
+        }
+
+        response = client.post("/api/ingest/sales/?bulk=true", json=sales_data)
+
+        assert response.status_code == 201
+        assert response.json() == {"message": "Sales data ingested successfully."}
+        assert response.headers["X-Ingest-Mode"] == "copy"
+        assert response.headers["X-Ingest-Rows"] == "2"
+
+        # Bloqueo + CREATE TEMP TABLE + delta del rollup + INSERT ... SELECT ... ON CONFLICT
+        assert mock_cursor.execute.call_count == 4
+        statements = [call[0][0] for call in mock_cursor.execute.call_args_list]
+        assert "INSERT INTO sales_daily_rollup" in statements[2]
+        assert "ON CONFLICT (tenant_id, date, sku)" in statements[3]
+        assert copied == [
+            f"2024-01-01\tVINO-001\t10\t15.5\tonline\t{tenant_id}\n"
+            f"2024-01-02\tVINO-002\t5\t20.0\ttienda\t{tenant_id}\n"
+        ]
+        mock_conn.commit.assert_called_once()
+
+
+def test_ingest_sales_stream_ndjson_in_batches():
+    """
+    Prueba que el endpoint de streaming valide el NDJSON por lotes
+    y escriba cada lote por separado con `COPY`.
+    """
+    with patch('app.services.sales.db_connection') as mock_db_connection:
+        mock_conn = Mock()
+        mock_cursor = Mock()
+        mock_db_connection.return_value.__enter__.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+
+        tenant_id = uuid.uuid4()
+        body = (
+            '{"date": "2024-01-01", "sku": "VINO-001", "qty": 10, "price": 15.5, "channel": "online"}\n'
+            '{"date": "2024-01-02", "sku": "VINO-002", "qty": 5, "price": 20.0, "channel": "tienda"}\n'
+            '{"date": "2024-01-03", "sku": "VINO-003", "qty": 1, "price": 9.9, "channel": "online"}\n'
+        )
+
+        response = client.post(
+            f"/api/ingest/sales/stream?tenant_id={tenant_id}&batch_size=2",
+            content=body,
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+
+        assert response.status_code == 201
+        assert response.json() == {"message": "Sales data streamed successfully.", "rows": 3, "batches": 2}
+        assert mock_cursor.copy_expert.call_count == 2
+        assert mock_conn.commit.call_count == 2
+
+
+def test_ingest_sales_stream_invalid_row():
+    """
+    Prueba que una fila inválida devuelva un 422 con el número de línea
+    y las filas ya confirmadas.
+    """
+    with patch('app.services.sales.db_connection') as mock_db_connection:
+        mock_conn = Mock()
+        mock_db_connection.return_value.__enter__.return_value = mock_conn
+
+        tenant_id = uuid.uuid4()
+        body = (
+            'date,sku,qty,price,channel\n'
+            '2024-01-01,VINO-001,10,15.5,online\n'
+            'not-a-date,VINO-002,5,20.0,tienda\n'
+        )
+
+        response = client.post(
+            f"/api/ingest/sales/stream?tenant_id={tenant_id}&batch_size=1",
+            content=body,
+            headers={"Content-Type": "text/csv"},
+        )
+
+        assert response.status_code == 422
+        detail = response.json()["detail"]
+        assert detail["line"] == 3
+        assert detail["rows_committed"] == 1
+
+
+def test_stream_csv_keeps_newlines_inside_quoted_fields():
+    """
+    Prueba que un campo CSV entre comillas con saltos de línea (y comillas
+    escapadas) se lea como un único registro aunque los trozos del cuerpo
+    corten el campo, y que los errores indiquen la línea donde empieza el registro.
+    """
+    body = (
+        b'date,sku,qty,price,channel\r\n'
+        b'2024-01-01,VINO-001,10,15.5,"tienda\r\n"" Centro ""\nplanta 1"\r\n'
+        b'2024-01-02,VINO-002,5,20.0,online\r\n'
+        b'not-a-date,VINO-003,1,9.9,"feria\nanual"\r\n'
+    )
+
+    async def chunks():
+        for start in range(0, len(body), 7):
+            yield body[start:start + 7]
+
+    async def collect():
+        return [record async for batch in iter_record_batches(chunks(), "csv", SalesRecord, 10) for record in batch]
+
+    with pytest.raises(StreamValidationError) as exc_info:
+        asyncio.run(collect())
+    assert exc_info.value.line_number == 6
+
+    body = body[:body.index(b'not-a-date')]
+    records = asyncio.run(collect())
+    assert [record.channel for record in records] == ['tienda\r\n" Centro "\nplanta 1', "online"]
+
+
+def test_stream_rejects_records_over_the_size_limit():
+    """
+    Prueba que una línea sin fin o unas comillas que no se cierran no se
+    acumulen sin límite en memoria: el registro se rechaza al superar el tamaño máximo.
+    """
+    async def collect(body, fmt):
+        async def chunks():
+            for start in range(0, len(body), 16):
+                yield body[start:start + 16]
+        return [batch async for batch in iter_record_batches(chunks(), fmt, SalesRecord, 10, max_record_bytes=64)]
+
+    with pytest.raises(StreamValidationError) as exc_info:
+        asyncio.run(collect(b'{"sku": "' + b"x" * 1000, "ndjson"))
+    assert exc_info.value.line_number == 1
+    assert exc_info.value.errors[0]["type"] == "too_large"
+
+    with pytest.raises(StreamValidationError) as exc_info:
+        asyncio.run(collect(b'date,sku,qty,price,channel\n2024-01-01,VINO-001,1,2.0,"abierto\n' + b"linea\n" * 50, "csv"))
+    assert exc_info.value.line_number == 2
+    assert exc_info.value.errors[0]["type"] == "too_large"
+
+
+def test_ingest_sales_stream_invalid_encoding_and_csv_errors():
+    """
+    Prueba que un cuerpo con UTF-8 inválido devuelva el 422 documentado (con
+    línea y filas ya confirmadas) y no un 500, y que los errores del lector
+    CSV se traten igual.
+    """
+    with patch('app.services.sales.db_connection') as mock_db_connection:
+        mock_conn = Mock()
+        mock_db_connection.return_value.__enter__.return_value = mock_conn
+
+        tenant_id = uuid.uuid4()
+        body = (
+            b'date,sku,qty,price,channel\n'
+            b'2024-01-01,VINO-001,10,15.5,online\n'
+            b'2024-01-02,VINO-\xff02,5,20.0,tienda\n'
+        )
+
+        response = client.post(
+            f"/api/ingest/sales/stream?tenant_id={tenant_id}&batch_size=1",
+            content=body,
+            headers={"Content-Type": "text/csv"},
+        )
+
+        assert response.status_code == 422
+        detail = response.json()["detail"]
+        assert detail["line"] == 3
+        assert detail["errors"][0]["type"] == "unicode"
+        assert detail["rows_committed"] == 1
+
+    # Un campo mayor que `csv.field_size_limit()`.
+    huge = b'"' + b"x" * (csv.field_size_limit() + 1) + b'"'
+    body = b'date,sku,qty,price,channel\n2024-01-01,VINO-001,1,2.0,' + huge + b'\n'
+
+    async def chunks():
+        yield body
+
+    async def collect():
+        return [batch async for batch in iter_record_batches(chunks(), "csv", SalesRecord, 10, max_record_bytes=len(body))]
+
+    with pytest.raises(StreamValidationError) as exc_info:
+        asyncio.run(collect())
+    assert exc_info.value.line_number == 2
+    assert exc_info.value.errors[0]["type"] == "csv"
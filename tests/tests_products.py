@@ -22,10 +22,10 @@ def test_ingest_products_success():
     Prueba que el endpoint de ingesta de productos funcione correctamente con datos válidos.
     El test mockea la conexión a la base de datos para evitar llamadas reales.
     """
-    with patch('app.services.products.get_db_connection') as mock_get_conn:
+    with patch('app.services.products.db_connection') as mock_db_connection:
         mock_conn = Mock()
         mock_cursor = Mock()
-        mock_get_conn.return_value = mock_conn
+        mock_db_connection.return_value.__enter__.return_value = mock_conn
         mock_conn.cursor.return_value = mock_cursor
         
         # Simula el comportamiento de mogrify, que se usa para escapar los valores.
@@ -47,11 +47,13 @@ def test_ingest_products_success():
         assert response.json() == {"message": "Products data ingested successfully."}
         
         # Verificamos que los métodos del mock se hayan llamado.
-        mock_get_conn.assert_called_once()
+        mock_db_connection.assert_called_once()
         mock_cursor.execute.assert_called_once()
         mock_conn.commit.assert_called_once()
         mock_cursor.close.assert_called_once()
-        mock_conn.close.assert_called_once()
+        # La conexión se devuelve al pool en lugar de cerrarse.
+        mock_db_connection.return_value.__exit__.assert_called_once()
+        mock_conn.close.assert_not_called()
 
 def test_ingest_products_invalid_data():
     """